@@ -1,25 +1,26 @@
+import asyncio
+import hashlib
+import json
 import logging
 import os
-import re
+import shutil
+import threading
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import time
 from io import BytesIO
 import sys
 
 import requests
-from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile, status, BackgroundTasks
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pinecone import Pinecone
 from pydantic import BaseModel
-from PyPDF2 import PdfReader
-import pdfplumber
-import tiktoken
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from docx import Document as DocxDocument
@@ -31,8 +32,6 @@ from reportlab.pdfbase.ttfonts import TTFont
 
 # Google Sheets Integration
 import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 
 # ===== Google configuration (edit here) =====
 # Google Drive (OAuth) settings
@@ -44,11 +43,21 @@ os.environ.setdefault("GOOGLE_DRIVE_CREDENTIALS_FILE", GOOGLE_DRIVE_CREDENTIALS_
 os.environ.setdefault("GOOGLE_DRIVE_PARENT_FOLDER_ID", GOOGLE_DRIVE_PARENT_FOLDER_ID)
 
 # Google Drive background uploader (import after env is set)
-from gdrive_uploader import background_upload as drive_background_upload
+from gdrive_uploader import drive_spool_path, get_executor as get_drive_executor
 from gdrive_uploader import get_upload_status as drive_get_upload_status
 from gdrive_uploader import CREDENTIALS_FILE as DRIVE_CREDENTIALS_FILE, TOKEN_FILE as DRIVE_TOKEN_FILE
 from gdrive_uploader import PARENT_FOLDER_ID as DRIVE_PARENT_FOLDER_ID
 
+from embedder import AsyncEmbeddingEngine, EMBEDDING_DIMENSIONS, EMBEDDING_MODEL
+from embedding_cache import EMBED_CACHE_ENABLED, EmbeddingCache
+from ingest_pipeline import PINECONE_INDEX_NAME, make_ascii_id, pinecone_api_key
+from ingest_manifest import ManifestStore
+from ingest_queue import JobQueue, spool_path
+from ingest_worker import IngestWorker
+from pdf_extract import shutdown_executor as shutdown_pdf_executor
+from sheets_session import SheetsSession
+from chat_mirror import SESSION_SORTS, ChatLogMirror, ChatSessionMirror, local_today, range_bounds
+
 # Google Sheets 설정
 GOOGLE_SHEETS_CONFIG = {
   "type": "service_account",
@@ -79,6 +88,9 @@ CHAT_SPREADSHEET_KEY = os.getenv("GOOGLE_CHAT_SPREADSHEET_KEY", "1V5TJmN8aKXCAH9
 CHAT_SHEET_SESSIONS = os.getenv("GOOGLE_CHAT_SHEET_SESSIONS", "Sessions")
 CHAT_SHEET_LOGS = os.getenv("GOOGLE_CHAT_SHEET_LOGS", "ChatLogs")
 
+# 프로세스 전역 Sheets 세션 (토큰 백그라운드 갱신 + 문서/시트 핸들 캐시)
+sheets = SheetsSession(GOOGLE_SHEETS_CONFIG)
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -116,6 +128,10 @@ class SaveSettingsRequest(BaseModel):
 
 ADMIN_SHEET = "Admins"
 PERMISSIONS_SHEET = "Permissions"
+ADMIN_HEADERS = ['username', 'password_hash', 'is_super_admin', 'created_at', 'updated_at']
+PERMISSION_HEADERS = ['username', 'category', 'can_view', 'can_save', 'updated_at']
+_ADMIN_RANGE = f"'{ADMIN_SHEET}'!A:E"
+_PERMISSIONS_RANGE = f"'{PERMISSIONS_SHEET}'!A:E"
 
 SECRET_KEY = os.getenv("ADMIN_JWT_SECRET", "change-this-in-production")
 ALGORITHM = "HS256"
@@ -126,10 +142,12 @@ COOKIE_SECURE = os.getenv("ADMIN_COOKIE_SECURE", "false").lower() == "true"
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # ===== In-memory caches (server-side) =====
-ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL_SECONDS", "300"))  # 5 minutes
-PERMS_CACHE_TTL = int(os.getenv("PERMS_CACHE_TTL_SECONDS", "300"))  # 5 minutes
-_admin_cache: Dict[str, object] = {"data": None, "time": 0.0}
-_perms_cache: Dict[str, Dict[str, object]] = {}
+# 만료 후 갱신은 스프레드시트 revision이 그대로면 다운로드 없이 끝나므로 TTL을 짧게 유지
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL_SECONDS", "30"))
+PERMS_CACHE_TTL = int(os.getenv("PERMS_CACHE_TTL_SECONDS", "30"))
+_admin_cache: Dict[str, object] = {"data": None, "time": 0.0, "rev": None}
+# Permissions 시트 전체를 username → {category: flags} 인덱스로 보관 (한 번의 조회로 모든 관리자 처리)
+_perms_index: Dict[str, object] = {"data": None, "time": 0.0, "rev": None}
 
 def _cache_now() -> float:
     return time.time()
@@ -183,31 +201,143 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def _gs_client():
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    credential = ServiceAccountCredentials.from_json_keyfile_dict(GOOGLE_SHEETS_CONFIG, scope)
-    return gspread.authorize(credential)
-
-
 def _admin_doc():
-    gc = _gs_client()
-    return gc.open_by_key(SPREADSHEET_KEY)
+    return sheets.spreadsheet(SPREADSHEET_KEY)
 
 
 def _ensure_worksheet(doc, title: str, headers: List[str]):
-    try:
-        ws = doc.worksheet(title)
-        current_headers = ws.row_values(1)
-        if not current_headers:
-            ws.append_row(headers)
-        elif len(current_headers) < len(headers):
-            # Ensure all headers exist by updating the first row
-            ws.update('A1', [headers])
-        return ws
-    except gspread.exceptions.WorksheetNotFound:
-        ws = doc.add_worksheet(title=title, rows="100", cols="26")
-        ws.append_row(headers)
-        return ws
+    # 헤더 확인/생성은 워크시트별로 최초 1회만 수행 (이후 캐시된 핸들 반환)
+    return sheets.worksheet(doc.id, title, headers)
+
+
+def _admin_read(ranges: List[str]) -> List[List[List[str]]]:
+    """Admins/Permissions 시트의 여러 범위를 values_batch_get 한 번으로 조회.
+    동일 범위를 동시에 요청하면 진행 중인 조회 결과를 공유한다.
+    """
+    doc = _admin_doc()
+    _ensure_worksheet(doc, ADMIN_SHEET, ADMIN_HEADERS)
+    _ensure_worksheet(doc, PERMISSIONS_SHEET, PERMISSION_HEADERS)
+    return sheets.batch_get(SPREADSHEET_KEY, ranges)
+
+
+def _store_admin_rows(rows: List[List[str]], rev: Optional[str] = None) -> List[Dict[str, str]]:
+    data: List[Dict[str, str]] = []
+    if len(rows) >= 2:
+        headers = rows[0]
+        for r in rows[1:]:
+            if not any(r):
+                continue
+            item: Dict[str, str] = {}
+            for i, h in enumerate(headers):
+                if i < len(r):
+                    item[h] = r[i]
+            data.append(item)
+    _admin_cache.update({"data": data, "time": _cache_now(), "rev": rev})
+    return data
+
+
+def _store_permission_rows(rows: List[List[str]], rev: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, bool]]]:
+    index: Dict[str, Dict[str, Dict[str, bool]]] = {}
+    for r in rows[1:]:
+        if len(r) < 2 or not r[0]:
+            continue
+        category = r[1]
+        can_view = (r[2].upper() == 'TRUE') if len(r) > 2 and r[2] else False
+        can_save = (r[3].upper() == 'TRUE') if len(r) > 3 and r[3] else False
+        index.setdefault(r[0], {})[category] = {"can_view": can_view, "can_save": can_save}
+    _perms_index.update({"data": index, "time": _cache_now(), "rev": rev})
+    return index
+
+
+def _perms_index_fresh() -> bool:
+    return _is_fresh(_perms_index.get("time", 0.0), PERMS_CACHE_TTL) and isinstance(_perms_index.get("data"), dict)
+
+
+def _admins_fresh() -> bool:
+    return _is_fresh(_admin_cache.get("time", 0.0), ADMIN_CACHE_TTL) and isinstance(_admin_cache.get("data"), list)
+
+
+def _unchanged_since(cache: Dict[str, object], rev: Optional[str]) -> bool:
+    """캐시가 같은 revision에서 읽은 것이면 유효기간만 연장"""
+    if rev is None or cache.get("data") is None or cache.get("rev") != rev:
+        return False
+    cache["time"] = _cache_now()
+    return True
+
+
+def _refresh_auth_caches(admins: bool, perms: bool) -> None:
+    """관리자 목록/권한 인덱스를 한 번의 배치 조회로 다시 읽어 교체.
+    스프레드시트 revision이 캐시 시점과 같으면 다운로드를 생략한다.
+    """
+    if not (admins or perms):
+        return
+    # 값보다 먼저 revision을 읽어야 조회 중 변경이 다음 갱신에서 감지됨
+    rev = sheets.revision(SPREADSHEET_KEY)
+    admins = admins and not _unchanged_since(_admin_cache, rev)
+    perms = perms and not _unchanged_since(_perms_index, rev)
+    ranges = ([_ADMIN_RANGE] if admins else []) + ([_PERMISSIONS_RANGE] if perms else [])
+    if not ranges:
+        return
+    results = dict(zip(ranges, _admin_read(ranges)))
+    if admins:
+        _store_admin_rows(results[_ADMIN_RANGE], rev)
+    if perms:
+        _store_permission_rows(results[_PERMISSIONS_RANGE], rev)
+
+
+# Stale-while-revalidate: 만료된 캐시는 그대로 응답하고 갱신은 백그라운드 스레드 하나가 수행
+_auth_refresh_lock = threading.Lock()
+# 진행 중인 갱신: 종류("admins"/"perms") → 완료 이벤트
+_auth_refreshing: Dict[str, threading.Event] = {}
+# 빈 캐시 적재 시 진행 중인 갱신을 기다리는 최대 시간
+AUTH_COLD_LOAD_TIMEOUT = float(os.getenv("AUTH_COLD_LOAD_TIMEOUT_SECONDS", "30"))
+
+
+def _schedule_auth_refresh(admins: bool = False, perms: bool = False) -> List[threading.Event]:
+    """요청한 종류의 백그라운드 갱신을 예약하고, 끝날 때 set 되는 이벤트 목록을 반환.
+    이미 진행 중인 종류는 새로 시작하지 않고 그 갱신의 이벤트를 돌려준다.
+    """
+    with _auth_refresh_lock:
+        wanted = {k for k, want in (("admins", admins), ("perms", perms)) if want}
+        events = [_auth_refreshing[k] for k in wanted if k in _auth_refreshing]
+        kinds = wanted - set(_auth_refreshing)
+        if not kinds:
+            return events
+        done = threading.Event()
+        for k in kinds:
+            _auth_refreshing[k] = done
+
+    def _run():
+        try:
+            _refresh_auth_caches("admins" in kinds, "perms" in kinds)
+        except Exception as e:
+            logger.warning(f"관리자/권한 캐시 백그라운드 갱신 실패: {e}")
+        finally:
+            with _auth_refresh_lock:
+                for k in kinds:
+                    _auth_refreshing.pop(k, None)
+            done.set()
+
+    threading.Thread(target=_run, name="auth-cache-refresh", daemon=True).start()
+    return events + [done]
+
+
+def _auth_caches_loaded() -> bool:
+    return isinstance(_admin_cache.get("data"), list) and isinstance(_perms_index.get("data"), dict)
+
+
+def _load_auth_caches() -> None:
+    """비어 있는 캐시를 채우고, 만료된 캐시는 백그라운드 갱신 예약 (블로킹: 스레드에서 호출)
+    시작 시 예열 등 진행 중인 갱신이 있으면 같은 조회를 기다려 결과를 공유한다.
+    """
+    admins_loaded = isinstance(_admin_cache.get("data"), list)
+    perms_loaded = isinstance(_perms_index.get("data"), dict)
+    if not (admins_loaded and perms_loaded):
+        for done in _schedule_auth_refresh(admins=not admins_loaded, perms=not perms_loaded):
+            done.wait(AUTH_COLD_LOAD_TIMEOUT)
+        # 백그라운드 갱신이 실패했으면 직접 조회해 오류를 호출자에게 전달
+        _refresh_auth_caches(not isinstance(_admin_cache.get("data"), list), not isinstance(_perms_index.get("data"), dict))
+    _schedule_auth_refresh(admins=admins_loaded and not _admins_fresh(), perms=perms_loaded and not _perms_index_fresh())
 
 
 def _get_admin_by_username(username: str) -> Optional[Dict[str, str]]:
@@ -220,36 +350,25 @@ def _get_admin_by_username(username: str) -> Optional[Dict[str, str]]:
 
 
 def _list_admins() -> List[Dict[str, str]]:
-    # Return cached value if fresh
-    if _is_fresh(_admin_cache.get("time", 0.0), ADMIN_CACHE_TTL) and isinstance(_admin_cache.get("data"), list):
+    # Serve cached value; if expired, return it anyway and refresh in the background
+    if isinstance(_admin_cache.get("data"), list):
+        if not _admins_fresh():
+            _schedule_auth_refresh(admins=True)
         return _admin_cache["data"]  # type: ignore
 
-    doc = _admin_doc()
-    ws = _ensure_worksheet(doc, ADMIN_SHEET, ['username', 'password_hash', 'is_super_admin', 'created_at', 'updated_at'])
-    rows = ws.get_all_values()
-    if len(rows) < 2:
-        _admin_cache.update({"data": [], "time": _cache_now()})
-        return []
-    headers = rows[0]
-    data: List[Dict[str, str]] = []
-    for r in rows[1:]:
-        if not any(r):
-            continue
-        item: Dict[str, str] = {}
-        for i, h in enumerate(headers):
-            if i < len(r):
-                item[h] = r[i]
-        data.append(item)
-    _admin_cache.update({"data": data, "time": _cache_now()})
-    return data
+    # 보통은 warm_auth_caches 미들웨어가 스레드에서 미리 적재하므로 여기까지 오지 않음
+    _load_auth_caches()
+    return _admin_cache["data"]  # type: ignore
 
 
 def _list_admins_simple() -> List[Dict[str, str]]:
     """경량 조회: username(A열), is_super_admin(C열)만 읽어서 반환.
     서버 캐시(_admin_cache)가 신선하면 그대로 사용하고, 아니면 최소 컬럼만 조회.
     """
-    # Prefer cache if fresh
-    if _is_fresh(_admin_cache.get("time", 0.0), ADMIN_CACHE_TTL) and isinstance(_admin_cache.get("data"), list):
+    # Prefer cache (stale is fine; refreshed in the background)
+    if isinstance(_admin_cache.get("data"), list):
+        if not _admins_fresh():
+            _schedule_auth_refresh(admins=True)
         # _admin_cache에는 password_hash가 포함될 수 있으므로 안전 필드만 추려서 반환
         safe: List[Dict[str, str]] = []
         for a in _admin_cache["data"]:  # type: ignore
@@ -259,15 +378,10 @@ def _list_admins_simple() -> List[Dict[str, str]]:
             })
         return safe
 
-    doc = _admin_doc()
-    ws = _ensure_worksheet(doc, ADMIN_SHEET, ['username', 'password_hash', 'is_super_admin', 'created_at', 'updated_at'])
-    usernames = ws.col_values(1)  # column A
-    is_supers = ws.col_values(3)  # column C
-    # Remove header
-    if usernames:
-        usernames = usernames[1:]
-    if is_supers:
-        is_supers = is_supers[1:]
+    # A열(username), C열(is_super_admin)을 헤더 제외하고 한 번에 조회
+    username_rows, is_super_rows = _admin_read([f"'{ADMIN_SHEET}'!A2:A", f"'{ADMIN_SHEET}'!C2:C"])
+    usernames = [r[0] if r else "" for r in username_rows]
+    is_supers = [r[0] if r else "FALSE" for r in is_super_rows]
     n = max(len(usernames), len(is_supers))
     result: List[Dict[str, str]] = []
     for i in range(n):
@@ -280,9 +394,19 @@ def _list_admins_simple() -> List[Dict[str, str]]:
     return result
 
 
+def _reload_admins_after_write() -> None:
+    # 변경 직후에는 즉시 다시 읽어 교체 (실패 시 무효화하여 다음 조회에서 로드)
+    _admin_cache["rev"] = None  # revision 비교로 재조회가 생략되지 않도록
+    try:
+        _refresh_auth_caches(admins=True, perms=False)
+    except Exception as e:
+        logger.warning(f"관리자 캐시 갱신 실패, 무효화합니다: {e}")
+        _admin_cache.update({"data": None, "time": 0.0})
+
+
 def _upsert_admin(username: str, password: Optional[str], is_super_admin: bool) -> Dict[str, str]:
     doc = _admin_doc()
-    ws = _ensure_worksheet(doc, ADMIN_SHEET, ['username', 'password_hash', 'is_super_admin', 'created_at', 'updated_at'])
+    ws = _ensure_worksheet(doc, ADMIN_SHEET, ADMIN_HEADERS)
     rows = ws.get_all_values()
     now = datetime.utcnow().isoformat()
     password_hash = get_password_hash(password) if password else None
@@ -290,9 +414,7 @@ def _upsert_admin(username: str, password: Optional[str], is_super_admin: bool)
     if len(rows) < 2:
         # empty, append headers already present, now add first row
         ws.append_row([username, password_hash or '', 'TRUE' if is_super_admin else 'FALSE', now, now])
-        # Invalidate caches
-        _admin_cache.update({"data": None, "time": 0.0})
-        _perms_cache.pop(username, None)
+        _reload_admins_after_write()
         return {"username": username, "is_super_admin": is_super_admin}
 
     # find row
@@ -302,22 +424,18 @@ def _upsert_admin(username: str, password: Optional[str], is_super_admin: bool)
             # update
             new_hash = password_hash or (r[1] if len(r) > 1 else '')
             ws.update(f"A{idx+1}:E{idx+1}", [[username, new_hash, 'TRUE' if is_super_admin else 'FALSE', r[3] if len(r) > 3 and r[3] else now, now]])
-            # Invalidate caches
-            _admin_cache.update({"data": None, "time": 0.0})
-            _perms_cache.pop(username, None)
+            _reload_admins_after_write()
             return {"username": username, "is_super_admin": is_super_admin}
 
     # not found → append
     ws.append_row([username, password_hash or '', 'TRUE' if is_super_admin else 'FALSE', now, now])
-    # Invalidate caches
-    _admin_cache.update({"data": None, "time": 0.0})
-    _perms_cache.pop(username, None)
+    _reload_admins_after_write()
     return {"username": username, "is_super_admin": is_super_admin}
 
 
 def _delete_admin(username: str):
     doc = _admin_doc()
-    ws = _ensure_worksheet(doc, ADMIN_SHEET, ['username', 'password_hash', 'is_super_admin', 'created_at', 'updated_at'])
+    ws = _ensure_worksheet(doc, ADMIN_SHEET, ADMIN_HEADERS)
     rows = ws.get_all_values()
     if len(rows) < 2:
         return
@@ -326,41 +444,24 @@ def _delete_admin(username: str):
         if r and len(r) > 0 and r[0] == username:
             ws.delete_rows(idx + 1)
             break
-    # Invalidate caches
-    _admin_cache.update({"data": None, "time": 0.0})
-    _perms_cache.pop(username, None)
+    _reload_admins_after_write()
 
 
 def _get_permissions(username: str) -> Dict[str, Dict[str, bool]]:
-    # Cached per-username permissions
-    cached = _perms_cache.get(username)
-    if cached and _is_fresh(cached.get("time", 0.0), PERMS_CACHE_TTL):
-        return cached.get("data", {})  # type: ignore
-
-    doc = _admin_doc()
-    ws = _ensure_worksheet(doc, PERMISSIONS_SHEET, ['username', 'category', 'can_view', 'can_save', 'updated_at'])
-    rows = ws.get_all_values()
-    perms: Dict[str, Dict[str, bool]] = {}
-    if len(rows) < 2:
-        _perms_cache[username] = {"data": perms, "time": _cache_now()}
-        return perms
-    headers = rows[0]
-    for r in rows[1:]:
-        if not any(r):
-            continue
-        if r[0] != username:
-            continue
-        category = r[1]
-        can_view = (r[2].upper() == 'TRUE') if len(r) > 2 and r[2] else False
-        can_save = (r[3].upper() == 'TRUE') if len(r) > 3 and r[3] else False
-        perms[category] = {"can_view": can_view, "can_save": can_save}
-    _perms_cache[username] = {"data": perms, "time": _cache_now()}
-    return perms
+    # 전체 권한 인덱스에서 조회 (만료 시 기존 인덱스로 응답하고 백그라운드 갱신)
+    if isinstance(_perms_index.get("data"), dict):
+        if not _perms_index_fresh():
+            _schedule_auth_refresh(perms=True)
+        index = _perms_index["data"]  # type: ignore
+    else:
+        _load_auth_caches()
+        index = _perms_index["data"]  # type: ignore
+    return dict(index.get(username, {}))
 
 
 def _set_permissions(username: str, permissions: Dict[str, Dict[str, bool]]):
     doc = _admin_doc()
-    ws = _ensure_worksheet(doc, PERMISSIONS_SHEET, ['username', 'category', 'can_view', 'can_save', 'updated_at'])
+    ws = _ensure_worksheet(doc, PERMISSIONS_SHEET, PERMISSION_HEADERS)
     rows = ws.get_all_values()
     now = datetime.utcnow().isoformat()
 
@@ -413,15 +514,20 @@ def _set_permissions(username: str, permissions: Dict[str, Dict[str, bool]]):
             for row_values in append_values:
                 ws.append_row(row_values)
 
-    # Invalidate permission cache for this user
-    _perms_cache.pop(username, None)
+    # Write-through: 저장한 카테고리를 권한 인덱스에 반영
+    index = _perms_index.get("data")
+    if isinstance(index, dict):
+        user_perms = dict(index.get(username, {}))
+        for category, flags in permissions.items():
+            user_perms[category] = {"can_view": bool(flags.get('can_view', False)), "can_save": bool(flags.get('can_save', False))}
+        _perms_index["data"] = {**index, username: user_perms}
 
 
 def _parse_bool(value: str) -> bool:
     return str(value).upper() == 'TRUE'
 
 
-def get_current_user_from_request(request: Request) -> Dict[str, str]:
+def _request_token(request: Request) -> Optional[str]:
     # Prefer Authorization header, otherwise read from HttpOnly cookie
     token: Optional[str] = None
     auth_header = request.headers.get('Authorization')
@@ -429,6 +535,11 @@ def get_current_user_from_request(request: Request) -> Dict[str, str]:
         token = auth_header.split(' ', 1)[1]
     else:
         token = request.cookies.get(COOKIE_NAME)
+    return token
+
+
+def get_current_user_from_request(request: Request) -> Dict[str, str]:
+    token = _request_token(request)
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="인증이 필요합니다.")
     try:
@@ -447,21 +558,20 @@ def get_current_user_from_request(request: Request) -> Dict[str, str]:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="토큰이 유효하지 않습니다.")
 
 
-def require_permission(user: Dict[str, str], category: str, action: str):
+def has_permission(user: Dict[str, str], category: str, *actions: str) -> bool:
+    """actions 중 하나라도 허용되면 True (슈퍼 관리자는 항상 허용)"""
     if user.get('is_super_admin'):
-        return
-    perms = _get_permissions(user['username'])
-    flags = perms.get(category)
-    allowed = False
-    if action == 'view':
-        allowed = bool(flags and flags.get('can_view'))
-    elif action == 'save':
-        allowed = bool(flags and flags.get('can_save'))
-    if not allowed:
+        return True
+    flags = _get_permissions(user['username']).get(category) or {}
+    return any(flags.get({'view': 'can_view', 'save': 'can_save'}.get(action, '')) for action in actions)
+
+
+def require_permission(user: Dict[str, str], category: str, action: str):
+    if not has_permission(user, category, action):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="권한이 없습니다.")
 
 # Pinecone 초기화
-pc = Pinecone(api_key="pcsk_7NQwb5_L6YHKhNQ5QY8DTtKv3rmYoTAJZJZZ9MPZ6yV5mUZtdgVXLnhr4ZRVjt5ahb91H4")
+pc = Pinecone(api_key=pinecone_api_key())
 
 app = FastAPI(
     title="Admin Panel Backend",
@@ -499,6 +609,45 @@ async def _log_drive_oauth_config():
     except Exception as e:
         logger.warning(f"[Drive OAuth] Startup logging failed: {e}")
 
+@app.on_event("startup")
+async def _start_sheets_session():
+    sheets.start()
+    # 관리자/권한 캐시를 미리 적재 (첫 요청이 Sheets 조회를 기다리지 않도록)
+    _schedule_auth_refresh(admins=True, perms=True)
+
+@app.on_event("shutdown")
+async def _stop_sheets_session():
+    sheets.stop()
+
+@app.on_event("startup")
+async def _start_drive_uploads():
+    # 이전 프로세스가 남긴 스풀 파일은 재시작 시 이어서 업로드
+    executor = get_drive_executor()
+    executor.start()
+    executor.recover()
+
+@app.on_event("shutdown")
+async def _shutdown_pdf_workers():
+    shutdown_pdf_executor()
+
+@app.on_event("shutdown")
+async def _stop_drive_uploads():
+    get_drive_executor().stop()
+
+@app.middleware("http")
+async def warm_auth_caches(request: Request, call_next):
+    """관리자/권한 캐시가 비어 있으면 인증 전에 스레드에서 적재
+    (시작 직후 예열이 끝나기 전에도 인증 경로가 이벤트 루프에서 Sheets를 조회하지 않도록)
+    """
+    path = request.url.path
+    if path.startswith("/api/") and not _auth_caches_loaded() and (path == "/api/admin/login" or _request_token(request)):
+        try:
+            await asyncio.to_thread(_load_auth_caches)
+        except Exception as e:
+            # 실패는 엔드포인트의 인증 처리에서 다시 드러남
+            logger.warning(f"관리자/권한 캐시 적재 실패: {e}")
+    return await call_next(request)
+
 # 루트에서 index.html 반환
 @app.get("/")
 async def root():
@@ -538,6 +687,95 @@ except Exception as e:
     logger.warning(f"OpenAI 클라이언트 초기화 실패: {str(e)}")
     client = None
 
+# 비동기 임베딩 엔진 (동시 요청 수를 rate-limit 헤더에 맞춰 조절)
+embedding_engine: Optional[AsyncEmbeddingEngine] = None
+if client is not None:
+    # 로컬 임베딩 캐시 (동일 청크 재업로드 시 OpenAI 호출 생략)
+    embedding_cache: Optional[EmbeddingCache] = None
+    if EMBED_CACHE_ENABLED:
+        try:
+            embedding_cache = EmbeddingCache(EMBEDDING_DIMENSIONS, name=make_ascii_id(EMBEDDING_MODEL))
+        except Exception as e:
+            logger.warning(f"임베딩 캐시 초기화 실패: {str(e)}")
+    try:
+        embedding_engine = AsyncEmbeddingEngine(AsyncOpenAI(), cache=embedding_cache)
+    except Exception as e:
+        logger.warning(f"비동기 임베딩 엔진 초기화 실패: {str(e)}")
+
+# 문서별 인제스트 매니페스트 (파일 해시 + 청크 해시)
+manifest_store = ManifestStore()
+
+# 인제스트 작업 큐 (업로드는 큐에 적재 후 즉시 응답, 처리는 워커가 수행)
+ingest_queue = JobQueue()
+# 별도 워커(python ingest_worker.py)를 운영하면 false로 설정
+INGEST_INPROCESS_WORKER = os.getenv("INGEST_INPROCESS_WORKER", "true").lower() == "true"
+_ingest_worker: Optional[IngestWorker] = None
+
+
+@app.on_event("startup")
+async def _start_ingest_worker():
+    global _ingest_worker
+    if not INGEST_INPROCESS_WORKER or embedding_engine is None:
+        return
+    _ingest_worker = IngestWorker(ingest_queue, embedding_engine, pc.Index(PINECONE_INDEX_NAME), manifest_store)
+    asyncio.create_task(_ingest_worker.run())
+
+
+@app.on_event("shutdown")
+async def _stop_ingest_worker():
+    if _ingest_worker is not None:
+        _ingest_worker.stop()
+
+UPLOAD_READ_CHUNK = 1024 * 1024
+# multipart 경계/헤더 등 본문 외 오버헤드 허용치
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_upload(request: Request, call_next):
+    """Content-Length만 보고 본문을 읽기 전에 과대 업로드를 거절"""
+    if request.method == "POST" and request.url.path == "/api/upload":
+        try:
+            content_length = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            content_length = 0
+        if content_length > MAX_FILE_SIZE + _MULTIPART_OVERHEAD:
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"success": False, "error": f"파일 크기가 제한을 초과했습니다. 최대 {MAX_FILE_SIZE // (1024 * 1024)}MB까지 업로드 가능합니다."}
+            )
+    return await call_next(request)
+
+
+def _spool_upload(src, dest: Path) -> Tuple[int, str]:
+    """업로드 스트림을 dest에 기록하면서 SHA-256과 크기를 계산. 한도 초과 시 ValueError."""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, "wb") as out:
+            while True:
+                chunk = src.read(UPLOAD_READ_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise ValueError("file too large")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """같은 파일시스템이면 하드링크(복사 없음), 아니면 복사"""
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
 def get_file_extension(filename: str) -> str:
     return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
 
@@ -667,67 +905,85 @@ async def forward_to_n8n_webhook(data: dict, endpoint: str = "prompt") -> dict:
             detail=error_msg
         )
 
-def make_ascii_id(text: str) -> str:
-    """벡터 ID를 ASCII로 변환"""
-    if not text:
-        return str(uuid.uuid4())
-    
-    # 한글과 특수문자 제거, 영문자와 숫자만 유지
-    text = re.sub(r'[^a-zA-Z0-9]', '_', text)
-    # 연속된 언더스코어를 하나로 변환
-    text = re.sub(r'_+', '_', text)
-    # 앞뒤 언더스코어 제거
-    text = text.strip('_')
-    if not text:
-        text = str(uuid.uuid4())
-    return text
+# ===== Settings cache (write-through on save, ETag for client revalidation) =====
+# 다른 워커 프로세스의 저장은 TTL 경과 후 반영됨 (만료 시 revision 확인만으로 대부분 끝남)
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "10"))
+_settings_cache: Dict[str, object] = {"data": None, "etag": None, "time": 0.0, "rev": None}
+
+
+def _settings_etag(data: dict) -> str:
+    body = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def _set_settings_cache(data: dict, rev: Optional[str] = None) -> None:
+    _settings_cache.update({"data": data, "etag": _settings_etag(data), "time": _cache_now(), "rev": rev})
+
+
+def _invalidate_settings_cache() -> None:
+    _settings_cache.update({"data": None, "etag": None, "time": 0.0, "rev": None})
+
+
+def get_cached_settings() -> Tuple[dict, str]:
+    """설정 데이터와 ETag 반환 (캐시가 신선하거나 revision이 그대로면 Sheets 조회 생략)"""
+    if not (_is_fresh(_settings_cache.get("time", 0.0), SETTINGS_CACHE_TTL) and _settings_cache.get("data") is not None):
+        rev = sheets.revision(SPREADSHEET_KEY)
+        if not _unchanged_since(_settings_cache, rev):
+            _set_settings_cache(get_google_sheets_data(), rev)
+    return _settings_cache["data"], _settings_cache["etag"]  # type: ignore
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match는 약한 비교: W/ 접두어를 무시하고 비교, *는 항상 일치
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+def _sheet_row_to_settings(headers: List[str], data_row: List[str]) -> dict:
+    # 데이터를 딕셔너리로 변환
+    data = {}
+    for i, header in enumerate(headers):
+        if i < len(data_row):
+            value = data_row[i]
+            # TRUE/FALSE 문자열을 boolean으로 변환
+            if value.upper() == 'TRUE':
+                value = True
+            elif value.upper() == 'FALSE':
+                value = False
+            # 숫자로 변환 가능한 경우 변환
+            elif value.replace('.', '').isdigit():
+                if '.' in value:
+                    value = float(value)
+                else:
+                    value = int(value)
+
+            data[header] = value
+    return data
 
 
 def get_google_sheets_data() -> dict:
     """Google Sheets에서 설정 데이터를 가져오는 함수"""
     try:
-        # Google API 인증
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        credential = ServiceAccountCredentials.from_json_keyfile_dict(GOOGLE_SHEETS_CONFIG, scope)
-        gc = gspread.authorize(credential)
-        
-        # 스프레드시트 열기
-        doc = gc.open_by_key(SPREADSHEET_KEY)
-        sheet = doc.worksheet(SHEET_NAME)
+        # 공유 세션의 캐시된 시트 핸들 사용
+        sheet = sheets.worksheet(SPREADSHEET_KEY, SHEET_NAME)
         
         # 모든 값 가져오기
         all_values = sheet.get_all_values()
         if len(all_values) < 2:  # 헤더와 데이터가 최소 2행 필요
             raise ValueError("스프레드시트에 데이터가 충분하지 않습니다.")
         
-        # 첫 번째 행을 컬럼명으로 사용
-        headers = all_values[0]
-        data_row = all_values[1]  # 첫 번째 데이터 행
-        
-        # 데이터를 딕셔너리로 변환
-        data = {}
-        for i, header in enumerate(headers):
-            if i < len(data_row):
-                value = data_row[i]
-                # TRUE/FALSE 문자열을 boolean으로 변환
-                if value.upper() == 'TRUE':
-                    value = True
-                elif value.upper() == 'FALSE':
-                    value = False
-                # 숫자로 변환 가능한 경우 변환
-                elif value.replace('.', '').isdigit():
-                    if '.' in value:
-                        value = float(value)
-                    else:
-                        value = int(value)
-                
-                data[header] = value
-        
+        # 첫 번째 행을 컬럼명으로, 두 번째 행을 데이터로 사용
+        data = _sheet_row_to_settings(all_values[0], all_values[1])
+
         logger.info("Google Sheets에서 데이터를 성공적으로 가져왔습니다.")
         return data
         
     except Exception as e:
         logger.error(f"Google Sheets에서 데이터를 가져오는 중 오류 발생: {str(e)}")
+        sheets.invalidate(SPREADSHEET_KEY, SHEET_NAME)
         raise HTTPException(
             status_code=500,
             detail=f"Google Sheets 데이터 로드 실패: {str(e)}"
@@ -737,14 +993,8 @@ def get_google_sheets_data() -> dict:
 def save_google_sheets_data(payload: SaveSettingsRequest) -> dict:
     """Google Sheets의 2번째 행(A2:H2)에 설정 값을 저장"""
     try:
-        # Google API 인증
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        credential = ServiceAccountCredentials.from_json_keyfile_dict(GOOGLE_SHEETS_CONFIG, scope)
-        gc = gspread.authorize(credential)
-
-        # 스프레드시트 열기
-        doc = gc.open_by_key(SPREADSHEET_KEY)
-        sheet = doc.worksheet(SHEET_NAME)
+        # 공유 세션의 캐시된 시트 핸들 사용
+        sheet = sheets.worksheet(SPREADSHEET_KEY, SHEET_NAME)
 
         # 시트 헤더 확인 (선택)
         headers = sheet.row_values(1)
@@ -770,210 +1020,44 @@ def save_google_sheets_data(payload: SaveSettingsRequest) -> dict:
 
         # 2번째 행(A2:H2)에 값 저장 (사용자 입력 형식으로 저장)
         sheet.update('A2:H2', [row_values], value_input_option='USER_ENTERED')
-
-        logger.info('Google Sheets에 설정이 저장되었습니다.')
-        return {
-            'updated_range': 'A2:H2',
-            'values': row_values
-        }
     except Exception as e:
         logger.error(f'Google Sheets 저장 중 오류: {str(e)}')
+        sheets.invalidate(SPREADSHEET_KEY, SHEET_NAME)
         raise HTTPException(
             status_code=500,
             detail=f'Google Sheets 저장 실패: {str(e)}'
         )
 
-
-def get_embedding(text: str):
-    """OpenAI embeddings 생성"""
-    if not client:
-        raise ValueError("OpenAI 클라이언트가 초기화되지 않았습니다. OPENAI_API_KEY를 확인하세요.")
-    
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    return response.data[0].embedding
-
-
-async def process_and_upload_file(file_content: bytes, original_filename: str):
-    """파일을 처리하고 Pinecone에 업로드하는 함수"""
-    if not client:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="OpenAI 서비스를 사용할 수 없습니다. 관리자에게 문의해주세요."
-        )
-    
+    logger.info('Google Sheets에 설정이 저장되었습니다.')
+    # 저장 직후 시트에 실제로 기록된 값(예: 1.0 → 1)을 다시 읽어 캐시 갱신
+    # (Python 값으로 캐시하면 다음 재조회 때 데이터와 ETag가 바뀜)
+    # 재조회 실패는 저장 결과를 바꾸지 않음: 캐시만 비워 다음 조회 때 다시 읽게 함
     try:
-        # 임시 파일로 저장
-        temp_dir = Path("/tmp")
-        temp_dir.mkdir(exist_ok=True)
-        temp_file = temp_dir / original_filename
-        
-        with open(temp_file, "wb") as f:
-            f.write(file_content)
-        
-        # PDF에서 텍스트 추출 및 동적 토큰 기반 청킹 처리
-        vectors = []
-        base_name = Path(original_filename).stem
-
-        # tiktoken 인코더 준비 (모델에 맞춤)
-        try:
-            encoder = tiktoken.encoding_for_model("text-embedding-3-small")
-        except Exception:
-            encoder = tiktoken.get_encoding("cl100k_base")
-
-        def count_tokens(text: str) -> int:
-            return len(encoder.encode(text))
-
-        def split_text_by_token_limit(text: str, max_tokens: int) -> List[str]:
-            token_ids = encoder.encode(text)
-            segments: List[str] = []
-            for start in range(0, len(token_ids), max_tokens):
-                segment = encoder.decode(token_ids[start:start + max_tokens])
-                if segment.strip():
-                    segments.append(segment)
-            return segments
-
-        target_min_tokens = 1000
-        target_tokens = 1200
-        target_max_tokens = 1500
-        overlap_tokens = 200
-
-        with pdfplumber.open(str(temp_file)) as pdf:
-            total_pages = len(pdf.pages)
-
-            for i, page in enumerate(pdf.pages, start=1):
-                # 페이지 텍스트 추출
-                page_text = page.extract_text() or ""
-                if not page_text.strip():
-                    # pdfplumber로 텍스트가 없으면 PyPDF2로 재시도 (fallback)
-                    try:
-                        reader = PdfReader(str(temp_file))
-                        if i - 1 < len(reader.pages):
-                            page_text = (reader.pages[i - 1].extract_text() or "").strip()
-                    except Exception:
-                        page_text = ""
-
-                if not page_text:
-                    logger.warning(f"페이지 {i}에 텍스트가 없습니다. 건너뜁니다.")
-                    continue
-
-                # 문단 단위 분리 (빈 줄 기준)
-                raw_paragraphs = [p.strip() for p in re.split(r"\n{2,}", page_text) if p and p.strip()]
-                if not raw_paragraphs:
-                    # 문단 분리가 어려우면 줄 단위로 최소 분리
-                    raw_paragraphs = [ln.strip() for ln in page_text.splitlines() if ln.strip()]
-
-                # 1차 청크 조립: 문단을 합쳐 목표 토큰 수(약 1200)에 맞게 그룹화
-                chunks_for_page: List[str] = []
-                current_parts: List[str] = []
-                current_tokens = 0
-
-                for para in raw_paragraphs:
-                    para_tokens = count_tokens(para)
-
-                    # 아주 긴 문단은 토큰 기준으로 분할 후 개별 청크로 처리
-                    if para_tokens > target_max_tokens:
-                        if current_parts:
-                            chunks_for_page.append(" ".join(current_parts))
-                            current_parts = []
-                            current_tokens = 0
-                        long_segments = split_text_by_token_limit(para, target_tokens)
-                        chunks_for_page.extend(long_segments)
-                        continue
-
-                    # 현재 청크에 추가 시 목표 토큰 초과 → 현재 청크 확정 후 새로 시작
-                    if current_tokens + para_tokens > target_tokens:
-                        if current_parts:
-                            chunks_for_page.append(" ".join(current_parts))
-                        current_parts = [para]
-                        current_tokens = para_tokens
-                    else:
-                        current_parts.append(para)
-                        current_tokens += para_tokens
-
-                if current_parts:
-                    chunks_for_page.append(" ".join(current_parts))
-
-                if not chunks_for_page:
-                    continue
-
-                # 2차 오버랩 적용: 이전 청크의 마지막 200토큰을 겹쳐 다음 청크 앞에 붙임
-                final_chunks: List[str] = []
-                for idx, ch in enumerate(chunks_for_page):
-                    if idx == 0:
-                        final_chunks.append(ch)
-                    else:
-                        prev_tokens = encoder.encode(chunks_for_page[idx - 1])
-                        overlap_slice = prev_tokens[-overlap_tokens:] if len(prev_tokens) > overlap_tokens else prev_tokens
-                        overlap_text = encoder.decode(overlap_slice)
-                        final_chunks.append((overlap_text + " " + ch).strip())
-
-                # 벡터 생성 및 적재
-                for k, chunk_text in enumerate(final_chunks, start=1):
-                    try:
-                        logger.info(f"페이지 {i}, 청크 {k} 처리 중... (토큰: {count_tokens(chunk_text)})")
-                        embedding = get_embedding(chunk_text)
-                        vector_id = make_ascii_id(f"{base_name}_page{i}_chunk{k}")
-
-                        vectors.append({
-                            "id": vector_id,
-                            "values": embedding,
-                            "metadata": {
-                                "document_name": base_name,
-                                "page": i,
-                                "pdf_total_pages": total_pages,
-                                "chunk": k,
-                                "text": chunk_text,
-                                "text_preview": chunk_text[:200],
-                                "uploaded_at": datetime.utcnow().isoformat()
-                            }
-                        })
-                        logger.info(f"페이지 {i}, 청크 {k} 처리 완료, 벡터 ID: {vector_id}")
-                    except Exception as e:
-                        logger.error(f"청크 처리 중 오류 (페이지 {i}, 청크 {k}): {str(e)}")
-                        continue
-
-        # Pinecone에 업로드
-        if vectors:
-            index = pc.Index("ideadb")
-            index.upsert(vectors=vectors)
-            logger.info(f"총 {len(vectors)}개의 벡터를 Pinecone에 업로드했습니다.")
-            
-            return {
-                "status": "success",
-                "message": f"성공적으로 {len(vectors)}개의 청크를 업로드했습니다.",
-                "document_name": Path(original_filename).stem,
-                "total_pages": total_pages,
-                "total_chunks": len(vectors)
-            }
-        else:
-            error_msg = "처리할 텍스트가 없습니다."
-            logger.warning(error_msg)
-            return {"status": "error", "message": error_msg}
-
+        _set_settings_cache(get_google_sheets_data())
     except Exception as e:
-        error_msg = f"파일 처리 중 오류가 발생했습니다: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=error_msg
-        )
-    finally:
-        # 임시 파일 정리
-        if 'temp_file' in locals() and temp_file.exists():
-            try:
-                temp_file.unlink()
-                logger.info(f"임시 파일 삭제: {temp_file}")
-            except Exception as e:
-                logger.warning(f"임시 파일 삭제 실패: {str(e)}")
+        logger.warning(f'저장 후 설정 재조회 실패, 캐시를 비웁니다: {str(e)}')
+        _invalidate_settings_cache()
+    return {
+        'updated_range': 'A2:H2',
+        'values': row_values
+    }
+
 
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok", "message": "서버가 정상적으로 실행 중입니다."}
 
 
+@app.get("/api/embeddings/stats")
+async def embedding_stats(request: Request):
+    """임베딩 엔진 처리량(tokens/sec) 및 동시성 상태 조회"""
+    user = get_current_user_from_request(request)
+    require_permission(user, 'data-setting', 'view')
+    if embedding_engine is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="임베딩 엔진이 초기화되지 않았습니다.")
+    return {"success": True, "data": embedding_engine.stats()}
+
+
 # ===== Admin Authentication & Management APIs =====
 
 CATEGORIES = [
@@ -1022,6 +1106,7 @@ async def admin_login(body: LoginRequest):
 
 @app.get("/api/admin/me")
 async def admin_me(request: Request):
+    # 관리자 목록과 권한은 warm_auth_caches 미들웨어가 미리 적재
     user = get_current_user_from_request(request)
     perms = _get_permissions(user['username']) if not user.get('is_super_admin') else {c: {"can_view": True, "can_save": True} for c in CATEGORIES}
     return {
@@ -1108,7 +1193,6 @@ async def set_user_permissions(request: Request, body: PermissionsUpdate):
 @app.post("/api/upload")
 async def upload_file(
     request: Request,
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     metadata: str = Form(None)
 ):
@@ -1142,24 +1226,19 @@ async def upload_file(
                 detail="OpenAI 서비스를 사용할 수 없습니다. 관리자에게 문의해주세요."
             )
 
-        file_size = 0
-        CHUNK_SIZE = 1024 * 1024
-        file_content = b""
-
-        while True:
-            chunk = await file.read(CHUNK_SIZE)
-            if not chunk:
-                break
-            file_content += chunk
-            file_size += len(chunk)
-
-            if file_size > MAX_FILE_SIZE:
-                error_msg = f"파일 크기가 제한을 초과했습니다. 최대 {MAX_FILE_SIZE // (1024 * 1024)}MB까지 업로드 가능합니다."
-                print(error_msg)
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=error_msg
-                )
+        # 업로드를 스풀 파일로 한 번만 스트리밍 (해시/크기 검사 동시 수행)
+        # 이 파일 하나를 벡터링 작업과 Drive 업로드가 함께 사용 (Drive는 하드링크)
+        upload_id = uuid.uuid4().hex
+        spooled = spool_path(upload_id, file.filename)
+        try:
+            file_size, file_sha256 = await asyncio.to_thread(_spool_upload, file.file, spooled)
+        except ValueError:
+            error_msg = f"파일 크기가 제한을 초과했습니다. 최대 {MAX_FILE_SIZE // (1024 * 1024)}MB까지 업로드 가능합니다."
+            print(error_msg)
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=error_msg
+            )
 
         print(f"File read successfully. Size: {file_size} bytes")
 
@@ -1167,7 +1246,7 @@ async def upload_file(
         ext = get_file_extension(file.filename)
         if ext == 'docx':
             try:
-                pdf_bytes = convert_docx_bytes_to_pdf_bytes(file_content, file.filename)
+                pdf_bytes = convert_docx_bytes_to_pdf_bytes(spooled.read_bytes(), file.filename)
                 # 변환된 PDF를 /tmp에 저장
                 temp_dir = Path("/tmp")
                 temp_dir.mkdir(exist_ok=True)
@@ -1187,42 +1266,42 @@ async def upload_file(
                 }
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"DOCX → PDF 변환 실패: {e}")
+            finally:
+                spooled.unlink(missing_ok=True)
 
         # 그 외 파일은 기존 로직 수행 (Drive 백그라운드 업로드 + 벡터링)
         drive_upload_scheduled = False
         drive_upload_schedule_error: Optional[str] = None
         try:
-            temp_copy_dir = Path("/tmp")
-            temp_copy_dir.mkdir(exist_ok=True)
-            upload_job_id = uuid.uuid4().hex
-            temp_copy_path = temp_copy_dir / f"drive_{upload_job_id}_{file.filename}"
-            with open(temp_copy_path, "wb") as fcopy:
-                fcopy.write(file_content)
-            background_tasks.add_task(
-                drive_background_upload,
-                str(temp_copy_path),
-                file.filename,
-                upload_job_id
-            )
+            drive_path = drive_spool_path(upload_id, file.filename)
+            _link_or_copy(spooled, drive_path)
+            get_drive_executor().submit(str(drive_path), file.filename, upload_id, file_sha256)
             drive_upload_scheduled = True
-            logger.info(f"Scheduled Google Drive background upload: {temp_copy_path}")
+            logger.info(f"Queued Google Drive upload: {drive_path}")
         except Exception as e:
             drive_upload_schedule_error = str(e)
             logger.warning(f"Failed to schedule Drive upload: {e}")
 
-        result = await process_and_upload_file(file_content, file.filename)
-        logger.info("파일 처리 및 업로드 완료")
+        # 벡터링은 작업 큐에 적재 후 즉시 응답 (워커가 처리, 진행률은 /api/ingest/status/{job_id})
+        ingest_job_id: Optional[str] = None
+        if ext == 'pdf':
+            ingest_job_id = upload_id
+            ingest_queue.enqueue(ingest_job_id, file.filename, str(spooled), file_sha256)
+            logger.info(f"인제스트 작업 등록: {ingest_job_id} ({file.filename})")
+        else:
+            spooled.unlink(missing_ok=True)
 
         response_data = {
             "success": True,
-            "message": "파일이 성공적으로 처리되었습니다.",
+            "message": "파일이 업로드되었습니다. 벡터링은 백그라운드에서 진행됩니다." if ingest_job_id else "파일이 업로드되었습니다.",
             "filename": file.filename,
             "size": file_size,
+            "sha256": file_sha256,
             "uploaded_at": datetime.utcnow().isoformat(),
-            "result": result,
+            "ingest_job_id": ingest_job_id,
             "drive_upload_scheduled": drive_upload_scheduled,
             "drive_upload_schedule_error": drive_upload_schedule_error,
-            "drive_upload_job_id": upload_job_id if drive_upload_scheduled else None
+            "drive_upload_job_id": upload_id if drive_upload_scheduled else None
         }
         print(f"Upload successful: {response_data}")
         return response_data
@@ -1254,6 +1333,26 @@ async def get_drive_upload_status(job_id: str, request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"상태 조회 실패: {e}")
 
+@app.get("/api/upload/drive-stats")
+async def get_drive_upload_stats(request: Request):
+    # Drive 업로드 큐 깊이와 처리량
+    user = get_current_user_from_request(request)
+    require_permission(user, 'data-setting', 'view')
+    return {"success": True, "data": get_drive_executor().stats()}
+
+@app.get("/api/ingest/status/{job_id}")
+async def get_ingest_status(job_id: str, request: Request):
+    """벡터링 작업 상태 및 진행률(페이지/청크) 조회"""
+    user = get_current_user_from_request(request)
+    # 허용: view 또는 save 권한 보유자
+    if not has_permission(user, 'data-setting', 'view', 'save'):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="권한이 없습니다.")
+    job = await asyncio.to_thread(ingest_queue.get, job_id)
+    if job is None:
+        return {"success": True, "data": {"status": "unknown"}}
+    job.pop("path", None)
+    return {"success": True, "data": job}
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
@@ -1361,15 +1460,19 @@ async def save_gpt_settings(settings: GPTSettings, request: Request):
 
 @app.get("/api/load-settings")
 async def load_settings(request: Request):
-    """Google Sheets에서 설정 데이터를 가져오는 API"""
+    """Google Sheets에서 설정 데이터를 가져오는 API (서버 캐시 + ETag/304)"""
     try:
         user = get_current_user_from_request(request)
         require_permission(user, 'prompt-setting', 'view')
-        data = get_google_sheets_data()
-        return {
-            "success": True,
-            "data": data
-        }
+        # revision 확인/시트 조회는 블로킹 호출이므로 스레드에서 실행
+        data, etag = await asyncio.to_thread(get_cached_settings)
+        # no-cache: 브라우저가 매번 If-None-Match로 재검증하고 변경이 없으면 304
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return JSONResponse(content={"success": True, "data": data}, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1409,7 +1512,7 @@ async def get_documents(request: Request):
         user = get_current_user_from_request(request)
         require_permission(user, 'data-setting', 'view')
         # Pinecone 인덱스 접근
-        index = pc.Index("ideadb")
+        index = pc.Index(PINECONE_INDEX_NAME)
 
         # 쿼리할 필터 조건: document_name이 존재하는 벡터
         filter_condition = {"document_name": {"$exists": True}}
@@ -1445,9 +1548,10 @@ async def delete_document(doc_name: str, request: Request):
     try:
         user = get_current_user_from_request(request)
         require_permission(user, 'data-setting', 'save')
-        index = pc.Index("ideadb")
+        index = pc.Index(PINECONE_INDEX_NAME)
         # Pinecone에서 해당 문서명 벡터 삭제
         index.delete(filter={"document_name": doc_name})
+        manifest_store.delete(doc_name)
         return JSONResponse(content={"message": f"'{doc_name}' 문서 벡터 삭제 완료"})
     except Exception as e:
         raise HTTPException(
@@ -1461,65 +1565,138 @@ if __name__ == "__main__":
 
 # ===== Chat history APIs =====
 
+# Sessions/ChatLogs 로컬 미러 (SQLite). 로그는 추가된 행만 증분 동기화,
+# 세션은 스프레드시트 revision이 바뀌었을 때만 다시 읽음
+chat_log_mirror = ChatLogMirror(sheets, CHAT_SPREADSHEET_KEY, CHAT_SHEET_LOGS)
+chat_session_mirror = ChatSessionMirror(sheets, CHAT_SPREADSHEET_KEY, CHAT_SHEET_SESSIONS)
+CHAT_SESSIONS_PAGE_MAX = int(os.getenv("CHAT_SESSIONS_PAGE_MAX", "500"))
+CHAT_LOGS_PAGE_MAX = int(os.getenv("CHAT_LOGS_PAGE_MAX", "1000"))
+CHAT_SEARCH_LIMIT_MAX = int(os.getenv("CHAT_SEARCH_LIMIT_MAX", "100"))
+CHAT_STATS_DEFAULT_DAYS = int(os.getenv("CHAT_STATS_DEFAULT_DAYS", "30"))
+
+
+def _check_date_range(date_from: Optional[str], date_to: Optional[str]) -> None:
+    # 잘못된 from/to가 SQL 조건으로 그대로 들어가지 않도록 미리 검증
+    try:
+        range_bounds(date_from, date_to)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="잘못된 날짜 형식입니다.")
+
+
+async def _sync_mirror(mirror) -> None:
+    try:
+        await asyncio.to_thread(mirror.sync)
+    except Exception as e:
+        # 동기화 실패 시에도 마지막으로 미러링된 데이터로 응답
+        logger.warning(f"채팅 미러 동기화 실패: {e}")
+
 
 @app.get("/api/chat/sessions")
-async def list_chat_sessions(request: Request):
-    """Sessions 시트에서 대화 세션 목록을 조회
+async def list_chat_sessions(
+    request: Request,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    sort: str = 'started_at',
+    order: str = 'desc',
+    date_from: Optional[str] = Query(None, alias='from'),
+    date_to: Optional[str] = Query(None, alias='to'),
+):
+    """대화 세션 목록을 커서 기반으로 페이지 조회
     예상 컬럼: [uuid, started_at, ended_at, message_count]
+    sort: started_at | ended_at | message_count, order: desc | asc, from/to: started_at 기준 날짜 범위
     """
     try:
         user = get_current_user_from_request(request)
         require_permission(user, 'chat-history', 'view')
-        gc = _gs_client()
-        doc = gc.open_by_key(CHAT_SPREADSHEET_KEY)
-        sheet = doc.worksheet(CHAT_SHEET_SESSIONS)
-        # 경량 조회: 필요한 컬럼 범위만 가져오기 (A:D)
-        rows = sheet.get("A:D")
-        if not rows or len(rows) < 2:
-            return []
-        headers = rows[0]
-        data = []
-        for r in rows[1:]:
-            if not any(r):
-                continue
-            item = {}
-            for i, h in enumerate(headers):
-                if i < len(r):
-                    item[h] = r[i]
-            data.append(item)
-        return {"success": True, "data": data}
+        if sort not in SESSION_SORTS or order not in ('asc', 'desc'):
+            raise HTTPException(status_code=400, detail="지원하지 않는 정렬 옵션입니다.")
+        limit = max(1, min(limit, CHAT_SESSIONS_PAGE_MAX))
+        _check_date_range(date_from, date_to)
+        await _sync_mirror(chat_session_mirror)
+        try:
+            data, next_cursor = chat_session_mirror.page(limit, cursor, sort, order, date_from, date_to)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="잘못된 커서입니다.")
+        return {"success": True, "data": data, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"세션 목록 조회 실패: {str(e)}")
 
 
 @app.get("/api/chat/logs/{session_uuid}")
-async def get_chat_logs(session_uuid: str, request: Request):
-    """ChatLogs 시트에서 특정 uuid의 전체 메시지 목록 조회
+async def get_chat_logs(
+    session_uuid: str,
+    request: Request,
+    limit: int = 200,
+    cursor: Optional[str] = None,
+    date_from: Optional[str] = Query(None, alias='from'),
+    date_to: Optional[str] = Query(None, alias='to'),
+):
+    """특정 uuid의 메시지를 시간순으로 커서 기반 페이지 조회
     예상 컬럼: [uuid, role, message, timestamp]
     """
     try:
         user = get_current_user_from_request(request)
         require_permission(user, 'chat-history', 'view')
-        gc = _gs_client()
-        doc = gc.open_by_key(CHAT_SPREADSHEET_KEY)
-        sheet = doc.worksheet(CHAT_SHEET_LOGS)
-        # 경량 조회: 필요한 범위만 가져오기 (전체 열 대신 A:E 등 필요한 최대 열만)
-        rows = sheet.get("A:E")
-        if not rows or len(rows) < 2:
-            return {"success": True, "data": []}
-        headers = rows[0]
-        uuid_idx = headers.index('uuid') if 'uuid' in headers else 0
-        data = []
-        for r in rows[1:]:
-            if len(r) <= uuid_idx:
-                continue
-            if r[uuid_idx] != session_uuid:
-                continue
-            item = {}
-            for i, h in enumerate(headers):
-                if i < len(r):
-                    item[h] = r[i]
-            data.append(item)
+        limit = max(1, min(limit, CHAT_LOGS_PAGE_MAX))
+        _check_date_range(date_from, date_to)
+        # 로컬 미러에 새로 추가된 행만 동기화한 뒤 (uuid, timestamp) 인덱스로 조회
+        await _sync_mirror(chat_log_mirror)
+        try:
+            data, next_cursor = chat_log_mirror.page(session_uuid, limit, cursor, date_from, date_to)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="잘못된 커서입니다.")
+        return {"success": True, "data": data, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"채팅 로그 조회 실패: {str(e)}")
+
+
+@app.get("/api/chat/search")
+async def search_chat_history(request: Request, q: str = '', limit: int = 20):
+    """메시지 본문 전문 검색 (로컬 바이그램 인덱스 사용, 시트는 읽지 않음)
+    q의 모든 단어를 포함하는 메시지가 있는 세션을 최근 순으로 반환하고 세션별 스니펫을 포함
+    """
+    try:
+        user = get_current_user_from_request(request)
+        require_permission(user, 'chat-history', 'view')
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="검색어를 입력하세요.")
+        limit = max(1, min(limit, CHAT_SEARCH_LIMIT_MAX))
+        # 새로 추가된 로그 행만 동기화하면서 인덱스도 함께 갱신됨
+        await _sync_mirror(chat_log_mirror)
+        data = chat_log_mirror.search(q, limit)
+        return {"success": True, "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"채팅 검색 실패: {str(e)}")
+
+
+@app.get("/api/chat/stats")
+async def chat_statistics(
+    request: Request,
+    date_from: Optional[str] = Query(None, alias='from'),
+    date_to: Optional[str] = Query(None, alias='to'),
+):
+    """채팅 통계 (일별 세션/메시지 수, 세션당 메시지 수, 역할 분포, 시간대별 메시지 수)
+    로그 동기화 시 증분 갱신되는 집계 테이블에서 조회하므로 이력 크기와 무관하게 응답
+    from/to: 일별 통계의 날짜 범위 (생략 시 최근 CHAT_STATS_DEFAULT_DAYS일)
+    날짜/시간대 집계와 기본 범위는 모두 CHAT_TIMEZONE 기준
+    """
+    try:
+        user = get_current_user_from_request(request)
+        require_permission(user, 'chat-history', 'view')
+        if not date_from and not date_to:
+            # 서버 로컬 시간이 아닌 집계와 같은 시간대의 오늘 기준
+            date_from = (local_today() - timedelta(days=CHAT_STATS_DEFAULT_DAYS - 1)).isoformat()
+        _check_date_range(date_from, date_to)
+        await _sync_mirror(chat_log_mirror)
+        data = chat_log_mirror.stats(date_from, date_to)
         return {"success": True, "data": data}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"채팅 로그 조회 실패: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"채팅 통계 조회 실패: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,670 @@
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from local_store import connect_sqlite, data_path
+
+
+LOGGER = logging.getLogger(__name__)
+
+CHAT_LOG_COLUMNS = 'A:E'
+CHAT_SESSION_COLUMNS = 'A:D'
+# ChatLogs is treated as append-only; a full re-read at this interval picks up
+# rows that were edited or deleted in place
+CHAT_MIRROR_RESYNC_SECONDS = int(os.getenv('CHAT_MIRROR_RESYNC_SECONDS', str(6 * 3600)))
+
+# Message columns indexed for search, first one present wins
+CHAT_TEXT_FIELDS = ('message', 'content')
+CHAT_SEARCH_SNIPPET_CHARS = int(os.getenv('CHAT_SEARCH_SNIPPET_CHARS', '40'))
+CHAT_SEARCH_SNIPPETS_PER_SESSION = 3
+# Most recent index candidates a search looks at, and how many of them are
+# read and decoded per query
+CHAT_SEARCH_MAX_CANDIDATES = int(os.getenv('CHAT_SEARCH_MAX_CANDIDATES', '5000'))
+CHAT_SEARCH_BATCH = 200
+
+# Timestamps with an explicit offset are converted to this zone before they
+# are stored; ones without an offset are taken to be in it already (Sheets in
+# the Korean locale write local time)
+CHAT_TIMEZONE = os.getenv('CHAT_TIMEZONE', 'Asia/Seoul')
+
+_WORD_RE = re.compile(r'\w+')
+_TS_KEY_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}')
+# (label, lowest, highest) buckets for the messages-per-session distribution
+SESSION_LENGTH_BUCKETS = (('1', 1, 1), ('2', 2, 2), ('3-5', 3, 5), ('6-10', 6, 10),
+                          ('11-20', 11, 20), ('21-50', 21, 50), ('51+', 51, None))
+
+_TS_FORMATS = ('%Y.%m.%d %H:%M:%S', '%Y. %m. %d %H:%M:%S', '%Y/%m/%d %H:%M:%S',
+               '%Y. %m. %d %p %I:%M:%S', '%Y.%m.%d %p %I:%M:%S',
+               '%Y.%m.%d', '%Y. %m. %d', '%Y/%m/%d')
+
+
+def _load_zone(name: str):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        LOGGER.warning("Unknown CHAT_TIMEZONE %r (is tzdata installed?); using UTC", name)
+        return timezone.utc
+
+
+CHAT_ZONE = _load_zone(CHAT_TIMEZONE)
+
+
+def parse_ts(value: Optional[str]) -> Optional[datetime]:
+    """Parse a sheet timestamp into a naive datetime in CHAT_ZONE, or None."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        dt = None
+        # Sheets in the Korean locale write e.g. "2024. 1. 5 오후 3:00:00"
+        text = value.rstrip('.').replace('오전', 'AM').replace('오후', 'PM')
+        for fmt in _TS_FORMATS:
+            try:
+                dt = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(CHAT_ZONE).replace(tzinfo=None)
+    return dt
+
+
+def local_today() -> date:
+    """Today's date in CHAT_ZONE, the zone stats are bucketed in."""
+    return datetime.now(CHAT_ZONE).date()
+
+
+def sortable_ts(value: Optional[str]) -> str:
+    """Normalise a sheet timestamp to 'YYYY-MM-DDTHH:MM:SS' in CHAT_ZONE so it sorts as text.
+
+    Unparseable values are kept as-is (they still sort, just not by time).
+    """
+    dt = parse_ts(value)
+    if dt is None:
+        return (value or '').strip()
+    return dt.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def range_bounds(since: Optional[str], until: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Turn date/datetime filter strings into inclusive sortable_ts bounds.
+
+    Raises ValueError for a bound that is not a recognisable date.
+    """
+    for bound in (since, until):
+        if bound and parse_ts(bound) is None:
+            raise ValueError(f'invalid date: {bound!r}')
+    lo = sortable_ts(since) if since else None
+    hi = sortable_ts(until) if until else None
+    if hi and len(until.strip()) <= 10:
+        # A bare date means "through the end of that day"
+        hi = hi[:10] + 'T23:59:59'
+    return lo, hi
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def bigrams(text: Optional[str], unigrams: bool = False) -> set:
+    """Character bigrams of each word; single-character words count as-is.
+
+    Korean has no reliable word boundaries without a morphological analyser,
+    so bigrams let "회의록" match inside "주간회의록을" as well as in English.
+    With ``unigrams`` every character is added too, which is how messages are
+    indexed so that one-syllable queries like "집" still find longer words.
+    """
+    terms = set()
+    for word in _WORD_RE.findall(normalize_text(text)):
+        if len(word) == 1 or unigrams:
+            terms.update(word)
+        terms.update(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def _message_text(item: Dict[str, str]) -> str:
+    for field in CHAT_TEXT_FIELDS:
+        if item.get(field):
+            return item[field]
+    return ''
+
+
+def _message_role(item: Dict[str, str]) -> str:
+    return (item.get('role') or item.get('type') or 'unknown').strip().lower() or 'unknown'
+
+
+def _snippet(text: str, words: List[str]) -> str:
+    """A window of the message around the first query word it contains."""
+    folded = normalize_text(text)
+    # NFKC can change lengths; fall back to the start of the message then
+    pos = min((folded.find(w) for w in words if w in folded), default=0) if len(folded) == len(text) else 0
+    width = CHAT_SEARCH_SNIPPET_CHARS
+    start = max(0, pos - width)
+    end = min(len(text), pos + width * 2)
+    return ('…' if start > 0 else '') + text[start:end].strip() + ('…' if end < len(text) else '')
+
+
+def encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, key_type: type = str) -> dict:
+    """Decode a cursor, checking its key is ``[key_type value, row number]``."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except Exception:
+        raise ValueError('invalid cursor')
+    key = payload.get('k') if isinstance(payload, dict) else None
+    if not isinstance(key, list) or len(key) != 2:
+        raise ValueError('invalid cursor')
+    # bool is an int subclass; neither it nor a float is a valid key part
+    if type(key[0]) is not key_type or type(key[1]) is not int:
+        raise ValueError('invalid cursor')
+    return payload
+
+
+def _keyset(column: str, order: str, key: Optional[list]) -> Tuple[str, list]:
+    """WHERE fragment for rows strictly after ``key`` in (column, row) order."""
+    if key is None:
+        return '', []
+    op = '<' if order == 'desc' else '>'
+    return f" AND ({column} {op} ? OR ({column} = ? AND row {op} ?))", [key[0], key[0], key[1]]
+
+
+class _SheetMirror:
+    """Shared SQLite plumbing for the chat sheet mirrors."""
+
+    def __init__(self, session, spreadsheet_key: str, sheet_title: str, path=None):
+        self._session = session
+        self._key = spreadsheet_key
+        self._title = sheet_title
+        self._db = connect_sqlite(path or data_path('chat_mirror.sqlite3'))
+        self._lock = threading.Lock()
+        # Held across the Sheets read so concurrent syncs in a process run once
+        self._sync_lock = threading.Lock()
+        columns = [r[1] for r in self._db.execute("PRAGMA table_info(sync_state)").fetchall()]
+        if columns and 'tz' not in columns:
+            # Older layout without the zone: drop it so every mirror re-syncs in full
+            self._db.execute("DROP TABLE IF EXISTS sync_state")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sync_state (
+                sheet TEXT PRIMARY KEY,
+                headers TEXT,
+                last_row INTEGER NOT NULL DEFAULT 1,
+                rev TEXT,
+                full_synced_at REAL NOT NULL DEFAULT 0,
+                synced_at REAL NOT NULL DEFAULT 0,
+                tz TEXT
+            );
+            """
+        )
+
+    def _state(self) -> dict:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT headers, last_row, rev, full_synced_at, tz FROM sync_state WHERE sheet = ?", (self._title,)
+            ).fetchone()
+        if not row or row[4] != CHAT_TIMEZONE:
+            # Never synced, or timestamps were normalised to another zone: start over
+            return {'headers': None, 'last_row': 1, 'rev': None, 'full_synced_at': 0.0}
+        return {'headers': json.loads(row[0]) if row[0] else None, 'last_row': row[1], 'rev': row[2],
+                'full_synced_at': row[3]}
+
+    def _save_state(self, headers: List[str], last_row: int, rev: Optional[str], full_synced_at: float) -> None:
+        # Called inside the caller's transaction
+        self._db.execute(
+            "INSERT INTO sync_state(sheet, headers, last_row, rev, full_synced_at, synced_at, tz) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(sheet) DO UPDATE SET headers = excluded.headers, "
+            "last_row = excluded.last_row, rev = excluded.rev, "
+            "full_synced_at = excluded.full_synced_at, synced_at = excluded.synced_at, tz = excluded.tz",
+            (self._title, json.dumps(headers, ensure_ascii=False), last_row, rev, full_synced_at, time.time(),
+             CHAT_TIMEZONE),
+        )
+
+    def _reset_if_missing(self, table: str, column: str) -> None:
+        # Mirrors are disposable: drop a table from an older layout and re-sync
+        columns = [r[1] for r in self._db.execute(f"PRAGMA table_info({table})").fetchall()]
+        if columns and column not in columns:
+            self._db.execute(f"DROP TABLE {table}")
+            self._db.execute("DELETE FROM sync_state WHERE sheet = ?", (self._title,))
+
+
+class ChatLogMirror(_SheetMirror):
+    """Local SQLite copy of the ChatLogs sheet, indexed by (uuid, timestamp).
+
+    ``sync()`` pulls only the rows below the last mirrored sheet row, and does
+    nothing at all while the spreadsheet revision is unchanged. Rows are keyed
+    by their sheet row number, so re-applying a range is idempotent and
+    several processes can share one database file.
+
+    Message text is also kept in a bigram inverted index (chat_terms), and
+    the chat_stats_* tables hold running aggregates (per day, per hour, per
+    role, per session). Both are updated in the same transaction as the rows,
+    so ``search()`` and ``stats()`` never read the sheet or scan every message.
+    """
+
+    def __init__(self, session, spreadsheet_key: str, sheet_title: str, path=None):
+        super().__init__(session, spreadsheet_key, sheet_title, path)
+        self._reset_if_missing('chat_logs', 'ts_key')
+        tables = {r[0] for r in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not {'chat_terms', 'chat_stats_sessions'} <= tables:
+            # Rows mirrored before the index/aggregates existed: force a full re-sync to build them
+            self._db.execute("DELETE FROM sync_state WHERE sheet = ?", (self._title,))
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chat_logs (
+                row INTEGER PRIMARY KEY,
+                uuid TEXT NOT NULL,
+                ts_key TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chat_logs_uuid_ts ON chat_logs(uuid, ts_key, row);
+            CREATE TABLE IF NOT EXISTS chat_terms (
+                term TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                PRIMARY KEY (term, row)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS chat_stats_sessions (
+                uuid TEXT PRIMARY KEY,
+                messages INTEGER NOT NULL,
+                first_key TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chat_stats_days (
+                day TEXT PRIMARY KEY,
+                sessions INTEGER NOT NULL DEFAULT 0,
+                messages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS chat_stats_hours (
+                hour INTEGER PRIMARY KEY,
+                messages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS chat_stats_roles (
+                role TEXT PRIMARY KEY,
+                messages INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS chat_stats_lengths (
+                messages INTEGER PRIMARY KEY,
+                sessions INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def sync(self) -> int:
+        """Mirror rows appended since the last sync; returns how many were added."""
+        with self._sync_lock:
+            rev = self._session.revision(self._key)
+            state = self._state()
+            now = time.time()
+            full = state['headers'] is None or now - state['full_synced_at'] > CHAT_MIRROR_RESYNC_SECONDS
+            if not full and rev is not None and rev == state['rev']:
+                return 0
+
+            ws = self._session.worksheet(self._key, self._title)
+            start_col, end_col = CHAT_LOG_COLUMNS.split(':')
+            if full:
+                rows = ws.get(CHAT_LOG_COLUMNS)
+                headers = rows[0] if rows else []
+                body, first_row = rows[1:], 2
+            else:
+                headers = state['headers']
+                first_row = state['last_row'] + 1
+                body = ws.get(f"{start_col}{first_row}:{end_col}")
+            records = self._records(headers, body, first_row)
+
+            with self._lock:
+                self._db.execute('BEGIN IMMEDIATE')
+                try:
+                    if full:
+                        self._db.execute("DELETE FROM chat_logs")
+                        self._db.execute("DELETE FROM chat_terms")
+                        for table in ('sessions', 'days', 'hours', 'roles', 'lengths'):
+                            self._db.execute(f"DELETE FROM chat_stats_{table}")
+                    else:
+                        self._db.execute("DELETE FROM chat_terms WHERE row >= ?", (first_row,))
+                        # Rows another process already mirrored are replaced below: take them out first
+                        replaced = self._db.execute(
+                            "SELECT uuid, ts_key, data FROM chat_logs WHERE row >= ?", (first_row,)
+                        ).fetchall()
+                        self._apply_stats(replaced, -1)
+                    self._apply_stats([(rec[1], rec[2], rec[3]) for rec in records], 1)
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO chat_logs(row, uuid, ts_key, data) VALUES (?, ?, ?, ?)", records
+                    )
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO chat_terms(term, row) VALUES (?, ?)",
+                        ((term, rec[0]) for rec in records for term in bigrams(_message_text(json.loads(rec[3])), unigrams=True)),
+                    )
+                    self._save_state(headers, first_row - 1 + len(body), rev,
+                                     now if full else state['full_synced_at'])
+                    self._db.execute('COMMIT')
+                except Exception:
+                    self._db.execute('ROLLBACK')
+                    raise
+            if records:
+                LOGGER.info("Mirrored %d %s rows (%s sync)", len(records), self._title, 'full' if full else 'incremental')
+            return len(records)
+
+    @staticmethod
+    def _records(headers: List[str], rows: List[List[str]], first_row: int) -> list:
+        uuid_idx = headers.index('uuid') if 'uuid' in headers else 0
+        ts_idx = headers.index('timestamp') if 'timestamp' in headers else None
+        records = []
+        for offset, r in enumerate(rows):
+            if len(r) <= uuid_idx or not r[uuid_idx]:
+                continue
+            item = {h: r[i] for i, h in enumerate(headers) if i < len(r)}
+            ts = r[ts_idx] if ts_idx is not None and ts_idx < len(r) else None
+            records.append((first_row + offset, r[uuid_idx], sortable_ts(ts), json.dumps(item, ensure_ascii=False)))
+        return records
+
+    # --- reads ---
+    def page(self, session_uuid: str, limit: int, cursor: Optional[str] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """One page of a session's messages in time order, plus the next cursor."""
+        key = decode_cursor(cursor)['k'] if cursor else None
+        lo, hi = range_bounds(since, until)
+        sql = "SELECT ts_key, row, data FROM chat_logs WHERE uuid = ?"
+        params: list = [session_uuid]
+        if lo:
+            sql += " AND ts_key >= ?"
+            params.append(lo)
+        if hi:
+            sql += " AND ts_key <= ?"
+            params.append(hi)
+        clause, extra = _keyset('ts_key', 'asc', key)
+        sql += clause + " ORDER BY ts_key, row LIMIT ?"
+        params += extra + [limit + 1]
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        next_cursor = encode_cursor({'k': [rows[limit - 1][0], rows[limit - 1][1]]}) if len(rows) > limit else None
+        return [json.loads(r[2]) for r in rows[:limit]], next_cursor
+
+
+    def search(self, query: str, limit: int) -> List[Dict[str, object]]:
+        """Sessions whose messages contain every word of ``query``, newest first.
+
+        The bigram index narrows the candidates to the newest
+        CHAT_SEARCH_MAX_CANDIDATES rows; those are read in batches and checked
+        for the actual words so "회의" does not match "회 의", and the scan
+        stops as soon as ``limit`` sessions are found. ``match_count`` counts
+        the matching messages seen until then. Each session carries up to
+        CHAT_SEARCH_SNIPPETS_PER_SESSION snippets of matching messages.
+        """
+        words = _WORD_RE.findall(normalize_text(query))
+        terms = sorted(bigrams(query))
+        if not terms:
+            return []
+        marks = ', '.join('?' * len(terms))
+        sql = (
+            "SELECT l.row FROM chat_logs l JOIN ("
+            f"SELECT row FROM chat_terms WHERE term IN ({marks}) GROUP BY row HAVING COUNT(*) = ?"
+            ") m ON m.row = l.row ORDER BY l.ts_key DESC, l.row DESC LIMIT ?"
+        )
+        sessions: Dict[str, Dict[str, object]] = {}
+        with self._lock:
+            candidates = [r[0] for r in self._db.execute(sql, terms + [len(terms), CHAT_SEARCH_MAX_CANDIDATES])]
+            for start in range(0, len(candidates), CHAT_SEARCH_BATCH):
+                batch = candidates[start:start + CHAT_SEARCH_BATCH]
+                fetched = dict((r[0], r[1:]) for r in self._db.execute(
+                    f"SELECT row, uuid, data FROM chat_logs WHERE row IN ({', '.join('?' * len(batch))})", batch
+                ))
+                for row in batch:
+                    uuid, data = fetched[row]
+                    item = json.loads(data)
+                    text = _message_text(item)
+                    folded = normalize_text(text)
+                    if not all(w in folded for w in words):
+                        continue
+                    hit = sessions.get(uuid)
+                    if hit is None:
+                        hit = sessions[uuid] = {'uuid': uuid, 'last_matched_at': item.get('timestamp', ''),
+                                                'match_count': 0, 'snippets': []}
+                    hit['match_count'] += 1
+                    if len(hit['snippets']) < CHAT_SEARCH_SNIPPETS_PER_SESSION:
+                        hit['snippets'].append({
+                            'role': item.get('role') or item.get('type', ''),
+                            'timestamp': item.get('timestamp', ''),
+                            'snippet': _snippet(text, words),
+                        })
+                    if len(sessions) >= limit:
+                        return list(sessions.values())
+        return list(sessions.values())
+
+    # --- aggregates ---
+    def _apply_stats(self, rows: List[Tuple[str, str, str]], sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) ``(uuid, ts_key, data)`` messages from the aggregates.
+
+        Called inside the sync transaction. Hours and days come from ts_key,
+        which is already in CHAT_ZONE. A session's day is the day of its
+        earliest message; removing messages does not move it later again
+        (only an in-place edit of the sheet does that, and the periodic full
+        re-sync rebuilds everything).
+        """
+        if not rows:
+            return
+        roles, hours, days = Counter(), Counter(), Counter()
+        sessions: Dict[str, list] = {}
+        for uuid, ts_key, data in rows:
+            roles[_message_role(json.loads(data))] += sign
+            if _TS_KEY_RE.match(ts_key):
+                hours[int(ts_key[11:13])] += sign
+                days[ts_key[:10]] += sign
+            acc = sessions.setdefault(uuid, [0, ''])
+            acc[0] += sign
+            if _TS_KEY_RE.match(ts_key) and (not acc[1] or ts_key < acc[1]):
+                acc[1] = ts_key
+
+        day_sessions, lengths = Counter(), Counter()
+        for uuid, (delta, first_key) in sessions.items():
+            cur = self._db.execute("SELECT messages, first_key FROM chat_stats_sessions WHERE uuid = ?", (uuid,)).fetchone()
+            old_count, old_first = cur if cur else (0, '')
+            new_count = max(0, old_count + delta)
+            new_first = old_first
+            if sign > 0 and first_key and (not old_first or first_key < old_first):
+                new_first = first_key
+            if old_count > 0:
+                lengths[old_count] -= 1
+                if old_first:
+                    day_sessions[old_first[:10]] -= 1
+            if new_count > 0:
+                lengths[new_count] += 1
+                if new_first:
+                    day_sessions[new_first[:10]] += 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO chat_stats_sessions(uuid, messages, first_key) VALUES (?, ?, ?)",
+                    (uuid, new_count, new_first),
+                )
+            else:
+                self._db.execute("DELETE FROM chat_stats_sessions WHERE uuid = ?", (uuid,))
+
+        self._db.executemany(
+            "INSERT INTO chat_stats_roles(role, messages) VALUES (?, ?) "
+            "ON CONFLICT(role) DO UPDATE SET messages = messages + excluded.messages", roles.items()
+        )
+        self._db.executemany(
+            "INSERT INTO chat_stats_hours(hour, messages) VALUES (?, ?) "
+            "ON CONFLICT(hour) DO UPDATE SET messages = messages + excluded.messages", hours.items()
+        )
+        self._db.executemany(
+            "INSERT INTO chat_stats_days(day, sessions, messages) VALUES (?, ?, ?) "
+            "ON CONFLICT(day) DO UPDATE SET sessions = sessions + excluded.sessions, "
+            "messages = messages + excluded.messages",
+            ((day, day_sessions.get(day, 0), days.get(day, 0)) for day in set(days) | set(day_sessions)),
+        )
+        self._db.executemany(
+            "INSERT INTO chat_stats_lengths(messages, sessions) VALUES (?, ?) "
+            "ON CONFLICT(messages) DO UPDATE SET sessions = sessions + excluded.sessions", lengths.items()
+        )
+        self._db.execute("DELETE FROM chat_stats_roles WHERE messages <= 0")
+        self._db.execute("DELETE FROM chat_stats_lengths WHERE sessions <= 0")
+        self._db.execute("DELETE FROM chat_stats_days WHERE sessions <= 0 AND messages <= 0")
+
+    def stats(self, since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, object]:
+        """Chat volume from the precomputed aggregates.
+
+        Cost depends on the number of days asked for and of distinct session
+        lengths, not on how many messages have been mirrored. ``since``/``until``
+        limit only the per-day series; the other figures cover all history.
+        Days and hours are in CHAT_TIMEZONE, which is returned as ``timezone``.
+        """
+        lo, hi = range_bounds(since, until)
+        sql = "SELECT day, sessions, messages FROM chat_stats_days WHERE 1 = 1"
+        params: list = []
+        if lo:
+            sql += " AND day >= ?"
+            params.append(lo[:10])
+        if hi:
+            sql += " AND day <= ?"
+            params.append(hi[:10])
+        with self._lock:
+            per_day = self._db.execute(sql + " ORDER BY day", params).fetchall()
+            hours = dict(self._db.execute("SELECT hour, messages FROM chat_stats_hours").fetchall())
+            roles = self._db.execute("SELECT role, messages FROM chat_stats_roles ORDER BY messages DESC").fetchall()
+            lengths = self._db.execute("SELECT messages, sessions FROM chat_stats_lengths ORDER BY messages").fetchall()
+
+        total_sessions = sum(n for _, n in lengths)
+        total_messages = sum(length * n for length, n in lengths)
+        median = 0
+        seen = 0
+        for length, n in lengths:
+            seen += n
+            if seen * 2 >= total_sessions:
+                median = length
+                break
+        distribution = []
+        for label, low, high in SESSION_LENGTH_BUCKETS:
+            count = sum(n for length, n in lengths if length >= low and (high is None or length <= high))
+            distribution.append({'messages': label, 'sessions': count})
+        hourly = [{'hour': h, 'messages': hours.get(h, 0)} for h in range(24)]
+        return {
+            'timezone': CHAT_TIMEZONE,
+            'totals': {'sessions': total_sessions, 'messages': total_messages},
+            'sessions_per_day': [{'date': d, 'sessions': s, 'messages': m} for d, s, m in per_day],
+            'messages_per_session': {
+                'average': round(total_messages / total_sessions, 2) if total_sessions else 0,
+                'median': median,
+                'max': lengths[-1][0] if lengths else 0,
+                'distribution': distribution,
+            },
+            'roles': [{'role': r, 'messages': m} for r, m in roles],
+            'hours': hourly,
+            'busiest_hours': sorted((h for h in hourly if h['messages']), key=lambda h: -h['messages'])[:3],
+        }
+
+SESSION_SORTS = {'started_at': 'started_key', 'ended_at': 'ended_key', 'message_count': 'message_count'}
+
+
+class ChatSessionMirror(_SheetMirror):
+    """Local SQLite copy of the Sessions sheet for sorted, paginated listing.
+
+    Session rows are updated in place (ended_at, message_count), so the sheet
+    is re-read whenever the spreadsheet revision changes rather than
+    appended to.
+    """
+
+    def __init__(self, session, spreadsheet_key: str, sheet_title: str, path=None):
+        super().__init__(session, spreadsheet_key, sheet_title, path)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                row INTEGER PRIMARY KEY,
+                uuid TEXT NOT NULL,
+                started_key TEXT NOT NULL,
+                ended_key TEXT NOT NULL,
+                message_count INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chat_sessions_started ON chat_sessions(started_key, row);
+            CREATE INDEX IF NOT EXISTS chat_sessions_ended ON chat_sessions(ended_key, row);
+            CREATE INDEX IF NOT EXISTS chat_sessions_count ON chat_sessions(message_count, row);
+            """
+        )
+
+    def sync(self) -> int:
+        """Re-read Sessions if the spreadsheet changed; returns the row count mirrored."""
+        with self._sync_lock:
+            rev = self._session.revision(self._key)
+            state = self._state()
+            if state['headers'] is not None and rev is not None and rev == state['rev']:
+                return 0
+            rows = self._session.worksheet(self._key, self._title).get(CHAT_SESSION_COLUMNS)
+            headers = rows[0] if rows else []
+            records = self._records(headers, rows[1:])
+            with self._lock:
+                self._db.execute('BEGIN IMMEDIATE')
+                try:
+                    self._db.execute("DELETE FROM chat_sessions")
+                    self._db.executemany(
+                        "INSERT INTO chat_sessions(row, uuid, started_key, ended_key, message_count, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", records
+                    )
+                    self._save_state(headers, len(rows), rev, time.time())
+                    self._db.execute('COMMIT')
+                except Exception:
+                    self._db.execute('ROLLBACK')
+                    raise
+            return len(records)
+
+    @staticmethod
+    def _records(headers: List[str], rows: List[List[str]]) -> list:
+        def col(name: str, default: int) -> int:
+            return headers.index(name) if name in headers else default
+
+        uuid_idx, started_idx, ended_idx, count_idx = col('uuid', 0), col('started_at', 1), col('ended_at', 2), col('message_count', 3)
+        records = []
+        for offset, r in enumerate(rows):
+            if len(r) <= uuid_idx or not r[uuid_idx]:
+                continue
+            cell = lambda i: r[i] if i < len(r) else ''
+            try:
+                count = int(float(cell(count_idx) or 0))
+            except ValueError:
+                count = 0
+            item = {h: r[i] for i, h in enumerate(headers) if i < len(r)}
+            records.append((offset + 2, r[uuid_idx], sortable_ts(cell(started_idx)), sortable_ts(cell(ended_idx)),
+                            count, json.dumps(item, ensure_ascii=False)))
+        return records
+
+    def page(self, limit: int, cursor: Optional[str] = None, sort: str = 'started_at', order: str = 'desc',
+             since: Optional[str] = None, until: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """One page of sessions sorted by ``sort``; date filters apply to started_at."""
+        column = SESSION_SORTS[sort]
+        key = None
+        if cursor:
+            payload = decode_cursor(cursor, int if column == 'message_count' else str)
+            if payload.get('s') != sort or payload.get('o') != order:
+                raise ValueError('cursor does not match sort order')
+            key = payload['k']
+        lo, hi = range_bounds(since, until)
+        sql = f"SELECT {column}, row, data FROM chat_sessions WHERE 1 = 1"
+        params: list = []
+        if lo:
+            sql += " AND started_key >= ?"
+            params.append(lo)
+        if hi:
+            sql += " AND started_key <= ?"
+            params.append(hi)
+        clause, extra = _keyset(column, order, key)
+        direction = 'DESC' if order == 'desc' else 'ASC'
+        sql += clause + f" ORDER BY {column} {direction}, row {direction} LIMIT ?"
+        params += extra + [limit + 1]
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor({'s': sort, 'o': order, 'k': [last[0], last[1]]})
+        return [json.loads(r[2]) for r in rows[:limit]], next_cursor
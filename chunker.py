@@ -0,0 +1,187 @@
+import logging
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+import tiktoken
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Chunking targets (tokens)
+TARGET_TOKENS = 1200
+TARGET_MAX_TOKENS = 1500
+OVERLAP_TOKENS = 200
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model: str):
+    """tiktoken encoder for the model, built once per process."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+class Chunk(NamedTuple):
+    text: str
+    n_tokens: int
+
+
+def split_paragraphs(page_text: str) -> List[str]:
+    # 문단 단위 분리 (빈 줄 기준)
+    paragraphs = [p.strip() for p in re.split(r"\n{2,}", page_text) if p and p.strip()]
+    if not paragraphs:
+        # 문단 분리가 어려우면 줄 단위로 최소 분리
+        paragraphs = [ln.strip() for ln in page_text.splitlines() if ln.strip()]
+    return paragraphs
+
+
+class TokenChunker:
+    """Paragraph-aware token chunker that encodes each page once.
+
+    Paragraphs are encoded a single time and laid out in one token array,
+    joined by the token for " ". Chunks are (start, end) spans over that
+    array: paragraphs are grouped up to ``target_tokens`` and paragraphs
+    longer than ``max_tokens`` are cut every ``target_tokens`` tokens.
+
+    Each chunk after the first is prefixed with the last ``overlap_tokens``
+    of the previous chunk's text, re-encoded. Taking them from the span
+    instead would differ wherever BPE merges across a paragraph join or a
+    cut splits a multi-byte character. The text is therefore identical to
+    ``_legacy_chunk``. ``n_tokens`` adds up the overlap, separator and
+    paragraph token counts without re-encoding the joined text. BPE can merge
+    a separator into the next word, so it may overestimate by up to about one
+    token per paragraph join, which keeps embedding batch budgets on the safe
+    side.
+    """
+
+    def __init__(self, model: str, target_tokens: int = TARGET_TOKENS,
+                 max_tokens: int = TARGET_MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS):
+        self.encoder = get_encoder(model)
+        self.target_tokens = target_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._sep = self.encoder.encode(" ")
+
+    def _spans(self, page_text: str) -> Tuple[List[int], List[Tuple[int, int]]]:
+        tokens: List[int] = []
+        spans: List[Tuple[int, int]] = []
+        group_start = -1
+        group_tokens = 0
+
+        def close_group():
+            nonlocal group_start, group_tokens
+            if group_start >= 0:
+                spans.append((group_start, len(tokens)))
+            group_start, group_tokens = -1, 0
+
+        for para in split_paragraphs(page_text):
+            para_ids = self.encoder.encode(para)
+            n = len(para_ids)
+            if n > self.max_tokens:
+                # 아주 긴 문단은 토큰 기준으로 분할 후 개별 청크로 처리
+                close_group()
+                if tokens:
+                    tokens.extend(self._sep)
+                base = len(tokens)
+                tokens.extend(para_ids)
+                for start in range(0, n, self.target_tokens):
+                    spans.append((base + start, base + min(start + self.target_tokens, n)))
+                continue
+            # 현재 청크에 추가 시 목표 토큰 초과 → 현재 청크 확정 후 새로 시작
+            if group_start >= 0 and group_tokens + n > self.target_tokens:
+                close_group()
+            if tokens:
+                tokens.extend(self._sep)
+            if group_start < 0:
+                group_start = len(tokens)
+            tokens.extend(para_ids)
+            group_tokens += n
+        close_group()
+        return tokens, spans
+
+    def chunk(self, page_text: str) -> List[Chunk]:
+        decode = self.encoder.decode
+        tokens, spans = self._spans(page_text)
+        chunks: List[Chunk] = []
+        prev_body = None
+        for start, end in spans:
+            body = decode(tokens[start:end])
+            if not body.strip():
+                continue
+            if prev_body is None:
+                chunks.append(Chunk(body, end - start))
+            else:
+                # 오버랩: 이전 청크 텍스트를 다시 인코딩해 마지막 토큰을 다음 청크 앞에 붙임
+                tail = self.encoder.encode(prev_body)[-self.overlap_tokens:]
+                text = (decode(tail) + " " + body).strip()
+                chunks.append(Chunk(text, len(tail) + len(self._sep) + (end - start)))
+            prev_body = body
+        return chunks
+
+
+######################################################################
+# Micro-benchmark: python chunker.py [<page_text.txt> ...]
+######################################################################
+def _legacy_chunk(page_text: str, model: str) -> List[str]:
+    """The previous per-paragraph/per-chunk re-encoding chunker, for comparison."""
+    encoder = get_encoder(model)
+    chunks: List[str] = []
+    parts: List[str] = []
+    current = 0
+    for para in split_paragraphs(page_text):
+        n = len(encoder.encode(para))
+        if n > TARGET_MAX_TOKENS:
+            if parts:
+                chunks.append(" ".join(parts))
+                parts, current = [], 0
+            ids = encoder.encode(para)
+            chunks.extend(s for s in (encoder.decode(ids[i:i + TARGET_TOKENS]) for i in range(0, len(ids), TARGET_TOKENS)) if s.strip())
+            continue
+        if current + n > TARGET_TOKENS:
+            if parts:
+                chunks.append(" ".join(parts))
+            parts, current = [para], n
+        else:
+            parts.append(para)
+            current += n
+    if parts:
+        chunks.append(" ".join(parts))
+    final: List[str] = []
+    for idx, ch in enumerate(chunks):
+        if idx == 0:
+            final.append(ch)
+        else:
+            prev = encoder.encode(chunks[idx - 1])
+            final.append((encoder.decode(prev[-OVERLAP_TOKENS:]) + " " + ch).strip())
+    for ch in final:
+        len(encoder.encode(ch))  # the old per-chunk token count for logging
+    return final
+
+
+def _benchmark(pages: List[str], model: str = 'text-embedding-3-small', rounds: int = 5) -> None:
+    import time
+
+    encoder = get_encoder(model)
+    n_tokens = sum(len(encoder.encode(p)) for p in pages) * rounds
+    chunker = TokenChunker(model)
+    for name, fn in (('legacy', lambda p: _legacy_chunk(p, model)), ('token-offset', chunker.chunk)):
+        started = time.perf_counter()
+        n_chunks = 0
+        for _ in range(rounds):
+            for page in pages:
+                n_chunks += len(fn(page))
+        elapsed = time.perf_counter() - started
+        print(f"{name:<14} {n_tokens / elapsed:>12,.0f} tokens/s  {n_chunks // rounds:>5} chunks  {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1:
+        sample_pages = [open(path, encoding='utf-8').read() for path in sys.argv[1:]]
+    else:
+        paragraph = "관리자 페이지 업로드 문서의 예시 문단입니다. The quick brown fox jumps over the lazy dog. " * 12
+        sample_pages = ["\n\n".join([paragraph] * 20), paragraph * 40]
+    _benchmark(sample_pages)
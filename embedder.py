@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from openai import RateLimitError
+
+from embedding_cache import cache_key
+
+
+LOGGER = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small')
+EMBEDDING_DIMENSIONS = int(os.getenv('OPENAI_EMBEDDING_DIMENSIONS', '1536'))
+
+# Per-request limits for client.embeddings.create
+# (API hard limits: 2048 inputs, ~300k tokens per request, 8191 tokens per input)
+EMBED_BATCH_MAX_TOKENS = int(os.getenv('EMBED_BATCH_MAX_TOKENS', '100000'))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv('EMBED_BATCH_MAX_ITEMS', '256'))
+
+
+# (chunk_id, text, token_count)
+BatchItem = Tuple[str, str, int]
+
+
+def pack_batches(items: Iterable[BatchItem], max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+                 max_items: int = EMBED_BATCH_MAX_ITEMS) -> Iterator[List[BatchItem]]:
+    """Group (chunk_id, text, token_count) items into request-sized batches.
+
+    Token counts come from the chunker, so texts are not encoded again here.
+    A batch is closed as soon as adding the next text would exceed either the
+    token budget or the item-count limit. A single text larger than the token
+    budget is still sent on its own.
+    """
+    batch: List[BatchItem] = []
+    batch_tokens = 0
+    for chunk_id, text, n_tokens in items:
+        if batch and (batch_tokens + n_tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((chunk_id, text, n_tokens))
+        batch_tokens += n_tokens
+    if batch:
+        yield batch
+
+
+######################################################################
+# Async, rate-limit-aware engine
+######################################################################
+EMBED_MAX_CONCURRENCY = int(os.getenv('EMBED_MAX_CONCURRENCY', '8'))
+# Back off when less than this fraction of the per-minute quota is left
+EMBED_RATE_LOW_WATERMARK = float(os.getenv('EMBED_RATE_LOW_WATERMARK', '0.1'))
+EMBED_RATE_LIMIT_RETRIES = 5
+_STATS_WINDOW_SECONDS = 60.0
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+class EmbeddingRateLimited(Exception):
+    """The API kept answering 429 after EMBED_RATE_LIMIT_RETRIES waits.
+
+    Splitting the batch would only multiply the requests being throttled, so
+    this is raised to the caller instead of being handled by bisection.
+    """
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds."""
+    if not value:
+        return None
+    total = 0.0
+    matched = False
+    for amount, unit in _DURATION_RE.findall(value):
+        matched = True
+        total += float(amount) * {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}[unit]
+    return total if matched else None
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class _AdaptiveLimiter:
+    """Concurrency gate whose ceiling can be moved between 1 and max_limit."""
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def set_limit(self, limit: int) -> None:
+        limit = min(self.max_limit, max(1, limit))
+        if limit == self.limit:
+            return
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+
+class AsyncEmbeddingEngine:
+    """Concurrent embeddings on an ``AsyncOpenAI`` client.
+
+    Batches are packed with ``pack_batches`` and sent with up to
+    ``max_concurrency`` requests in flight. After every response the
+    x-ratelimit-* headers are read: the ceiling is halved when the remaining
+    request or token quota drops below the low watermark and grows back by one
+    while there is headroom. 429s shrink the ceiling and wait for the reset
+    instead of splitting the batch; if they persist, ``EmbeddingRateLimited``
+    is raised. Any other failing request is split in half and retried
+    recursively, so one bad input only loses itself.
+
+    With an ``EmbeddingCache`` attached, known texts are served from disk and
+    only misses reach the API.
+    """
+
+    def __init__(self, client, model: str = EMBEDDING_MODEL, max_concurrency: int = EMBED_MAX_CONCURRENCY,
+                 max_tokens: int = EMBED_BATCH_MAX_TOKENS, max_items: int = EMBED_BATCH_MAX_ITEMS,
+                 cache=None):
+        self.client = client
+        self.model = model
+        self.cache = cache
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self._limiter = _AdaptiveLimiter(max_concurrency)
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._rate: Dict[str, Optional[float]] = {}
+        self.total_tokens = 0
+        self.total_requests = 0
+        self.rate_limited = 0
+
+    # --- rate-limit bookkeeping ---
+    async def _observe(self, headers) -> None:
+        remaining_requests = _header_int(headers, 'x-ratelimit-remaining-requests')
+        remaining_tokens = _header_int(headers, 'x-ratelimit-remaining-tokens')
+        limit_requests = _header_int(headers, 'x-ratelimit-limit-requests')
+        limit_tokens = _header_int(headers, 'x-ratelimit-limit-tokens')
+        self._rate = {
+            'remaining_requests': remaining_requests,
+            'remaining_tokens': remaining_tokens,
+            'reset_requests_s': _parse_reset(headers.get('x-ratelimit-reset-requests')),
+            'reset_tokens_s': _parse_reset(headers.get('x-ratelimit-reset-tokens')),
+        }
+        fractions = []
+        if remaining_requests is not None and limit_requests:
+            fractions.append(remaining_requests / limit_requests)
+        if remaining_tokens is not None and limit_tokens:
+            fractions.append(remaining_tokens / limit_tokens)
+        if not fractions:
+            return
+        if min(fractions) < EMBED_RATE_LOW_WATERMARK:
+            await self._limiter.set_limit(self._limiter.limit // 2)
+        else:
+            await self._limiter.set_limit(self._limiter.limit + 1)
+
+    def _record(self, n_tokens: int) -> None:
+        now = time.monotonic()
+        self._window.append((now, n_tokens))
+        while self._window and now - self._window[0][0] > _STATS_WINDOW_SECONDS:
+            self._window.popleft()
+        self.total_tokens += n_tokens
+        self.total_requests += 1
+
+    def stats(self) -> dict:
+        """Throughput and limiter state, for tuning EMBED_MAX_CONCURRENCY."""
+        now = time.monotonic()
+        recent = [(t, n) for t, n in self._window if now - t <= _STATS_WINDOW_SECONDS]
+        tokens_per_sec = 0.0
+        if recent:
+            span = max(now - recent[0][0], 1.0)
+            tokens_per_sec = sum(n for _, n in recent) / span
+        return {
+            'model': self.model,
+            'tokens_per_sec': round(tokens_per_sec, 1),
+            'total_tokens': self.total_tokens,
+            'total_requests': self.total_requests,
+            'rate_limited': self.rate_limited,
+            'concurrency_limit': self._limiter.limit,
+            'max_concurrency': self._limiter.max_limit,
+            'in_flight': self._limiter.in_flight,
+            'rate_limit': dict(self._rate),
+            'cache': self.cache.stats() if self.cache else None,
+        }
+
+    # --- requests ---
+    async def _request(self, batch: List[BatchItem]) -> List[List[float]]:
+        texts = [text for _, text, _ in batch]
+        for attempt in range(1, EMBED_RATE_LIMIT_RETRIES + 1):
+            await self._limiter.acquire()
+            try:
+                raw = await self.client.embeddings.with_raw_response.create(model=self.model, input=texts)
+            except RateLimitError as e:
+                self.rate_limited += 1
+                await self._limiter.set_limit(self._limiter.limit // 2)
+                headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+                wait = (_parse_reset(headers.get('x-ratelimit-reset-tokens'))
+                        or _parse_reset(headers.get('x-ratelimit-reset-requests'))
+                        or float(attempt))
+                LOGGER.warning("Embedding rate limited (attempt %d/%d); waiting %.2fs", attempt, EMBED_RATE_LIMIT_RETRIES, wait)
+                await asyncio.sleep(wait)
+                continue
+            finally:
+                await self._limiter.release()
+            await self._observe(raw.headers)
+            response = raw.parse()
+            data = sorted(response.data, key=lambda d: d.index)
+            if len(data) != len(texts):
+                raise RuntimeError(f"embedding count mismatch: sent {len(texts)}, got {len(data)}")
+            self._record(sum(t for _, _, t in batch))
+            return [d.embedding for d in data]
+        raise EmbeddingRateLimited(f"rate limited {EMBED_RATE_LIMIT_RETRIES} times in a row")
+
+    async def _embed_batch(self, batch: List[BatchItem], out: Dict[str, List[float]], failed: List[str]) -> None:
+        try:
+            vectors = await self._request(batch)
+        except EmbeddingRateLimited:
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                LOGGER.error("Embedding failed for chunk %s: %s", batch[0][0], e)
+                failed.append(batch[0][0])
+                return
+            mid = len(batch) // 2
+            LOGGER.warning("Embedding batch of %d failed (%s); splitting into %d + %d", len(batch), e, mid, len(batch) - mid)
+            await asyncio.gather(
+                self._embed_batch(batch[:mid], out, failed),
+                self._embed_batch(batch[mid:], out, failed),
+            )
+            return
+        for (chunk_id, _, _), vector in zip(batch, vectors):
+            out[chunk_id] = vector
+
+    async def embed(self, items: Iterable[BatchItem]) -> Tuple[Dict[str, List[float]], List[str]]:
+        """Embed (chunk_id, text, token_count) items concurrently.
+
+        Returns (vectors by chunk id, ids that could not be embedded). Raises
+        ``EmbeddingRateLimited`` when the API keeps throttling.
+        """
+        out: Dict[str, List[float]] = {}
+        failed: List[str] = []
+        items = list(items)
+        keys: Dict[str, bytes] = {}
+        if self.cache is not None:
+            keys = {chunk_id: cache_key(self.model, text) for chunk_id, text, _ in items}
+            try:
+                cached = await asyncio.to_thread(self.cache.get_many, list(set(keys.values())))
+            except Exception as e:
+                LOGGER.warning("Embedding cache lookup failed: %s", e)
+                cached = {}
+            for chunk_id, key in keys.items():
+                if key in cached:
+                    out[chunk_id] = cached[key]
+            items = [item for item in items if item[0] not in out]
+        if items:
+            batches = list(pack_batches(items, self.max_tokens, self.max_items))
+            await asyncio.gather(*(self._embed_batch(b, out, failed) for b in batches))
+            if self.cache is not None:
+                fresh = [(keys[chunk_id], out[chunk_id]) for chunk_id, _, _ in items if chunk_id in out]
+                try:
+                    await asyncio.to_thread(self.cache.put_many, fresh)
+                except Exception as e:
+                    LOGGER.warning("Embedding cache store failed: %s", e)
+        return out, failed
@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from local_store import connect_sqlite, data_path
+
+
+LOGGER = logging.getLogger(__name__)
+
+EMBED_CACHE_ENABLED = os.getenv('EMBED_CACHE_ENABLED', 'true').lower() == 'true'
+EMBED_CACHE_MAX_BYTES = int(os.getenv('EMBED_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# Fraction of the cache freed at once when it is full
+_EVICT_FRACTION = 0.05
+# cache_key() digest size; each slot is tagged with the key it holds
+_KEY_BYTES = 32
+
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\n{text}".encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk embedding cache.
+
+    Vectors live in a fixed-size memory-mapped float32 matrix; a SQLite table
+    maps sha256(model, text) to a row of that matrix and tracks last use for
+    LRU eviction. Slot allocation happens inside an IMMEDIATE transaction, so
+    several worker processes can share one cache directory.
+
+    A parallel memory-mapped array tags every slot with the key whose vector it
+    holds. Rows are written only after the allocation commits, with the tag
+    cleared first and set last, and readers check the tag before and after
+    copying a row. A slot that another process is evicting or rewriting is
+    therefore read as a miss, never as another key's vector.
+    """
+
+    def __init__(self, dim: int, max_bytes: int = EMBED_CACHE_MAX_BYTES, name: Optional[str] = None):
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4))
+        name = name or f"embeddings_{dim}"
+        self._matrix_path = data_path('embedding_cache', f"{name}.f32")
+        self._tags_path = data_path('embedding_cache', f"{name}.keys")
+        self._db = connect_sqlite(data_path('embedding_cache', f"{name}.sqlite3"))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._init_db()
+        self._matrix, self._tags = self._open_matrix()
+
+    def _init_db(self) -> None:
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key BLOB PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+            CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+
+    def _open_matrix(self) -> Tuple[np.memmap, np.memmap]:
+        expected = self.capacity * self.dim * 4
+        expected_tags = self.capacity * _KEY_BYTES
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'capacity'").fetchone()
+        if (not self._matrix_path.exists() or self._matrix_path.stat().st_size != expected
+                or not self._tags_path.exists() or self._tags_path.stat().st_size != expected_tags
+                or not row or row[0] != self.capacity):
+            # New cache or capacity changed: start over
+            with self._lock:
+                self._db.execute('BEGIN IMMEDIATE')
+                try:
+                    self._db.execute('DELETE FROM entries')
+                    self._db.execute('DELETE FROM free_slots')
+                    self._db.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('capacity', ?)", (self.capacity,))
+                    self._db.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('next_slot', 0)")
+                    with open(self._matrix_path, 'wb') as f:
+                        f.truncate(expected)
+                    with open(self._tags_path, 'wb') as f:
+                        f.truncate(expected_tags)
+                    self._db.execute('COMMIT')
+                except Exception:
+                    self._db.execute('ROLLBACK')
+                    raise
+            LOGGER.info("Initialized embedding cache at %s (%d slots)", self._matrix_path, self.capacity)
+        matrix = np.memmap(self._matrix_path, dtype=np.float32, mode='r+', shape=(self.capacity, self.dim))
+        tags = np.memmap(self._tags_path, dtype=np.uint8, mode='r+', shape=(self.capacity, _KEY_BYTES))
+        return matrix, tags
+
+    def _read_slot(self, slot: int, key: bytes) -> Optional[List[float]]:
+        # The tag is re-checked after the copy: a writer clears it before
+        # touching the row, so a match on both sides means the row is intact
+        if self._tags[slot].tobytes() != key:
+            return None
+        vector = self._matrix[slot].tolist()
+        if self._tags[slot].tobytes() != key:
+            return None
+        return vector
+
+    def _write_slot(self, slot: int, key: bytes, vector: List[float]) -> None:
+        self._tags[slot] = 0
+        self._matrix[slot] = vector
+        self._tags[slot] = np.frombuffer(key, dtype=np.uint8)
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found: Dict[bytes, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ','.join('?' * len(part))
+                rows = self._db.execute(f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", part).fetchall()
+                for key, slot in rows:
+                    vector = self._read_slot(slot, bytes(key))
+                    if vector is not None:
+                        found[bytes(key)] = vector
+            if found:
+                now = time.time()
+                self._db.execute('BEGIN')
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self._db.execute('COMMIT')
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _allocate(self, n: int) -> List[int]:
+        slots = [r[0] for r in self._db.execute("SELECT slot FROM free_slots LIMIT ?", (n,)).fetchall()]
+        if slots:
+            self._db.executemany("DELETE FROM free_slots WHERE slot = ?", [(s,) for s in slots])
+        if len(slots) < n:
+            next_slot = self._db.execute("SELECT value FROM meta WHERE name = 'next_slot'").fetchone()[0]
+            take = min(n - len(slots), self.capacity - next_slot)
+            if take > 0:
+                slots.extend(range(next_slot, next_slot + take))
+                self._db.execute("UPDATE meta SET value = ? WHERE name = 'next_slot'", (next_slot + take,))
+        if len(slots) < n:
+            # Full: evict least recently used entries and reuse their slots
+            n_evict = max(n - len(slots), int(self.capacity * _EVICT_FRACTION))
+            victims = self._db.execute("SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (n_evict,)).fetchall()
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            self.evictions += len(victims)
+            freed = [s for _, s in victims]
+            need = n - len(slots)
+            slots.extend(freed[:need])
+            if freed[need:]:
+                self._db.executemany("INSERT INTO free_slots(slot) VALUES (?)", [(s,) for s in freed[need:]])
+        return slots
+
+    def put_many(self, items: Iterable[Tuple[bytes, List[float]]]) -> None:
+        items = [(k, v) for k, v in items if len(v) == self.dim]
+        if not items:
+            return
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                existing: Dict[bytes, int] = {}
+                for start in range(0, len(items), 500):
+                    part = [k for k, _ in items[start:start + 500]]
+                    placeholders = ','.join('?' * len(part))
+                    existing.update((bytes(r[0]), r[1]) for r in self._db.execute(
+                        f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", part).fetchall())
+                unique = dict(items)
+                new_items = [(k, v) for k, v in unique.items() if k not in existing]
+                slots = self._allocate(len(new_items))
+                now = time.time()
+                self._db.executemany("INSERT INTO entries(key, slot, last_used) VALUES (?, ?, ?)",
+                                     [(key, slot, now) for (key, _), slot in zip(new_items, slots)])
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+            # Rows are written only once the slots are committed to their keys.
+            # Entries whose row was never written (a writer died after commit)
+            # have a mismatched tag and are rewritten here.
+            writes = [(slot, key, vector) for (key, vector), slot in zip(new_items, slots)]
+            writes += [(slot, key, unique[key]) for key, slot in existing.items()
+                       if self._tags[slot].tobytes() != key]
+            for slot, key, vector in writes:
+                self._write_slot(slot, key, vector)
+            if writes:
+                self._matrix.flush()
+                self._tags.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
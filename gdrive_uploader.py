@@ -4,10 +4,17 @@ import pickle
 import re
 import mimetypes
 import time
+import hashlib
 import json
+import queue
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Deque, Dict, Tuple
 
+import httplib2
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
@@ -15,6 +22,8 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials as SA_Credentials
 
+from local_store import connect_sqlite, data_path
+
 
 LOGGER = logging.getLogger(__name__)
 
@@ -41,22 +50,109 @@ _FALLBACK_TOKEN_FILE = str(_TMP_DIR / 'token.pickle')
 # Upload destination in Google Drive
 PARENT_FOLDER_ID = os.getenv('GOOGLE_DRIVE_PARENT_FOLDER_ID', '1EI-8lUCEUGobF8AbxD7mwdmap-SgnI07')
 ######################################################################
-# In-memory background upload status store
+# Persistent upload status store (shared by all uvicorn workers)
 ######################################################################
-UPLOAD_STATUS: Dict[str, dict] = {}
+DRIVE_STATUS_TTL_SECONDS = int(os.getenv('GOOGLE_DRIVE_STATUS_TTL_SECONDS', str(24 * 3600)))
+DRIVE_STATUS_MAX_ROWS = int(os.getenv('GOOGLE_DRIVE_STATUS_MAX_ROWS', '10000'))
+# Eviction runs at most this often; status writes in between stay a single upsert
+_STATUS_PRUNE_INTERVAL = 60.0
+
+
+class UploadStatusStore:
+    """Drive upload job status on SQLite, keyed by job id.
 
-def _set_status(job_id: Optional[str], status: str, detail: Optional[str] = None, drive_file: Optional[dict] = None) -> None:
+    Rows expire DRIVE_STATUS_TTL_SECONDS after their last update and the
+    table is capped at DRIVE_STATUS_MAX_ROWS (oldest updates dropped first).
+    """
+
+    def __init__(self, path=None, ttl: int = DRIVE_STATUS_TTL_SECONDS, max_rows: int = DRIVE_STATUS_MAX_ROWS):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._db = connect_sqlite(path or data_path('drive_upload_status.sqlite3'))
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS upload_status (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                detail TEXT,
+                drive_file TEXT,
+                progress TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS upload_status_updated ON upload_status(updated_at);
+            """
+        )
+
+    def set(self, job_id: str, status: str, detail: Optional[str], drive_file: Optional[dict],
+            progress: Optional[dict]) -> None:
+        now = time.time()
+        with self._lock:
+            # Keep the last known byte progress when a status update carries none
+            self._db.execute(
+                "INSERT INTO upload_status(job_id, status, detail, drive_file, progress, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, detail = excluded.detail, "
+                "drive_file = excluded.drive_file, progress = COALESCE(excluded.progress, upload_status.progress), "
+                "updated_at = excluded.updated_at",
+                (job_id, status, detail, json.dumps(drive_file) if drive_file is not None else None,
+                 json.dumps(progress) if progress is not None else None, now),
+            )
+            if now - self._last_prune >= _STATUS_PRUNE_INTERVAL:
+                self._last_prune = now
+                self._prune(now)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, detail, drive_file, progress, updated_at FROM upload_status "
+                "WHERE job_id = ? AND updated_at >= ?",
+                (job_id, time.time() - self.ttl),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            'status': row[0],
+            'detail': row[1],
+            'drive_file': json.loads(row[2]) if row[2] else None,
+            'progress': json.loads(row[3]) if row[3] else None,
+            'updated_at': row[4],
+        }
+
+    def _prune(self, now: float) -> None:
+        self._db.execute("DELETE FROM upload_status WHERE updated_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM upload_status WHERE updated_at < ("
+            "SELECT updated_at FROM upload_status ORDER BY updated_at DESC LIMIT 1 OFFSET ?)",
+            (self.max_rows - 1,),
+        )
+
+
+_status_store: Optional[UploadStatusStore] = None
+_status_store_lock = threading.Lock()
+
+
+def _get_status_store() -> UploadStatusStore:
+    global _status_store
+    with _status_store_lock:
+        if _status_store is None:
+            _status_store = UploadStatusStore()
+        return _status_store
+
+
+def _set_status(job_id: Optional[str], status: str, detail: Optional[str] = None, drive_file: Optional[dict] = None,
+                progress: Optional[dict] = None) -> None:
     if not job_id:
         return
-    UPLOAD_STATUS[job_id] = {
-        'status': status,
-        'detail': detail,
-        'drive_file': drive_file,
-        'updated_at': time.time()
-    }
+    try:
+        _get_status_store().set(job_id, status, detail, drive_file, progress)
+    except Exception as e:
+        # Status is advisory; never fail an upload because it could not be recorded
+        LOGGER.warning("Failed to record upload status for %s: %s", job_id, e)
 
 def get_upload_status(job_id: str) -> dict:
-    data = UPLOAD_STATUS.get(job_id)
+    data = _get_status_store().get(job_id)
     if not data:
         return {'status': 'unknown'}
     return data
@@ -130,22 +226,111 @@ def authenticate():
             flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
             # open_browser=False prevents auto-launch; still requires visiting the URL once
             creds = flow.run_local_server(port=0, access_type='offline', open_browser=False)
-        # Persist token (try default path first, then fallback to /tmp)
+        _persist_token(creds)
+
+    return creds
+
+
+def _persist_token(creds) -> None:
+    # Persist token (try default path first, then fallback to /tmp)
+    try:
+        with open(TOKEN_FILE, 'wb') as token:
+            pickle.dump(creds, token)
+    except Exception as e:
+        LOGGER.warning(f"Failed to persist token file at {TOKEN_FILE}: {e}")
+        # Attempt fallback write to /tmp
         try:
-            with open(TOKEN_FILE, 'wb') as token:
+            _TMP_DIR.mkdir(parents=True, exist_ok=True)
+            with open(_FALLBACK_TOKEN_FILE, 'wb') as token:
                 pickle.dump(creds, token)
-        except Exception as e:
-            LOGGER.warning(f"Failed to persist token file at {TOKEN_FILE}: {e}")
-            # Attempt fallback write to /tmp
-            try:
-                _TMP_DIR.mkdir(parents=True, exist_ok=True)
-                with open(_FALLBACK_TOKEN_FILE, 'wb') as token:
-                    pickle.dump(creds, token)
-                LOGGER.info(f"Persisted Google Drive token to fallback path: {_FALLBACK_TOKEN_FILE}")
-            except Exception as e2:
-                LOGGER.warning(f"Failed to persist token to fallback path {_FALLBACK_TOKEN_FILE}: {e2}")
+            LOGGER.info(f"Persisted Google Drive token to fallback path: {_FALLBACK_TOKEN_FILE}")
+        except Exception as e2:
+            LOGGER.warning(f"Failed to persist token to fallback path {_FALLBACK_TOKEN_FILE}: {e2}")
 
-    return creds
+
+######################################################################
+# Long-lived Drive session
+######################################################################
+# Refresh access tokens this long before they expire
+DRIVE_TOKEN_REFRESH_MARGIN = int(os.getenv('GOOGLE_DRIVE_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+DRIVE_PARENT_CACHE_TTL = int(os.getenv('GOOGLE_DRIVE_PARENT_CACHE_TTL_SECONDS', '600'))
+
+
+class DriveSession:
+    """Process-wide, thread-safe Drive client.
+
+    Credentials are loaded once and refreshed shortly before they expire.
+    Each thread gets its own built service (httplib2 connections are not
+    thread-safe) and keeps it, so its HTTP connections are reused across
+    uploads. Parent folder metadata is cached for DRIVE_PARENT_CACHE_TTL.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._creds = None
+        self._generation = 0
+        self._local = threading.local()
+        self._parents: Dict[str, Tuple[dict, float]] = {}
+
+    def _needs_refresh(self, creds) -> bool:
+        if not getattr(creds, 'valid', False):
+            return True
+        expiry = getattr(creds, 'expiry', None)
+        if expiry is None:
+            return False
+        return (expiry - datetime.utcnow()).total_seconds() < DRIVE_TOKEN_REFRESH_MARGIN
+
+    def credentials(self):
+        with self._lock:
+            if self._creds is None:
+                self._creds = authenticate()
+                self._generation += 1
+            elif self._needs_refresh(self._creds):
+                try:
+                    self._creds.refresh(Request())
+                    if not isinstance(self._creds, SA_Credentials):
+                        _persist_token(self._creds)
+                    LOGGER.info("Refreshed Google Drive access token (expires %s)", getattr(self._creds, 'expiry', None))
+                except Exception as e:
+                    LOGGER.warning("Proactive Drive token refresh failed: %s; re-authenticating", e)
+                    self._creds = authenticate()
+                    self._generation += 1
+            return self._creds
+
+    def service(self):
+        creds = self.credentials()
+        local = self._local
+        if getattr(local, 'service', None) is None or local.generation != self._generation:
+            local.service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+            local.generation = self._generation
+        return local.service
+
+    def parent_metadata(self, folder_id: str) -> dict:
+        now = time.time()
+        with self._lock:
+            cached = self._parents.get(folder_id)
+            if cached and now - cached[1] < DRIVE_PARENT_CACHE_TTL:
+                return cached[0]
+        meta = self.service().files().get(fileId=folder_id, fields='id,name,mimeType,driveId,trashed', supportsAllDrives=True).execute()
+        with self._lock:
+            self._parents[folder_id] = (meta, now)
+        return meta
+
+    def invalidate_parent(self, folder_id: str) -> None:
+        with self._lock:
+            self._parents.pop(folder_id, None)
+
+
+_session: Optional[DriveSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> DriveSession:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = DriveSession()
+        return _session
 
 
 def _sanitize_filename(name: str) -> str:
@@ -154,17 +339,130 @@ def _sanitize_filename(name: str) -> str:
     return sanitized or 'uploaded_file'
 
 
-def upload_file_to_drive(file_path: str, display_name: Optional[str] = None, job_id: Optional[str] = None) -> Optional[dict]:
+######################################################################
+# Content-hash deduplication
+######################################################################
+_DRIVE_FILE_FIELDS = 'id,name,parents,mimeType'
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DriveHashIndex:
+    """Local map of (SHA-256, parent folder) -> Drive file id.
+
+    The same hash is also written to the Drive file's appProperties, so the
+    index can be rebuilt from Drive when a lookup misses locally.
+    """
+
+    def __init__(self, path=None):
+        self._db = connect_sqlite(path or data_path('drive_hash_index.sqlite3'))
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS drive_files (
+                sha256 TEXT NOT NULL,
+                parent_id TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (sha256, parent_id)
+            );
+            """
+        )
+
+    def get(self, sha256: str, parent_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT file_id FROM drive_files WHERE sha256 = ? AND parent_id = ?", (sha256, parent_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, sha256: str, parent_id: str, file_id: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO drive_files(sha256, parent_id, file_id, updated_at) VALUES (?, ?, ?, ?)",
+                (sha256, parent_id, file_id, time.time()),
+            )
+
+    def delete(self, sha256: str, parent_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM drive_files WHERE sha256 = ? AND parent_id = ?", (sha256, parent_id))
+
+
+_hash_index: Optional[DriveHashIndex] = None
+
+
+def _get_hash_index() -> DriveHashIndex:
+    global _hash_index
+    with _status_store_lock:
+        if _hash_index is None:
+            _hash_index = DriveHashIndex()
+        return _hash_index
+
+
+def _find_existing(service, sha256: str, parent_id: str) -> Optional[dict]:
+    """Return a live Drive file with this content hash under parent_id, if any."""
+    index = _get_hash_index()
+    file_id = index.get(sha256, parent_id)
+    if file_id:
+        try:
+            meta = service.files().get(fileId=file_id, fields=_DRIVE_FILE_FIELDS + ',trashed',
+                                       supportsAllDrives=True).execute()
+            if not meta.get('trashed') and parent_id in (meta.get('parents') or []):
+                meta.pop('trashed', None)
+                return meta
+        except HttpError as e:
+            if getattr(e.resp, 'status', None) != 404:
+                raise
+        # Deleted, trashed or moved since we indexed it
+        index.delete(sha256, parent_id)
+
+    query = (f"'{parent_id}' in parents and trashed = false and "
+             f"appProperties has {{ key='sha256' and value='{sha256}' }}")
+    found = service.files().list(q=query, fields=f'files({_DRIVE_FILE_FIELDS})', pageSize=1,
+                                 supportsAllDrives=True, includeItemsFromAllDrives=True).execute()
+    files = found.get('files') or []
+    if not files:
+        return None
+    index.put(sha256, parent_id, files[0]['id'])
+    return files[0]
+
+
+def _report_success(job_id: Optional[str], drive_file: dict, total_bytes: int, detail: Optional[str] = None) -> None:
+    web_link = f"https://drive.google.com/file/d/{drive_file.get('id')}/view"
+    LOGGER.info("Google Drive upload successful: id=%s name=%s link=%s",
+                drive_file.get('id'), drive_file.get('name'), web_link)
+    drive_file_with_link = dict(drive_file)
+    drive_file_with_link['webViewLink'] = web_link
+    _set_status(job_id, 'success', detail=detail, drive_file=drive_file_with_link,
+                progress={'bytes_sent': total_bytes, 'total_bytes': total_bytes})
+
+
+def upload_file_to_drive(file_path: str, display_name: Optional[str] = None, job_id: Optional[str] = None,
+                         sha256: Optional[str] = None) -> Optional[dict]:
     """Upload a local file to Google Drive under the configured parent folder.
 
+    If a live file with the same SHA-256 already exists in the folder, it is
+    returned instead and no bytes are sent.
+
     Args:
         file_path: Absolute or relative path to the local file to upload.
         display_name: Optional display name to use in Drive. Defaults to basename of file_path.
+        sha256: Hex digest of the file if the caller already has it.
 
     Returns:
-        The Drive file resource dict on success, or None on failure.
+        The Drive file resource dict on success, or None if the local file is gone.
+
+    Raises:
+        Any other failure. The upload is attempted once; DriveUploadExecutor
+        owns retries and reports the final error status.
     """
-    # Pre-check: local file must exist
+    # Pre-check: local file must exist (nothing to retry if it does not)
     if not os.path.exists(file_path):
         msg = f"Drive upload aborted: file not found: {file_path}"
         LOGGER.error(msg)
@@ -177,30 +475,38 @@ def upload_file_to_drive(file_path: str, display_name: Optional[str] = None, job
     if not mime_type:
         mime_type, _ = mimetypes.guess_type(name)
 
-    # Authenticate once outside of retry loop
+    # Reuse the long-lived session (cached credentials and service)
+    session = get_session()
     try:
-        creds = authenticate()
-        service = build('drive', 'v3', credentials=creds)
+        service = session.service()
     except Exception as e:
-        LOGGER.error("Drive authentication/build failed: %s", e)
-        _set_status(job_id, 'error', detail=f"auth/build failed: {e}")
-        return None
+        raise RuntimeError(f"auth/build failed: {e}") from e
 
-    # Pre-flight: verify parent folder
+    # Pre-flight: verify parent folder (cached)
     try:
-        parent_meta = service.files().get(fileId=PARENT_FOLDER_ID, fields='id,name,mimeType,driveId,trashed', supportsAllDrives=True).execute()
+        parent_meta = session.parent_metadata(PARENT_FOLDER_ID)
         if parent_meta.get('trashed'):
+            session.invalidate_parent(PARENT_FOLDER_ID)
             raise RuntimeError("parent folder is in trash")
         if parent_meta.get('mimeType') != 'application/vnd.google-apps.folder':
             LOGGER.warning("Provided parent is not a folder: %s (%s)", parent_meta.get('name'), parent_meta.get('mimeType'))
     except HttpError as e:
-        LOGGER.error("Invalid or inaccessible parent folder '%s': %s", PARENT_FOLDER_ID, e)
-        _set_status(job_id, 'error', detail=f"invalid parent folder: {PARENT_FOLDER_ID}")
-        return None
+        raise RuntimeError(f"invalid parent folder {PARENT_FOLDER_ID}: {e}") from e
     except Exception as e:
-        LOGGER.error("Parent folder verification failed: %s", e)
-        _set_status(job_id, 'error', detail=f"parent verification failed: {e}")
-        return None
+        raise RuntimeError(f"parent verification failed: {e}") from e
+
+    total_bytes = os.path.getsize(file_path)
+    try:
+        sha256 = sha256 or file_sha256(file_path)
+        existing = _find_existing(service, sha256, PARENT_FOLDER_ID)
+    except Exception as e:
+        # Dedupe is an optimisation; fall back to a normal upload
+        LOGGER.warning("Drive duplicate lookup failed for %s: %s", file_path, e)
+        existing = None
+    if existing:
+        LOGGER.info("Skipping Drive upload of %s: identical file already stored (id=%s)", file_path, existing.get('id'))
+        _report_success(job_id, existing, total_bytes, detail='duplicate')
+        return existing
 
     # Prepare metadata and media uploader
     file_metadata = {
@@ -209,70 +515,335 @@ def upload_file_to_drive(file_path: str, display_name: Optional[str] = None, job
     }
     if mime_type:
         file_metadata['mimeType'] = mime_type
+    if sha256:
+        file_metadata['appProperties'] = {'sha256': sha256}
+
+    created = _resumable_upload(service, file_path, file_metadata, mime_type, total_bytes, job_id)
+    if not created or not created.get('id'):
+        raise RuntimeError("Drive API returned empty response or missing file id")
+
+    if sha256:
+        try:
+            _get_hash_index().put(sha256, PARENT_FOLDER_ID, created['id'])
+        except Exception as e:
+            LOGGER.warning("Failed to index Drive file %s: %s", created.get('id'), e)
+    _report_success(job_id, created, total_bytes)
+    return created
+
+
+######################################################################
+# Resumable chunked upload
+######################################################################
+# Must be a multiple of 256 KiB
+DRIVE_UPLOAD_CHUNK_SIZE = int(os.getenv('GOOGLE_DRIVE_UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+# Consecutive transient failures tolerated on one chunk before giving up
+DRIVE_CHUNK_MAX_RETRIES = int(os.getenv('GOOGLE_DRIVE_CHUNK_MAX_RETRIES', '5'))
+_TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def _is_transient(err: Exception) -> bool:
+    if isinstance(err, HttpError):
+        return getattr(err.resp, 'status', None) in _TRANSIENT_STATUSES
+    return isinstance(err, (OSError, httplib2.HttpLib2Error))
+
 
+def _resumable_upload(service, file_path: str, file_metadata: dict, mime_type: Optional[str],
+                      total_bytes: int, job_id: Optional[str]) -> dict:
+    """Upload in DRIVE_UPLOAD_CHUNK_SIZE chunks over one resumable session.
+
+    After a transient error the next ``next_chunk`` call asks Drive for the
+    last acknowledged offset and continues from there instead of byte zero.
+    Bytes sent are written into the job status after every chunk.
+    """
     media = MediaFileUpload(
         file_path,
         mimetype=mime_type or 'application/octet-stream',
-        resumable=False
+        chunksize=DRIVE_UPLOAD_CHUNK_SIZE,
+        resumable=True
     )
-
-    # Retry upload up to 3 times with backoff
-    max_attempts = 3
-    for attempt_index in range(1, max_attempts + 1):
+    request = service.files().create(
+        body=file_metadata,
+        media_body=media,
+        fields=_DRIVE_FILE_FIELDS,
+        supportsAllDrives=True
+    )
+    _set_status(job_id, 'running', progress={'bytes_sent': 0, 'total_bytes': total_bytes})
+    response = None
+    failures = 0
+    while response is None:
         try:
-            created = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,parents,mimeType',
-                supportsAllDrives=True
-            ).execute()
-
-            if not created or not created.get('id'):
-                raise RuntimeError("Drive API returned empty response or missing file id")
-
-            web_link = f"https://drive.google.com/file/d/{created.get('id')}/view"
-            LOGGER.info(
-                "Google Drive upload successful: id=%s name=%s link=%s",
-                created.get('id'), created.get('name'), web_link
-            )
-            created_with_link = dict(created)
-            created_with_link['webViewLink'] = web_link
-            _set_status(job_id, 'success', drive_file=created_with_link)
-            return created
-        except HttpError as http_err:
-            LOGGER.error(
-                "Drive upload HTTP error (attempt %d/%d) for %s: %s",
-                attempt_index, max_attempts, file_path, http_err
-            )
-            _set_status(job_id, 'error', detail=f"HTTP error: {http_err}")
+            chunk_status, response = request.next_chunk()
         except Exception as e:
-            LOGGER.error(
-                "Drive upload failed (attempt %d/%d) for %s: %s",
-                attempt_index, max_attempts, file_path, e
-            )
-            _set_status(job_id, 'error', detail=str(e))
+            if not _is_transient(e) or failures >= DRIVE_CHUNK_MAX_RETRIES:
+                raise
+            failures += 1
+            delay = min(30.0, 0.5 * (2 ** (failures - 1)))
+            LOGGER.warning("Drive chunk upload error for %s (%d/%d), resuming in %.1fs: %s",
+                           file_path, failures, DRIVE_CHUNK_MAX_RETRIES, delay, e)
+            time.sleep(delay)
+            continue
+        failures = 0
+        if chunk_status is not None:
+            _set_status(job_id, 'running', progress={'bytes_sent': chunk_status.resumable_progress, 'total_bytes': total_bytes})
+    return response
 
-        if attempt_index < max_attempts:
-            # Exponential backoff: 0.5s, 1s
-            time.sleep(0.5 * attempt_index)
 
-    LOGGER.error("Drive upload ultimately failed after %d attempts for %s", max_attempts, file_path)
-    return None
+######################################################################
+# Dedicated upload executor with crash-recoverable spool
+######################################################################
+DRIVE_UPLOAD_CONCURRENCY = int(os.getenv('GOOGLE_DRIVE_UPLOAD_CONCURRENCY', '2'))
+# A spool claim not refreshed for this long is considered abandoned
+DRIVE_CLAIM_LEASE_SECONDS = float(os.getenv('GOOGLE_DRIVE_CLAIM_LEASE_SECONDS', '300'))
+# Failed uploads stay in the spool and are retried with exponential backoff
+DRIVE_UPLOAD_MAX_ATTEMPTS = int(os.getenv('GOOGLE_DRIVE_UPLOAD_MAX_ATTEMPTS', '5'))
+DRIVE_UPLOAD_RETRY_SECONDS = float(os.getenv('GOOGLE_DRIVE_UPLOAD_RETRY_SECONDS', '60'))
+_CLAIM_MARK = '.running-'
+_THROUGHPUT_WINDOW_SECONDS = 300.0
+
+
+def drive_spool_path(job_id: str, filename: str) -> Path:
+    """Where a file waits for its Drive upload; survives restarts."""
+    return data_path('drive_spool', f"{job_id}_{os.path.basename(filename)}")
+
+
+class DriveUploadExecutor:
+    """Bounded pool of Drive upload threads fed from a queue.
+
+    Every submitted file sits in the spool directory with a JSON sidecar
+    describing the job. A worker claims the sidecar by renaming it to
+    ``.running-<owner>``, where the owner id is unique per executor instance
+    (PIDs repeat across container restarts), so only one process uploads a
+    file. While an upload runs its claim is touched every third of
+    DRIVE_CLAIM_LEASE_SECONDS; a claim left untouched longer than the lease
+    belonged to a process that died and is re-queued.
+
+    A successful upload removes the file and sidecar. A failed one keeps
+    both and is retried with backoff up to DRIVE_UPLOAD_MAX_ATTEMPTS times
+    (status 'retrying' in between), after which the job status becomes
+    'error' and the sidecar is renamed to ``.failed`` for inspection. On startup ``recover()`` re-queues whatever a previous
+    process left behind.
+    """
 
+    def __init__(self, concurrency: int = DRIVE_UPLOAD_CONCURRENCY, lease: float = DRIVE_CLAIM_LEASE_SECONDS):
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        self._owner = uuid.uuid4().hex
+        self._queue: "queue.Queue[Optional[Path]]" = queue.Queue()
+        self._threads: list = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._claims: set = set()
+        self._in_progress = 0
+        self._completed = 0
+        self._failed = 0
+        self._retrying = 0
+        self._recent: Deque[Tuple[float, int]] = deque()
+
+    # --- lifecycle ---
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.concurrency):
+                t = threading.Thread(target=self._worker, name=f"drive-upload-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._lease_loop, name="drive-upload-lease", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+
+    # --- submission ---
+    def submit(self, file_path: str, display_name: Optional[str], job_id: str, sha256: Optional[str] = None) -> None:
+        sidecar = Path(f"{file_path}.json")
+        sidecar.write_text(json.dumps({
+            'file_path': str(file_path),
+            'display_name': display_name,
+            'job_id': job_id,
+            'sha256': sha256,
+            'attempts': 0,
+            'created_at': time.time(),
+        }))
+        _set_status(job_id, 'queued')
+        self._queue.put(sidecar)
+
+    def recover(self, pending: bool = True) -> int:
+        """Re-queue uploads left in the spool by a previous process.
+
+        Unclaimed sidecars are re-queued when ``pending`` is set; claims held
+        by another owner are taken back once their lease has expired.
+        """
+        spool_dir = data_path('drive_spool', 'x').parent
+        now = time.time()
+        recovered = 0
+        for sidecar in spool_dir.glob('*.json*'):
+            name = sidecar.name
+            if name.endswith('.json'):
+                if not pending:
+                    continue
+                target = sidecar
+            elif _CLAIM_MARK in name:
+                if name.endswith(_CLAIM_MARK + self._owner):
+                    continue
+                try:
+                    if now - sidecar.stat().st_mtime < self.lease:
+                        continue  # another live process is uploading it
+                except OSError:
+                    continue
+                target = Path(str(sidecar).split(_CLAIM_MARK, 1)[0])
+                try:
+                    os.rename(sidecar, target)
+                except OSError:
+                    continue
+            else:
+                continue
+            self._queue.put(target)
+            recovered += 1
+        if recovered:
+            LOGGER.info("Recovered %d pending Drive uploads from spool %s", recovered, spool_dir)
+        return recovered
+
+    def _lease_loop(self) -> None:
+        while not self._stop.wait(max(self.lease / 3, 1.0)):
+            with self._lock:
+                claims = list(self._claims)
+            for claimed in claims:
+                try:
+                    os.utime(claimed)
+                except OSError:
+                    pass
+            try:
+                self.recover(pending=False)
+            except Exception as e:
+                LOGGER.warning("Drive spool lease check failed: %s", e)
 
-def background_upload(file_path: str, display_name: Optional[str] = None, job_id: Optional[str] = None) -> None:
-    """Background task entrypoint for FastAPI to upload and then clean up local temp file."""
-    try:
-        _set_status(job_id, 'running')
-        result = upload_file_to_drive(file_path, display_name, job_id)
-        if not result:
-            LOGGER.error("Background Drive upload returned no result for %s (name=%s)", file_path, display_name)
-    finally:
+    # --- workers ---
+    def _claim(self, sidecar: Path) -> Optional[Tuple[Path, dict]]:
+        claimed = Path(f"{sidecar}{_CLAIM_MARK}{self._owner}")
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                LOGGER.info(f"Cleaned up temporary file after Drive upload: {file_path}")
+            os.rename(sidecar, claimed)
+        except OSError:
+            return None  # another process took it
+        try:
+            os.utime(claimed)
+            job = json.loads(claimed.read_text())
         except Exception as e:
-            LOGGER.warning(f"Failed to remove temporary file {file_path}: {e}")
-
-
+            LOGGER.warning("Dropping unreadable Drive spool entry %s: %s", claimed, e)
+            claimed.unlink(missing_ok=True)
+            return None
+        with self._lock:
+            self._claims.add(claimed)
+        return claimed, job
+
+    def _release(self, sidecar: Path, claimed: Path, job: dict, error: str) -> None:
+        """Hand a failed upload back to the spool, retrying later or giving up."""
+        job['attempts'] = int(job.get('attempts') or 0) + 1
+        claimed.write_text(json.dumps(job))
+        if job['attempts'] >= DRIVE_UPLOAD_MAX_ATTEMPTS:
+            os.rename(claimed, Path(f"{sidecar}.failed"))
+            LOGGER.error("Drive upload for %s failed %d times; left in spool as %s.failed: %s",
+                         job.get('file_path'), job['attempts'], sidecar, error)
+            _set_status(job.get('job_id'), 'error', detail=f"failed after {job['attempts']} attempts: {error}")
+            return
+        os.rename(claimed, sidecar)
+        delay = min(DRIVE_UPLOAD_RETRY_SECONDS * (2 ** (job['attempts'] - 1)), 3600.0)
+        LOGGER.warning("Drive upload for %s failed (attempt %d/%d); retrying in %.0fs: %s",
+                       job.get('file_path'), job['attempts'], DRIVE_UPLOAD_MAX_ATTEMPTS, delay, error)
+        _set_status(job.get('job_id'), 'retrying',
+                    detail=f"attempt {job['attempts']}/{DRIVE_UPLOAD_MAX_ATTEMPTS} failed ({error}); retrying in {delay:.0f}s")
+        with self._lock:
+            self._retrying += 1
+
+        def requeue():
+            with self._lock:
+                self._retrying -= 1
+            if not self._stop.is_set():
+                self._queue.put(sidecar)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    def _worker(self) -> None:
+        while True:
+            sidecar = self._queue.get()
+            if sidecar is None:
+                return
+            claim = self._claim(sidecar)
+            if claim is None:
+                continue
+            claimed, job = claim
+            file_path = job.get('file_path') or str(sidecar)[:-len('.json')]
+            exists = os.path.exists(file_path)
+            size = os.path.getsize(file_path) if exists else 0
+            with self._lock:
+                self._in_progress += 1
+            ok = False
+            error = 'no file returned'
+            try:
+                _set_status(job.get('job_id'), 'running')
+                ok = upload_file_to_drive(file_path, job.get('display_name'), job.get('job_id'),
+                                          job.get('sha256')) is not None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                LOGGER.error("Drive upload worker error for %s: %s", file_path, e)
+            finally:
+                with self._lock:
+                    self._in_progress -= 1
+                    self._claims.discard(claimed)
+                    if ok:
+                        self._completed += 1
+                        self._recent.append((time.monotonic(), size))
+                    else:
+                        self._failed += 1
+                if ok or not exists:
+                    # Done, or nothing left to upload: clear the spool entry
+                    for path in (file_path, str(claimed)):
+                        try:
+                            if os.path.exists(path):
+                                os.remove(path)
+                        except Exception as e:
+                            LOGGER.warning(f"Failed to remove temporary file {path}: {e}")
+                else:
+                    try:
+                        self._release(sidecar, claimed, job, error)
+                    except Exception as e:
+                        # The claim stays on disk and is re-queued once its lease expires
+                        LOGGER.error("Failed to release Drive spool entry %s: %s", claimed, e)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0][0] > _THROUGHPUT_WINDOW_SECONDS:
+                self._recent.popleft()
+            recent = list(self._recent)
+            in_progress, completed, failed, retrying = self._in_progress, self._completed, self._failed, self._retrying
+        span = max(now - recent[0][0], 1.0) if recent else 0.0
+        return {
+            'queue_depth': self._queue.qsize(),
+            'in_progress': in_progress,
+            'concurrency': self.concurrency,
+            'completed': completed,
+            'failed': failed,
+            'retrying': retrying,
+            'uploads_per_min': round(len(recent) * 60 / span, 2) if span else 0.0,
+            'bytes_per_sec': round(sum(n for _, n in recent) / span, 1) if span else 0.0,
+        }
+
+
+_executor: Optional[DriveUploadExecutor] = None
+
+
+def get_executor() -> DriveUploadExecutor:
+    global _executor
+    with _session_lock:
+        if _executor is None:
+            _executor = DriveUploadExecutor()
+        return _executor
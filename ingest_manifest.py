@@ -0,0 +1,81 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from local_store import connect_sqlite, data_path
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def chunk_hash(text: str, total_pages: int) -> str:
+    # Page count is stored in vector metadata, so it is part of the identity
+    return hashlib.sha256(f"{total_pages}\n{text}".encode('utf-8')).hexdigest()
+
+
+class ManifestStore:
+    """Per-document record of the last ingested file and its chunks.
+
+    For every document name it keeps the SHA-256 of the uploaded file and a
+    hash per vector id, so a re-upload can be skipped entirely (same bytes) or
+    reduced to upserting changed chunks and deleting vanished ids.
+    """
+
+    def __init__(self, path=None):
+        self._db = connect_sqlite(path or data_path('ingest_manifest.sqlite3'))
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                document_name TEXT PRIMARY KEY,
+                file_sha256 TEXT,
+                total_pages INTEGER,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                document_name TEXT NOT NULL,
+                vector_id TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                PRIMARY KEY (document_name, vector_id)
+            );
+            """
+        )
+
+    def get(self, document_name: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT file_sha256, total_pages FROM documents WHERE document_name = ?", (document_name,)
+            ).fetchone()
+            if not row:
+                return None
+            chunks = dict(self._db.execute(
+                "SELECT vector_id, chunk_hash FROM chunks WHERE document_name = ?", (document_name,)
+            ).fetchall())
+        return {'file_sha256': row[0], 'total_pages': row[1], 'chunks': chunks}
+
+    def save(self, document_name: str, file_sha256: Optional[str], total_pages: int, chunks: Dict[str, str]) -> None:
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO documents(document_name, file_sha256, total_pages, updated_at) VALUES (?, ?, ?, ?)",
+                    (document_name, file_sha256, total_pages, time.time()),
+                )
+                self._db.execute("DELETE FROM chunks WHERE document_name = ?", (document_name,))
+                self._db.executemany(
+                    "INSERT INTO chunks(document_name, vector_id, chunk_hash) VALUES (?, ?, ?)",
+                    [(document_name, vid, h) for vid, h in chunks.items()],
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def delete(self, document_name: str) -> None:
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute("DELETE FROM chunks WHERE document_name = ?", (document_name,))
+            self._db.execute("DELETE FROM documents WHERE document_name = ?", (document_name,))
+            self._db.execute('COMMIT')
@@ -0,0 +1,359 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from chunker import TokenChunker
+from embedder import EMBED_BATCH_MAX_ITEMS, EMBED_MAX_CONCURRENCY, EMBEDDING_MODEL
+from ingest_manifest import chunk_hash
+from pdf_extract import PDF_EXTRACT_MODE, count_pages, get_executor, iter_pages
+
+
+LOGGER = logging.getLogger(__name__)
+
+# Stage queue sizes bound how much work is buffered between stages
+PAGE_QUEUE_SIZE = int(os.getenv('INGEST_PAGE_QUEUE_SIZE', '4'))
+CHUNK_QUEUE_SIZE = int(os.getenv('INGEST_CHUNK_QUEUE_SIZE', '256'))
+VECTOR_QUEUE_SIZE = int(os.getenv('INGEST_VECTOR_QUEUE_SIZE', '256'))
+
+# Pinecone 설정 (API 키는 환경 변수로만 받음)
+PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
+PINECONE_INDEX_NAME = os.getenv('PINECONE_INDEX_NAME', 'ideadb')
+
+# Pinecone upsert request limits: 2MB payload and 1000 vectors per request
+PINECONE_UPSERT_MAX_BYTES = int(os.getenv('PINECONE_UPSERT_MAX_BYTES', str(int(1.8 * 1024 * 1024))))
+PINECONE_UPSERT_MAX_VECTORS = int(os.getenv('PINECONE_UPSERT_MAX_VECTORS', '1000'))
+PINECONE_UPSERT_CONCURRENCY = int(os.getenv('PINECONE_UPSERT_CONCURRENCY', '4'))
+PINECONE_DELETE_BATCH = 1000
+
+_DONE = object()
+
+_chunker: Optional[TokenChunker] = None
+_chunker_lock = threading.Lock()
+
+
+def get_chunker() -> TokenChunker:
+    """Chunker for EMBEDDING_MODEL, built on first use.
+
+    Building it loads the tiktoken BPE file (downloaded on a cold cache), so
+    it must not happen at import time.
+    """
+    global _chunker
+    with _chunker_lock:
+        if _chunker is None:
+            _chunker = TokenChunker(EMBEDDING_MODEL)
+        return _chunker
+
+
+def pinecone_api_key() -> str:
+    """PINECONE_API_KEY from the environment; raises if it is not set."""
+    if not PINECONE_API_KEY:
+        raise RuntimeError("PINECONE_API_KEY 환경 변수가 설정되지 않았습니다.")
+    return PINECONE_API_KEY
+
+
+def make_ascii_id(text: str) -> str:
+    """벡터 ID를 ASCII로 변환"""
+    if not text:
+        return str(uuid.uuid4())
+    
+    # 한글과 특수문자 제거, 영문자와 숫자만 유지
+    text = re.sub(r'[^a-zA-Z0-9]', '_', text)
+    # 연속된 언더스코어를 하나로 변환
+    text = re.sub(r'_+', '_', text)
+    # 앞뒤 언더스코어 제거
+    text = text.strip('_')
+    if not text:
+        text = str(uuid.uuid4())
+    return text
+
+
+def _estimate_vector_bytes(vector: dict) -> int:
+    # JSON body size: ~20 chars per float plus metadata
+    return len(vector['values']) * 20 + len(json.dumps(vector['metadata'], ensure_ascii=False).encode('utf-8')) + 64
+
+
+def _raise_failed(tasks: List[asyncio.Task]) -> None:
+    # 끝난 배치 작업 중 실패가 있으면 즉시 전파 (다음 배치를 더 예약하지 않음)
+    for t in tasks:
+        if t.done() and not t.cancelled() and t.exception() is not None:
+            raise t.exception()
+    tasks[:] = [t for t in tasks if not t.done()]
+
+
+class IngestPipeline:
+    """Streaming PDF → Pinecone ingestion.
+
+    Extraction, chunking, embedding and upserting run as separate stages
+    connected by bounded queues, so they overlap and at most a few pages and
+    a few hundred vectors are held in memory regardless of document length.
+    Upserts are flushed in batches sized by estimated request bytes and run
+    in parallel.
+
+    ``known_chunks`` (vector id → chunk hash from the document manifest)
+    makes the run incremental: unchanged chunks are skipped and ids that no
+    longer exist are deleted from the index afterwards.
+    """
+
+    def __init__(self, engine, index, base_name: str,
+                 on_progress: Optional[Callable[[dict], None]] = None,
+                 known_chunks: Optional[Dict[str, str]] = None,
+                 extract_mode: str = PDF_EXTRACT_MODE):
+        self.engine = engine
+        self.extract_mode = extract_mode
+        self.index = index
+        self.base_name = base_name
+        self.on_progress = on_progress
+        self.known_chunks = known_chunks or {}
+        self.chunk_hashes: Dict[str, str] = {}
+        self.total_pages = 0
+        self.pages_done = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+        self.vectors_upserted = 0
+        self.chunks_unchanged = 0
+        self.vectors_deleted = 0
+        self.failed: List[str] = []
+        self.uploaded_at = datetime.utcnow().isoformat()
+
+    def progress(self) -> dict:
+        return {
+            'total_pages': self.total_pages,
+            'pages_done': self.pages_done,
+            'chunks_total': self.chunks_total,
+            'chunks_embedded': self.chunks_embedded,
+            'vectors_upserted': self.vectors_upserted,
+            'chunks_unchanged': self.chunks_unchanged,
+            'vectors_deleted': self.vectors_deleted,
+            'chunks_failed': len(self.failed),
+        }
+
+    def manifest_chunks(self) -> Dict[str, str]:
+        """Chunk hashes that are now reflected in the index (failed ones excluded)."""
+        failed = set(self.failed)
+        return {vid: h for vid, h in self.chunk_hashes.items() if vid not in failed}
+
+    def _report(self) -> None:
+        if self.on_progress:
+            try:
+                self.on_progress(self.progress())
+            except Exception as e:
+                LOGGER.warning("Progress callback failed: %s", e)
+
+    # --- stages ---
+    async def _extract(self, pdf_path: str, page_q: asyncio.Queue) -> None:
+        # 페이지 범위를 프로세스 풀에 나눠 추출 (이벤트 루프 비차단), 순서대로 수신
+        # 실패하면 run()이 모든 단계를 취소하므로 종료 표시는 정상 완료 때만 보냄
+        # (취소된 뒤 가득 찬 큐에 넣으려 하면 영원히 대기)
+        self.total_pages = await asyncio.get_running_loop().run_in_executor(get_executor(), count_pages, pdf_path)
+        async for i, page_text in iter_pages(pdf_path, self.total_pages, self.extract_mode):
+            await page_q.put((i, page_text))
+        await page_q.put(_DONE)
+
+    async def _chunk(self, page_q: asyncio.Queue, chunk_q: asyncio.Queue) -> None:
+        while True:
+            item = await page_q.get()
+            if item is _DONE:
+                break
+            i, page_text = item
+            if not page_text:
+                LOGGER.warning("페이지 %d에 텍스트가 없습니다. 건너뜁니다.", i)
+            else:
+                # 첫 호출 시 인코더 로딩도 이벤트 루프 밖에서 수행
+                chunks = await asyncio.to_thread(lambda: get_chunker().chunk(page_text))
+                for k, (chunk_text, n_tokens) in enumerate(chunks, start=1):
+                    self.chunks_total += 1
+                    vid = make_ascii_id(f"{self.base_name}_page{i}_chunk{k}")
+                    h = chunk_hash(chunk_text, self.total_pages)
+                    self.chunk_hashes[vid] = h
+                    if self.known_chunks.get(vid) == h:
+                        self.chunks_unchanged += 1
+                        continue
+                    LOGGER.debug("페이지 %d, 청크 %d (토큰: %d)", i, k, n_tokens)
+                    await chunk_q.put((vid, chunk_text, n_tokens, i, k))
+            self.pages_done += 1
+            self._report()
+        await chunk_q.put(_DONE)
+
+    async def _embed_window(self, window: list, vector_q: asyncio.Queue, slots: asyncio.Semaphore) -> None:
+        try:
+            embeddings, failed = await self.engine.embed((vid, text, n_tokens) for vid, text, n_tokens, _, _ in window)
+            self.failed.extend(failed)
+            for vid, text, _, page_no, chunk_no in window:
+                values = embeddings.get(vid)
+                if values is None:
+                    continue
+                self.chunks_embedded += 1
+                await vector_q.put({
+                    "id": vid,
+                    "values": values,
+                    "metadata": {
+                        "document_name": self.base_name,
+                        "page": page_no,
+                        "pdf_total_pages": self.total_pages,
+                        "chunk": chunk_no,
+                        "text": text,
+                        "text_preview": text[:200],
+                        "uploaded_at": self.uploaded_at,
+                    },
+                })
+        finally:
+            slots.release()
+
+    async def _embed(self, chunk_q: asyncio.Queue, vector_q: asyncio.Queue) -> None:
+        # 동시에 진행 중인 임베딩 윈도우 수를 제한해 메모리를 일정하게 유지
+        slots = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+        tasks: List[asyncio.Task] = []
+        window: list = []
+
+        async def flush():
+            nonlocal window
+            await slots.acquire()
+            _raise_failed(tasks)
+            tasks.append(asyncio.create_task(self._embed_window(window, vector_q, slots)))
+            window = []
+
+        try:
+            while True:
+                item = await chunk_q.get()
+                if item is _DONE:
+                    break
+                window.append(item)
+                if len(window) >= EMBED_BATCH_MAX_ITEMS:
+                    await flush()
+            if window:
+                await flush()
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+        await vector_q.put(_DONE)
+
+    async def _upsert_batch(self, batch: List[dict], slots: asyncio.Semaphore) -> None:
+        try:
+            await asyncio.to_thread(self.index.upsert, vectors=batch)
+            self.vectors_upserted += len(batch)
+            LOGGER.info("Pinecone upsert: %d vectors (total %d)", len(batch), self.vectors_upserted)
+            self._report()
+        finally:
+            slots.release()
+
+    async def _upsert(self, vector_q: asyncio.Queue) -> None:
+        slots = asyncio.Semaphore(PINECONE_UPSERT_CONCURRENCY)
+        tasks: List[asyncio.Task] = []
+        batch: List[dict] = []
+        batch_bytes = 0
+
+        async def flush():
+            nonlocal batch, batch_bytes
+            await slots.acquire()
+            _raise_failed(tasks)
+            tasks.append(asyncio.create_task(self._upsert_batch(batch, slots)))
+            batch, batch_bytes = [], 0
+
+        try:
+            while True:
+                vector = await vector_q.get()
+                if vector is _DONE:
+                    break
+                size = _estimate_vector_bytes(vector)
+                if batch and (batch_bytes + size > PINECONE_UPSERT_MAX_BYTES or len(batch) >= PINECONE_UPSERT_MAX_VECTORS):
+                    await flush()
+                batch.append(vector)
+                batch_bytes += size
+            if batch:
+                await flush()
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def run(self, pdf_path: str) -> dict:
+        page_q: asyncio.Queue = asyncio.Queue(maxsize=PAGE_QUEUE_SIZE)
+        chunk_q: asyncio.Queue = asyncio.Queue(maxsize=CHUNK_QUEUE_SIZE)
+        vector_q: asyncio.Queue = asyncio.Queue(maxsize=VECTOR_QUEUE_SIZE)
+        stages = [
+            asyncio.create_task(self._extract(pdf_path, page_q)),
+            asyncio.create_task(self._chunk(page_q, chunk_q)),
+            asyncio.create_task(self._embed(chunk_q, vector_q)),
+            asyncio.create_task(self._upsert(vector_q)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            # 한 단계라도 실패하면 나머지 단계 중단
+            for t in stages:
+                t.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+        if self.failed:
+            LOGGER.error("임베딩 실패 청크 %d개: %s", len(self.failed), self.failed)
+        await self._delete_stale()
+        return self.progress()
+
+    async def _delete_stale(self) -> None:
+        stale = [vid for vid in self.known_chunks if vid not in self.chunk_hashes]
+        for start in range(0, len(stale), PINECONE_DELETE_BATCH):
+            batch = stale[start:start + PINECONE_DELETE_BATCH]
+            await asyncio.to_thread(self.index.delete, ids=batch)
+            self.vectors_deleted += len(batch)
+        if stale:
+            LOGGER.info("Deleted %d stale vectors for %s", len(stale), self.base_name)
+
+
+async def ingest_pdf(pdf_path: str, original_filename: str, file_sha256: str, engine, index, manifests,
+                     on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Ingest one PDF into the index, incrementally against its manifest."""
+    base_name = Path(original_filename).stem
+
+    # 동일한 파일이 이미 반영되어 있으면 즉시 반환
+    manifest = manifests.get(base_name)
+    if manifest and manifest["file_sha256"] == file_sha256:
+        LOGGER.info("변경 사항 없음, 인제스트 생략: %s", base_name)
+        return {
+            "status": "success",
+            "message": "이미 업로드된 동일한 파일입니다. 변경 사항이 없습니다.",
+            "document_name": base_name,
+            "total_pages": manifest["total_pages"],
+            "total_chunks": len(manifest["chunks"]),
+            "unchanged": True
+        }
+    if manifest is None:
+        # 매니페스트 이전에 업로드된 벡터는 ID 목록을 알 수 없으므로 문서 단위로 정리
+        try:
+            await asyncio.to_thread(index.delete, filter={"document_name": base_name})
+        except Exception as e:
+            LOGGER.warning("기존 문서 벡터 정리 실패 (%s): %s", base_name, e)
+
+    # 추출 → 청킹 → 임베딩 → 업서트를 단계별로 겹쳐 실행 (메모리 일정)
+    # 변경되지 않은 청크는 건너뛰고, 사라진 청크 ID는 삭제
+    pipeline = IngestPipeline(engine, index, base_name, on_progress=on_progress,
+                              known_chunks=manifest["chunks"] if manifest else None)
+    progress = await pipeline.run(pdf_path)
+    total_pages = progress["total_pages"]
+    # 실패한 청크가 있으면 파일 해시를 기록하지 않아 다음 업로드에서 재시도
+    manifests.save(base_name, None if pipeline.failed else file_sha256, total_pages, pipeline.manifest_chunks())
+    total_chunks = progress["vectors_upserted"] + progress["chunks_unchanged"]
+
+    if not total_chunks:
+        LOGGER.warning("처리할 텍스트가 없습니다: %s", base_name)
+        return {"status": "error", "message": "처리할 텍스트가 없습니다."}
+
+    LOGGER.info("총 %d개의 벡터를 Pinecone에 업로드했습니다. (변경 없음 %d개, 삭제 %d개)",
+                progress["vectors_upserted"], progress["chunks_unchanged"], progress["vectors_deleted"])
+    return {
+        "status": "success",
+        "message": f"성공적으로 {total_chunks}개의 청크를 업로드했습니다.",
+        "document_name": base_name,
+        "total_pages": total_pages,
+        "total_chunks": total_chunks,
+        "chunks_upserted": progress["vectors_upserted"],
+        "chunks_unchanged": progress["chunks_unchanged"],
+        "chunks_deleted": progress["vectors_deleted"]
+    }
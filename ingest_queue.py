@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from local_store import connect_sqlite, data_path
+
+
+LOGGER = logging.getLogger(__name__)
+
+INGEST_MAX_ATTEMPTS = int(os.getenv('INGEST_MAX_ATTEMPTS', '3'))
+# A running job whose worker has not reported for this long is handed out again
+INGEST_STALE_SECONDS = int(os.getenv('INGEST_STALE_SECONDS', '600'))
+# Running jobs refresh updated_at this often, well inside the stale window
+INGEST_HEARTBEAT_SECONDS = float(os.getenv('INGEST_HEARTBEAT_SECONDS', str(max(1, INGEST_STALE_SECONDS // 4))))
+# Finished (success/error) jobs are deleted this long after their last update
+INGEST_JOB_RETENTION_SECONDS = int(os.getenv('INGEST_JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+# Pruning runs at most this often, from finish()/fail()
+_PRUNE_INTERVAL = 60.0
+
+
+def spool_path(job_id: str, filename: str):
+    """Where an uploaded file waits until its ingestion job is done."""
+    return data_path('ingest_spool', f"{job_id}_{os.path.basename(filename)}")
+
+
+class JobQueue:
+    """Durable ingestion job queue on SQLite.
+
+    Jobs survive restarts and are shared by every uvicorn worker and by
+    separately launched ingest workers; claiming is atomic, so each job
+    runs once at a time. Running jobs are kept alive by ``heartbeat``;
+    finished jobs are dropped after INGEST_JOB_RETENTION_SECONDS.
+    """
+
+    def __init__(self, path=None, retention: int = INGEST_JOB_RETENTION_SECONDS):
+        self.retention = retention
+        self._db = connect_sqlite(path or data_path('ingest_queue.sqlite3'))
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                path TEXT NOT NULL,
+                file_sha256 TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at);
+            """
+        )
+
+    def enqueue(self, job_id: str, filename: str, path: str, file_sha256: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs(id, filename, path, file_sha256, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, filename, path, file_sha256, now, now),
+            )
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Atomically take the oldest queued job (or a stale running one)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND updated_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now - INGEST_STALE_SECONDS,),
+                ).fetchone()
+                if row is None:
+                    self._db.execute('COMMIT')
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, updated_at = ? WHERE id = ?",
+                    (worker, now, row[0]),
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        return self.get(row[0])
+
+    def update_progress(self, job_id: str, progress: dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id),
+            )
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Mark a running job as alive. Returns False if ``worker`` no longer owns it."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running' AND worker = ?",
+                (time.time(), job_id, worker),
+            )
+        return cur.rowcount > 0
+
+    def finish(self, job_id: str, result: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'success', result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), now, job_id),
+            )
+            self._maybe_prune(now)
+
+    def fail(self, job_id: str, error: str, retry: bool = True) -> bool:
+        """Record a failed attempt. Returns True if the job will be retried.
+
+        With ``retry=False`` the job fails for good regardless of attempts left.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            retry = retry and bool(row and row[0] < INGEST_MAX_ATTEMPTS)
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                ('queued' if retry else 'error', error, now, job_id),
+            )
+            self._maybe_prune(now)
+        return retry
+
+    def _maybe_prune(self, now: float) -> None:
+        if now - self._last_prune < _PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        self._db.execute(
+            "DELETE FROM jobs WHERE status IN ('success', 'error') AND updated_at < ?",
+            (now - self.retention,),
+        )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, filename, path, file_sha256, status, attempts, progress, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row[0],
+            'filename': row[1],
+            'path': row[2],
+            'file_sha256': row[3],
+            'status': row[4],
+            'attempts': row[5],
+            'progress': json.loads(row[6]) if row[6] else {},
+            'result': json.loads(row[7]) if row[7] else None,
+            'error': row[8],
+            'created_at': row[9],
+            'updated_at': row[10],
+        }
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
@@ -0,0 +1,165 @@
+"""Ingestion worker: processes jobs from the durable ingest queue.
+
+Run alongside the API (set INGEST_INPROCESS_WORKER=false on the API then):
+
+    python ingest_worker.py --concurrency 2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+from ingest_pipeline import ingest_pdf
+from ingest_queue import INGEST_HEARTBEAT_SECONDS, JobQueue
+
+
+LOGGER = logging.getLogger(__name__)
+
+INGEST_WORKER_CONCURRENCY = int(os.getenv('INGEST_WORKER_CONCURRENCY', '2'))
+INGEST_POLL_SECONDS = float(os.getenv('INGEST_POLL_SECONDS', '1.0'))
+# Progress is written to the queue at most this often per job
+_PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+class IngestWorker:
+    """Claims queued jobs and runs them, ``concurrency`` at a time."""
+
+    def __init__(self, queue: JobQueue, engine, index, manifests,
+                 concurrency: int = INGEST_WORKER_CONCURRENCY, poll_seconds: float = INGEST_POLL_SECONDS):
+        self.queue = queue
+        self.engine = engine
+        self.index = index
+        self.manifests = manifests
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        # Keeps updated_at fresh through long silent stretches (rate-limit
+        # waits, huge pages) so the job is not reclaimed as stale meanwhile
+        while True:
+            await asyncio.sleep(INGEST_HEARTBEAT_SECONDS)
+            try:
+                owned = await asyncio.to_thread(self.queue.heartbeat, job_id, self.name)
+            except Exception as e:
+                LOGGER.warning("Ingest job %s heartbeat failed: %s", job_id, e)
+                continue
+            if not owned:
+                LOGGER.warning("Ingest job %s is no longer owned by %s", job_id, self.name)
+                return
+
+    async def _write_progress(self, job_id: str, progress: dict) -> None:
+        try:
+            await asyncio.to_thread(self.queue.update_progress, job_id, progress)
+        except Exception as e:
+            LOGGER.warning("Ingest job %s progress update failed: %s", job_id, e)
+
+    async def _run_job(self, job: dict) -> None:
+        job_id = job['job_id']
+        last_report = 0.0
+        latest: dict = {}
+        pending: Optional[asyncio.Task] = None
+
+        def on_progress(progress: dict) -> None:
+            # Called on the event loop by the pipeline: the SQLite write runs in
+            # a thread, and at most one is in flight per job
+            nonlocal last_report, pending
+            latest.update(progress)
+            now = time.monotonic()
+            if now - last_report >= _PROGRESS_INTERVAL_SECONDS and (pending is None or pending.done()):
+                last_report = now
+                pending = asyncio.create_task(self._write_progress(job_id, dict(latest)))
+
+        LOGGER.info("Ingest job %s started: %s (attempt %d)", job_id, job['filename'], job['attempts'])
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await ingest_pdf(job['path'], job['filename'], job['file_sha256'] or '',
+                                      self.engine, self.index, self.manifests, on_progress=on_progress)
+        except Exception as e:
+            LOGGER.error("Ingest job %s failed: %s", job_id, e, exc_info=True)
+            if pending is not None:
+                await pending
+            if await asyncio.to_thread(self.queue.fail, job_id, f"파일 처리 중 오류가 발생했습니다: {e}"):
+                return
+        else:
+            if pending is not None:
+                await pending
+            if latest:
+                await self._write_progress(job_id, latest)
+            if result.get('status') == 'error':
+                # 문서 자체의 문제 (예: 텍스트 없음)는 재시도해도 같으므로 바로 실패 처리
+                await asyncio.to_thread(self.queue.fail, job_id, result.get('message') or "파일 처리 실패", retry=False)
+                LOGGER.warning("Ingest job %s failed: %s", job_id, result.get('message'))
+            else:
+                await asyncio.to_thread(self.queue.finish, job_id, result)
+                LOGGER.info("Ingest job %s finished: %s", job_id, result.get('message'))
+        finally:
+            heartbeat.cancel()
+        # 완료(또는 최종 실패)된 작업의 스풀 파일 정리
+        try:
+            if os.path.exists(job['path']):
+                os.remove(job['path'])
+        except Exception as e:
+            LOGGER.warning("Failed to remove spooled file %s: %s", job['path'], e)
+
+    async def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.name)
+            except Exception as e:
+                LOGGER.warning("Ingest queue claim failed: %s", e)
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_job(job)
+
+    async def run(self) -> None:
+        LOGGER.info("Ingest worker %s running with concurrency %d", self.name, self.concurrency)
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+
+def main(argv: Optional[list] = None) -> None:
+    from openai import AsyncOpenAI
+    from pinecone import Pinecone
+
+    from embedder import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, AsyncEmbeddingEngine
+    from embedding_cache import EMBED_CACHE_ENABLED, EmbeddingCache
+    from ingest_manifest import ManifestStore
+    from ingest_pipeline import PINECONE_INDEX_NAME, make_ascii_id, pinecone_api_key
+    from pdf_extract import shutdown_executor
+
+    parser = argparse.ArgumentParser(description="Process queued document ingestion jobs.")
+    parser.add_argument('--concurrency', type=int, default=INGEST_WORKER_CONCURRENCY,
+                        help="jobs processed in parallel (default: %(default)s)")
+    parser.add_argument('--poll-interval', type=float, default=INGEST_POLL_SECONDS,
+                        help="seconds between queue polls when idle (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    cache = EmbeddingCache(EMBEDDING_DIMENSIONS, name=make_ascii_id(EMBEDDING_MODEL)) if EMBED_CACHE_ENABLED else None
+    engine = AsyncEmbeddingEngine(AsyncOpenAI(), cache=cache)
+    index = Pinecone(api_key=pinecone_api_key()).Index(PINECONE_INDEX_NAME)
+    worker = IngestWorker(JobQueue(), engine, index, ManifestStore(),
+                          concurrency=args.concurrency, poll_seconds=args.poll_interval)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+# Root for on-disk state (caches, manifests, queues). Kept next to the app by
+# default; point ADMIN_DATA_DIR at a volume in Docker.
+_BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.getenv('ADMIN_DATA_DIR') or (_BASE_DIR / 'data'))
+
+
+def data_path(*parts: str) -> Path:
+    """Return a path under DATA_DIR, creating its parent directory."""
+    path = DATA_DIR.joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def connect_sqlite(path) -> sqlite3.Connection:
+    """Open a SQLite database shared by threads and uvicorn worker processes."""
+    conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+import pdfplumber
+from PyPDF2 import PdfReader
+
+
+LOGGER = logging.getLogger(__name__)
+
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(os.cpu_count() or 2)))
+# Pages handed to a worker per task; small enough to stream, big enough to amortize opening the file
+PDF_EXTRACT_PAGES_PER_TASK = int(os.getenv('PDF_EXTRACT_PAGES_PER_TASK', '8'))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool shared by all extractions in this process.
+
+    Workers are spawned rather than forked so they do not inherit the
+    server's threads and locks.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, PDF_EXTRACT_WORKERS),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+######################################################################
+# Extraction engines
+######################################################################
+# "fast": PyPDF2 text layer, pdfplumber only for pages where it finds nothing
+# "quality": pdfplumber layout analysis, PyPDF2 only as fallback
+PDF_EXTRACT_MODE = os.getenv('PDF_EXTRACT_MODE', 'quality')
+
+
+class _Document:
+    """Parsed handles for one PDF, opened lazily and shared by all pages."""
+
+    def __init__(self, pdf_path: str):
+        self.path = pdf_path
+        self._reader: Optional[PdfReader] = None
+        self._plumber = None
+
+    @property
+    def reader(self) -> PdfReader:
+        if self._reader is None:
+            self._reader = PdfReader(self.path)
+        return self._reader
+
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.path)
+        return self._plumber
+
+    def pypdf_text(self, index: int) -> str:
+        try:
+            return (self.reader.pages[index].extract_text() or "").strip()
+        except Exception as e:
+            LOGGER.debug("PyPDF2 extraction failed on page %d: %s", index + 1, e)
+            return ""
+
+    def plumber_text(self, index: int) -> str:
+        try:
+            page = self.plumber.pages[index]
+            try:
+                return page.extract_text() or ""
+            finally:
+                # 페이지 객체 캐시 해제 (메모리 일정 유지)
+                page.close()
+        except Exception as e:
+            LOGGER.debug("pdfplumber extraction failed on page %d: %s", index + 1, e)
+            return ""
+
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+        self._plumber = None
+        self._reader = None
+
+
+# One open document per worker process; consecutive page ranges of the same
+# upload reuse it instead of re-parsing the file.
+_current_doc: Optional[Tuple[Tuple[str, int], _Document]] = None
+
+
+def _get_document(pdf_path: str) -> _Document:
+    global _current_doc
+    key = (pdf_path, os.stat(pdf_path).st_mtime_ns)
+    if _current_doc is not None and _current_doc[0] == key:
+        return _current_doc[1]
+    if _current_doc is not None:
+        _current_doc[1].close()
+    _current_doc = (key, _Document(pdf_path))
+    return _current_doc[1]
+
+
+def _extract_fast(doc: _Document, index: int) -> str:
+    text = doc.pypdf_text(index)
+    if not text:
+        text = doc.plumber_text(index)
+    return text
+
+
+def _extract_quality(doc: _Document, index: int) -> str:
+    text = doc.plumber_text(index)
+    if not text.strip():
+        # pdfplumber로 텍스트가 없으면 PyPDF2로 재시도 (fallback)
+        text = doc.pypdf_text(index)
+    return text
+
+
+ENGINES = {
+    'fast': _extract_fast,
+    'quality': _extract_quality,
+}
+
+
+def count_pages(pdf_path: str) -> int:
+    return len(_get_document(pdf_path).reader.pages)
+
+
+def extract_page_range(pdf_path: str, start: int, end: int, mode: str = PDF_EXTRACT_MODE) -> List[str]:
+    """Extract text of pages [start, end) (0-based). Runs in a worker process."""
+    engine = ENGINES.get(mode)
+    if engine is None:
+        raise ValueError(f"unknown PDF extraction mode: {mode} (expected one of {', '.join(ENGINES)})")
+    doc = _get_document(pdf_path)
+    return [engine(doc, index) for index in range(start, end)]
+
+
+async def iter_pages(pdf_path: str, total_pages: int, mode: str = PDF_EXTRACT_MODE) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (page_no, text) in page order while workers extract ahead.
+
+    The page range is split into tasks of PDF_EXTRACT_PAGES_PER_TASK pages
+    and at most two tasks per worker are in flight, so results stream back
+    without buffering the whole document.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    step = max(1, PDF_EXTRACT_PAGES_PER_TASK)
+    ranges = [(s, min(s + step, total_pages)) for s in range(0, total_pages, step)]
+    max_in_flight = max(1, PDF_EXTRACT_WORKERS) * 2
+    pending: List[Tuple[int, asyncio.Future]] = []
+    next_range = 0
+    try:
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < max_in_flight:
+                start, end = ranges[next_range]
+                pending.append((start, loop.run_in_executor(executor, extract_page_range, pdf_path, start, end, mode)))
+                next_range += 1
+            start, future = pending.pop(0)
+            for offset, text in enumerate(await future):
+                yield start + offset + 1, text
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+######################################################################
+# Benchmark: python pdf_extract.py <file.pdf> [<file.pdf> ...]
+######################################################################
+def _benchmark(paths: List[str]) -> None:
+    import time
+
+    print(f"{'file':<40} {'mode':<8} {'pages':>6} {'pages/s':>9} {'chars':>10} {'empty':>6}")
+    for path in paths:
+        for mode in ENGINES:
+            # Start from a cold document so both modes pay for parsing
+            global _current_doc
+            if _current_doc is not None:
+                _current_doc[1].close()
+                _current_doc = None
+            started = time.perf_counter()
+            total = count_pages(path)
+            texts = extract_page_range(path, 0, total, mode)
+            elapsed = time.perf_counter() - started
+            chars = sum(len(t) for t in texts)
+            empty = sum(1 for t in texts if not t.strip())
+            print(f"{os.path.basename(path)[:40]:<40} {mode:<8} {total:>6} {total / elapsed:>9.1f} {chars:>10} {empty:>6}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python pdf_extract.py <file.pdf> [<file.pdf> ...]")
+        sys.exit(2)
+    _benchmark(sys.argv[1:])
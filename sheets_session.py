@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import gspread
+from gspread.urls import DRIVE_FILES_API_V3_URL
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+
+
+LOGGER = logging.getLogger(__name__)
+
+SHEETS_SCOPES = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+# Refresh the access token this long before it expires
+SHEETS_TOKEN_REFRESH_MARGIN = int(os.getenv('GOOGLE_SHEETS_TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+# Cached spreadsheet/worksheet handles are re-resolved after this long
+SHEETS_HANDLE_TTL = int(os.getenv('GOOGLE_SHEETS_HANDLE_TTL_SECONDS', '3600'))
+# Revision probes for the same spreadsheet within this window share one answer
+SHEETS_REVISION_PROBE_INTERVAL = float(os.getenv('GOOGLE_SHEETS_REVISION_PROBE_INTERVAL_SECONDS', '2'))
+
+
+class _Flight:
+    """One in-progress fetch that concurrent callers can wait on."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._error: Optional[BaseException] = None
+
+    def resolve(self, result=None, error: Optional[BaseException] = None) -> None:
+        self._result, self._error = result, error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class SheetsSession:
+    """One authorised gspread client per process, with cached handles.
+
+    A daemon thread refreshes the service-account token before it expires,
+    so requests never pay for a token exchange. Spreadsheet and worksheet
+    handles are kept for SHEETS_HANDLE_TTL, and header checks for a
+    worksheet run only the first time it is resolved. Credentials are
+    built on first use, so creating the session needs no valid key.
+    """
+
+    def __init__(self, service_account_info: dict, scopes: List[str] = SHEETS_SCOPES):
+        self._info = service_account_info
+        self._scopes = scopes
+        self._creds: Optional[Credentials] = None
+        self._client: Optional[gspread.Client] = None
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Tuple[gspread.Spreadsheet, float]] = {}
+        self._worksheets: Dict[Tuple[str, str], Tuple[gspread.Worksheet, float]] = {}
+        self._headers_checked: Set[Tuple[str, str]] = set()
+        self._inflight: Dict[Tuple[str, Tuple[str, ...]], _Flight] = {}
+        self._revisions: Dict[str, Tuple[Optional[str], float]] = {}
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    # --- credentials ---
+    def _authorize(self) -> Credentials:
+        with self._lock:
+            if self._creds is None:
+                creds = Credentials.from_service_account_info(self._info, scopes=self._scopes)
+                self._client = gspread.authorize(creds)
+                self._creds = creds
+            return self._creds
+
+    def _seconds_left(self) -> Optional[float]:
+        # google-auth keeps expiry as a naive UTC datetime
+        expiry = self._creds.expiry if self._creds is not None else None
+        if not expiry:
+            return None
+        return (expiry - datetime.utcnow()).total_seconds()
+
+    def _refresh_if_needed(self) -> None:
+        with self._lock:
+            creds = self._authorize()
+            left = self._seconds_left()
+            if creds.token and left is not None and left > SHEETS_TOKEN_REFRESH_MARGIN:
+                return
+            creds.refresh(Request())
+            LOGGER.debug("Refreshed Google Sheets access token (expires %s)", self._creds.expiry)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._refresh_if_needed()
+                left = self._seconds_left()
+                wait = (left - SHEETS_TOKEN_REFRESH_MARGIN) if left is not None else 60
+            except Exception as e:
+                LOGGER.warning("Google Sheets token refresh failed: %s", e)
+                wait = 30
+            self._stop.wait(max(wait, 5))
+
+    def start(self) -> None:
+        with self._lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(target=self._refresh_loop, name='sheets-token-refresh', daemon=True)
+            self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # --- handles ---
+    def client(self) -> gspread.Client:
+        if self._refresher is None or not self._refresher.is_alive():
+            # No background refresher (scripts, tests): refresh inline
+            self._refresh_if_needed()
+        else:
+            self._authorize()
+        return self._client  # type: ignore
+
+    def spreadsheet(self, key: str) -> gspread.Spreadsheet:
+        now = time.time()
+        with self._lock:
+            cached = self._docs.get(key)
+            if cached and now - cached[1] < SHEETS_HANDLE_TTL:
+                return cached[0]
+        doc = self.client().open_by_key(key)
+        with self._lock:
+            self._docs[key] = (doc, now)
+        return doc
+
+    def worksheet(self, key: str, title: str, headers: Optional[List[str]] = None) -> gspread.Worksheet:
+        """Return a worksheet handle; with ``headers``, create/fix the sheet once."""
+        now = time.time()
+        with self._lock:
+            cached = self._worksheets.get((key, title))
+            if cached and now - cached[1] < SHEETS_HANDLE_TTL and (headers is None or (key, title) in self._headers_checked):
+                return cached[0]
+        doc = self.spreadsheet(key)
+        with self._lock:
+            checked = (key, title) in self._headers_checked
+        if headers is None or checked:
+            ws = doc.worksheet(title)
+        else:
+            ws = self._ensure_headers(doc, title, headers)
+        with self._lock:
+            self._worksheets[(key, title)] = (ws, now)
+            if headers is not None:
+                self._headers_checked.add((key, title))
+        return ws
+
+    @staticmethod
+    def _ensure_headers(doc: gspread.Spreadsheet, title: str, headers: List[str]) -> gspread.Worksheet:
+        try:
+            ws = doc.worksheet(title)
+            current_headers = ws.row_values(1)
+            if not current_headers:
+                ws.append_row(headers)
+            elif len(current_headers) < len(headers):
+                # Ensure all headers exist by updating the first row
+                ws.update('A1', [headers])
+            return ws
+        except gspread.exceptions.WorksheetNotFound:
+            ws = doc.add_worksheet(title=title, rows="100", cols="26")
+            ws.append_row(headers)
+            return ws
+
+    def batch_get(self, key: str, ranges: List[str]) -> List[List[List[str]]]:
+        """Read several A1 ranges in one ``values_batch_get`` call.
+
+        Returns one row list per range, in request order. Threads asking for
+        the same ranges while a fetch is in flight share its result.
+        """
+        flight_key = (key, tuple(ranges))
+        with self._lock:
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[flight_key] = _Flight()
+        if not leader:
+            return flight.wait()
+        try:
+            resp = self.spreadsheet(key).values_batch_get(list(ranges))
+            result = [vr.get('values', []) for vr in resp.get('valueRanges', [])]
+            result += [[] for _ in range(len(ranges) - len(result))]
+        except BaseException as e:
+            flight.resolve(error=e)
+            raise
+        else:
+            flight.resolve(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+
+    def revision(self, key: str) -> Optional[str]:
+        """Cheap change marker for a spreadsheet: its Drive file version.
+
+        One small Drive metadata call instead of downloading values; callers
+        compare it with the revision their cached data was read at. Returns
+        None when the probe fails, which callers treat as "changed".
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._revisions.get(key)
+            if cached and now - cached[1] < SHEETS_REVISION_PROBE_INTERVAL:
+                return cached[0]
+        try:
+            meta = self.client().request(
+                'get', f"{DRIVE_FILES_API_V3_URL}/{key}",
+                params={'fields': 'version,modifiedTime', 'supportsAllDrives': True},
+            ).json()
+            rev = str(meta.get('version') or meta.get('modifiedTime') or '') or None
+        except Exception as e:
+            LOGGER.warning("Spreadsheet revision probe failed for %s: %s", key, e)
+            rev = None
+        with self._lock:
+            self._revisions[key] = (rev, now)
+        return rev
+
+    def invalidate(self, key: str, title: Optional[str] = None) -> None:
+        """Forget cached handles (e.g. after a sheet was renamed or deleted)."""
+        with self._lock:
+            if title is None:
+                self._docs.pop(key, None)
+                for k in [k for k in self._worksheets if k[0] == key]:
+                    self._worksheets.pop(k, None)
+                    self._headers_checked.discard(k)
+            else:
+                self._worksheets.pop((key, title), None)
+                self._headers_checked.discard((key, title))
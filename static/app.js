@@ -12,6 +12,10 @@ let chatLogsCache = {}; // 채팅 로그 캐시 (uuid -> logs)
 let lastSortedSessions = []; // 최근 정렬 결과 저장
 let chatSessionsLoaded = false; // 세션이 이미 로드되었는지 여부
 let chatSessionsLoading = false; // 세션 로딩 중인지 여부
+let chatSessionsCursor = null; // 다음 세션 페이지 커서 (없으면 마지막 페이지)
+let chatSessionsSort = 'default'; // 현재 정렬 옵션 (서버 정렬)
+const CHAT_SESSIONS_PAGE_SIZE = 50;
+const CHAT_LOGS_PAGE_SIZE = 200;
 
 // 참조 데이터 설정 로드 함수
 function loadReferenceSettings() {
@@ -591,7 +595,8 @@ async function loadDocumentList() {
     } else {
       // 이미 데이터가 있으면 리스트만 다시 표시
       setupSortOptions();
-      displaySortedSessions('default');
+      setupChatSearch();
+      displaySortedSessions();
     }
   });
   
@@ -1642,6 +1647,9 @@ async function uploadFile(file) {
 
     const result = await response.json();
     showNotification(`파일 ${file.name} 업로드 성공!`, 'success');
+    if (result && result.ingest_job_id) {
+      pollIngestJob(result.ingest_job_id, file.name);
+    }
     
     // 파일 목록에서 제거
     const index = filesToUpload.findIndex(f => f.name === file.name);
@@ -1967,6 +1975,44 @@ function setupFileUploadModal() {
   }
 } // setupFileUploadModal 함수 종료
 
+// 벡터링 작업 진행률 폴링 (업로드 응답은 즉시 반환되고 처리는 백그라운드에서 진행)
+async function pollIngestJob(jobId, fileName) {
+  const start = Date.now();
+  let lastPages = -1;
+  try {
+    while (Date.now() - start < 30 * 60 * 1000) {
+      const res = await fetch(`/api/ingest/status/${encodeURIComponent(jobId)}`, { headers: authHeaders(), credentials: 'same-origin' });
+      if (!res.ok) {
+        showNotification(`벡터링 상태 조회 실패 (HTTP ${res.status})`, 'error');
+        return;
+      }
+      const json = await res.json().catch(() => ({}));
+      const job = (json && json.data) || {};
+      const progress = job.progress || {};
+      if (job.status === 'success') {
+        const msg = (job.result && job.result.message) || '벡터링 완료';
+        showNotification(`${fileName}: ${msg}`, 'success');
+        if (typeof loadDocumentList === 'function') {
+          try { loadDocumentList(); } catch (e) { console.warn('문서 목록 새로고침 실패:', e); }
+        }
+        return;
+      }
+      if (job.status === 'error') {
+        showNotification(`${fileName} 벡터링 실패${job.error ? `: ${job.error}` : ''}`, 'error');
+        return;
+      }
+      if (progress.total_pages && progress.pages_done !== lastPages) {
+        lastPages = progress.pages_done;
+        console.log(`[ingest ${jobId}] ${fileName}: ${progress.pages_done}/${progress.total_pages} 페이지, ${progress.vectors_upserted || 0}개 청크 업로드`);
+      }
+      await new Promise(r => setTimeout(r, 2000));
+    }
+    showNotification(`${fileName} 벡터링 상태를 확인하지 못했습니다 (타임아웃).`, 'warning');
+  } catch (e) {
+    console.warn('벡터링 상태 폴링 실패:', e);
+  }
+}
+
 // 파일 업로드 함수 (모달용)
 async function uploadFiles() {
   if (!window.filesToUpload || window.filesToUpload.length === 0) {
@@ -1992,6 +2038,9 @@ async function uploadFiles() {
 
       // 성공 응답 파싱 및 Drive 스케줄링 경고 표시
       const respJson = await response.json().catch(() => ({}));
+      if (respJson && respJson.ingest_job_id) {
+        pollIngestJob(respJson.ingest_job_id, file.name);
+      }
       if (respJson && respJson.drive_upload_scheduled === false) {
         showNotification('Google Drive 업로드 예약에 실패했습니다.', 'warning');
       }
@@ -2003,8 +2052,9 @@ async function uploadFiles() {
       if (respJson && respJson.drive_upload_job_id) {
         try {
           const jobId = respJson.drive_upload_job_id;
-          const start = Date.now();
+          let start = Date.now();
           let lastStatus = 'pending';
+          let lastBytes = -1;
           while (Date.now() - start < 30000) {
             const stRes = await fetch(`/api/upload/status/${encodeURIComponent(jobId)}`, { headers: authHeaders(), credentials: 'same-origin' });
             if (!stRes.ok) {
@@ -2017,6 +2067,15 @@ async function uploadFiles() {
             if (s !== lastStatus) {
               lastStatus = s;
             }
+            // 청크 업로드가 진행 중이면 타임아웃을 연장
+            const progress = stJson && stJson.data ? stJson.data.progress : null;
+            if (progress && progress.bytes_sent !== lastBytes) {
+              lastBytes = progress.bytes_sent;
+              start = Date.now();
+              if (progress.total_bytes) {
+                console.log(`[drive ${jobId}] ${Math.round(100 * progress.bytes_sent / progress.total_bytes)}%`);
+              }
+            }
             if (s === 'success') {
               const link = stJson && stJson.data && stJson.data.drive_file ? stJson.data.drive_file.webViewLink : '';
               showNotification(`Drive 업로드 완료${link ? ` - <a href="${link}" target="_blank" rel="noopener">열기</a>` : ''}`, 'success');
@@ -2031,6 +2090,9 @@ async function uploadFiles() {
           }
           if (lastStatus === 'pending' || lastStatus === 'unknown') {
             showNotification('Drive 업로드 상태를 확인하지 못했습니다 (타임아웃).', 'warning');
+          } else if (lastStatus === 'retrying') {
+            // 서버가 백그라운드에서 계속 재시도하므로 실패로 표시하지 않음
+            showNotification('Drive 업로드가 실패하여 백그라운드에서 재시도 중입니다.', 'warning');
           }
         } catch (pollErr) {
           console.warn('Drive 업로드 상태 폴링 실패:', pollErr);
@@ -2093,9 +2155,9 @@ async function loadChatSessions() {
   try {
     // 이미 로드된 경우 재요청 방지
     if (chatSessionsLoaded || chatSessionsLoading) {
-      // 정렬만 갱신
       setupSortOptions();
-      displaySortedSessions('default');
+      setupChatSearch();
+      displaySortedSessions();
       return;
     }
     chatSessionsLoading = true;
@@ -2107,17 +2169,16 @@ async function loadChatSessions() {
       sidebar.innerHTML = '<div class="loading-container"><div class="loading-spinner"></div><div class="loading-text">세션을 불러오는 중...</div></div>';
     }
     
-    const res = await fetch('/api/chat/sessions', { headers: authHeaders(), credentials: 'same-origin' });
-    if (!res.ok) throw new Error('세션 목록 로드 실패');
-    
-    const json = await res.json();
-    chatSessionsData = json.data || []; // 전역 변수에 저장
+    // 첫 페이지만 요청 (정렬은 서버에서 수행)
+    const page = await fetchChatSessionsPage(chatSessionsSort, null);
+    chatSessionsData = page.data; // 전역 변수에 저장
+    chatSessionsCursor = page.nextCursor;
     
     // 정렬 옵션 이벤트 리스너 설정 (중복 바인딩 방지)
     setupSortOptions();
+    setupChatSearch();
     
-    // 기본 정렬로 세션 표시 (상위 5개 미리 로딩 없음)
-    displaySortedSessions('default');
+    displaySortedSessions();
     
     if (messages) {
       messages.innerHTML = '<div style="padding:8px;color:#9ca3af;">좌측에서 세션을 선택하세요. (순차적 로딩으로 변경됨)</div>';
@@ -2133,6 +2194,61 @@ async function loadChatSessions() {
 // 전역에서 접근 가능하도록 노출 (로그인 성공 시 자동 로드에 사용)
 window.loadChatSessions = loadChatSessions;
 
+// 화면의 정렬 옵션 → 서버 정렬 파라미터
+const CHAT_SESSION_SORTS = {
+  'default': { sort: 'ended_at', order: 'desc' },
+  'messages-desc': { sort: 'message_count', order: 'desc' },
+  'messages-asc': { sort: 'message_count', order: 'asc' }
+};
+
+async function fetchChatSessionsPage(sortType, cursor) {
+  const { sort, order } = CHAT_SESSION_SORTS[sortType] || CHAT_SESSION_SORTS['default'];
+  const params = new URLSearchParams({ limit: String(CHAT_SESSIONS_PAGE_SIZE), sort, order });
+  if (cursor) params.set('cursor', cursor);
+  const res = await fetch(`/api/chat/sessions?${params}`, { headers: authHeaders(), credentials: 'same-origin' });
+  if (!res.ok) throw new Error('세션 목록 로드 실패');
+  const json = await res.json();
+  return { data: json.data || [], nextCursor: json.next_cursor || null };
+}
+
+// 정렬 변경 시 첫 페이지부터 다시 조회
+async function reloadChatSessions(sortType) {
+  chatSessionsSort = sortType;
+  const sidebar = document.querySelector('#chat-history-content .chat-list');
+  if (sidebar) {
+    sidebar.innerHTML = '<div class="loading-container"><div class="loading-spinner"></div><div class="loading-text">세션을 불러오는 중...</div></div>';
+  }
+  try {
+    const page = await fetchChatSessionsPage(sortType, null);
+    chatSessionsData = page.data;
+    chatSessionsCursor = page.nextCursor;
+    displaySortedSessions();
+  } catch (e) {
+    console.error(e);
+  }
+}
+
+// 다음 세션 페이지를 받아 목록 뒤에 추가
+async function loadMoreChatSessions(button) {
+  if (!chatSessionsCursor) return;
+  if (button) {
+    button.disabled = true;
+    button.textContent = '불러오는 중...';
+  }
+  try {
+    const page = await fetchChatSessionsPage(chatSessionsSort, chatSessionsCursor);
+    chatSessionsData = chatSessionsData.concat(page.data);
+    chatSessionsCursor = page.nextCursor;
+    displaySortedSessions();
+  } catch (e) {
+    console.error(e);
+    if (button) {
+      button.disabled = false;
+      button.textContent = '더 보기';
+    }
+  }
+}
+
 async function loadChatLogs(uuid) {
   try {
     const messages = document.querySelector('#chat-history-content .chat-messages');
@@ -2140,7 +2256,7 @@ async function loadChatLogs(uuid) {
     // 캐시된 로그가 있으면 즉시 렌더링
     const cached = chatLogsCache && chatLogsCache[uuid];
     if (cached && messages) {
-      renderLogs(cached);
+      renderLogs(cached.logs, cached.nextCursor);
       return;
     }
 
@@ -2152,10 +2268,7 @@ async function loadChatLogs(uuid) {
     // 순차적 로딩을 위한 지연 (사용자 경험 개선)
     await new Promise(resolve => setTimeout(resolve, 100));
     
-    const res = await fetch(`/api/chat/logs/${encodeURIComponent(uuid)}`, { headers: authHeaders(), credentials: 'same-origin' });
-    if (!res.ok) throw new Error('채팅 로그 로드 실패');
-    const json = await res.json();
-    const logs = json.data || [];
+    const page = await fetchChatLogsPage(uuid, null);
     
     // 캐시에 저장 (메모리 효율성 향상)
     if (Object.keys(chatLogsCache).length > 50) {
@@ -2164,13 +2277,40 @@ async function loadChatLogs(uuid) {
       const oldestKey = keys[0];
       delete chatLogsCache[oldestKey];
     }
-    chatLogsCache[uuid] = logs;
+    chatLogsCache[uuid] = { logs: page.data, nextCursor: page.nextCursor };
 
     if (messages) {
-      renderLogs(logs);
+      renderLogs(page.data, page.nextCursor);
+    }
+
+    async function fetchChatLogsPage(sessionUuid, cursor) {
+      const params = new URLSearchParams({ limit: String(CHAT_LOGS_PAGE_SIZE) });
+      if (cursor) params.set('cursor', cursor);
+      const res = await fetch(`/api/chat/logs/${encodeURIComponent(sessionUuid)}?${params}`, { headers: authHeaders(), credentials: 'same-origin' });
+      if (!res.ok) throw new Error('채팅 로그 로드 실패');
+      const json = await res.json();
+      return { data: json.data || [], nextCursor: json.next_cursor || null };
+    }
+
+    // 다음 메시지 페이지를 받아 캐시에 이어 붙이고 다시 렌더링
+    async function loadMoreLogs(button) {
+      const entry = chatLogsCache[uuid];
+      if (!entry || !entry.nextCursor) return;
+      button.disabled = true;
+      button.textContent = '불러오는 중...';
+      try {
+        const next = await fetchChatLogsPage(uuid, entry.nextCursor);
+        entry.logs = entry.logs.concat(next.data);
+        entry.nextCursor = next.nextCursor;
+        renderLogs(entry.logs, entry.nextCursor);
+      } catch (err) {
+        console.error(err);
+        button.disabled = false;
+        button.textContent = '메시지 더 보기';
+      }
     }
 
-    function renderLogs(logsToRender) {
+    function renderLogs(logsToRender, nextCursor) {
       messages.innerHTML = logsToRender.map(l => {
         const type = (l.type || l.role || '').toLowerCase();
         const isBot = type === 'bot' || type === 'assistant';
@@ -2199,7 +2339,9 @@ async function loadChatLogs(uuid) {
                     ${referencesBtn}
                   </div>`;
         }
-      }).join('');
+      }).join('') + (nextCursor ? '<button class="load-more-btn load-more-logs">메시지 더 보기</button>' : '');
+      const moreBtn = messages.querySelector('.load-more-logs');
+      if (moreBtn) moreBtn.addEventListener('click', () => loadMoreLogs(moreBtn));
       messages.querySelectorAll('.references-chip').forEach(btn => {
         btn.addEventListener('click', () => {
           const ref = btn.getAttribute('data-ref');
@@ -2275,16 +2417,14 @@ function setupSortOptions() {
       const sortType = e.target.value;
       console.log('Sort option changed to:', sortType);
       
-      // 정렬 변경 시 즉시 재정렬 및 표시
-      displaySortedSessions(sortType);
+      // 정렬 변경 시 서버에서 첫 페이지부터 다시 조회
+      reloadChatSessions(sortType);
       
       // 정렬 변경 알림
       const sortLabels = {
         'default': '최근 대화순',
         'messages-desc': '대화쌍 많은순',
-        'messages-asc': '대화쌍 적은순',
-        'text-desc': '텍스트 많은순',
-        'text-asc': '텍스트 적은순'
+        'messages-asc': '대화쌍 적은순'
       };
       
       const label = sortLabels[sortType] || sortType;
@@ -2293,64 +2433,96 @@ function setupSortOptions() {
   }
 }
 
-function displaySortedSessions(sortType) {
+function setupChatSearch() {
+  const input = document.querySelector('#chat-history-content .search-input');
+  const button = document.querySelector('#chat-history-content .search-btn');
+  if (!input || !button) return;
+  // 중복 리스너 방지
+  if (input.dataset.bound === 'true') return;
+  input.dataset.bound = 'true';
+  button.addEventListener('click', () => searchChatHistory(input.value));
+  input.addEventListener('keydown', (e) => {
+    if (e.key === 'Enter') {
+      e.preventDefault();
+      searchChatHistory(input.value);
+    }
+  });
+}
+
+// 서버의 전문 검색 인덱스로 세션을 찾아 스니펫과 함께 표시 (빈 검색어면 목록으로 복귀)
+async function searchChatHistory(query) {
   const sidebar = document.querySelector('#chat-history-content .chat-list');
-  if (!sidebar || !chatSessionsData.length) return;
-  
-  let sortedSessions = [...chatSessionsData];
-  
-  switch (sortType) {
-    case 'messages-desc':
-      sortedSessions.sort((a, b) => {
-        const countA = parseInt(a.message_count || a.count || a[Object.keys(a)[3]] || 0);
-        const countB = parseInt(b.message_count || b.count || b[Object.keys(b)[3]] || 0);
-        return countB - countA;
-      });
-      break;
-      
-    case 'messages-asc':
-      sortedSessions.sort((a, b) => {
-        const countA = parseInt(a.message_count || a.count || a[Object.keys(a)[3]] || 0);
-        const countB = parseInt(b.message_count || b.count || b[Object.keys(b)[3]] || 0);
-        return countA - countB;
-      });
-      break;
-      
-    case 'text-desc':
-      sortedSessions.sort((a, b) => {
-        const textA = (a.message_count || a.count || a[Object.keys(a)[3]] || 0) * 100; // 대략적인 텍스트 길이 추정
-        const textB = (b.message_count || b.count || b[Object.keys(b)[3]] || 0) * 100;
-        return textB - textA;
-      });
-      break;
-      
-    case 'text-asc':
-      sortedSessions.sort((a, b) => {
-        const textA = (a.message_count || b.count || a[Object.keys(a)[3]] || 0) * 100;
-        const textB = (b.message_count || b.count || b[Object.keys(b)[3]] || 0) * 100;
-        return textA - textB;
-      });
-      break;
-      
-    default:
-      // 기본 순서: 대화의 끝시간(ended_at)을 기준으로 최신 대화가 맨 위에 오도록 정렬
-      sortedSessions.sort((a, b) => {
-        // ended_at (대화 종료 시간)을 우선으로 사용
-        const timeA = new Date(a.ended_at || a.end || a[Object.keys(a)[2]] || 0);
-        const timeB = new Date(b.ended_at || b.end || b[Object.keys(b)[2]] || 0);
-        
-        // 디버깅: 시간 정보 출력
-        console.log(`Session A (${a.uuid || 'unknown'}): ended_at=${a.ended_at}, parsed=${timeA}`);
-        console.log(`Session B (${b.uuid || 'unknown'}): ended_at=${b.ended_at}, parsed=${timeB}`);
-        
-        // 끝시간이 더 최근인 대화가 맨 위에 오도록 내림차순 정렬
-        // 예: 2025.08.13이 2025.07.30보다 위에 표시됨
-        const result = timeB - timeA;
-        console.log(`Sort result: ${result} (${timeB} - ${timeA})`);
-        return result;
-      });
-      break;
+  if (!sidebar) return;
+  const q = (query || '').trim();
+  if (!q) {
+    displaySortedSessions();
+    return;
+  }
+  sidebar.innerHTML = '<div class="loading-container"><div class="loading-spinner"></div><div class="loading-text">검색 중...</div></div>';
+  try {
+    const params = new URLSearchParams({ q, limit: '50' });
+    const res = await fetch(`/api/chat/search?${params}`, { headers: authHeaders(), credentials: 'same-origin' });
+    if (!res.ok) throw new Error('채팅 검색 실패');
+    const json = await res.json();
+    displaySearchResults(json.data || [], q);
+  } catch (e) {
+    console.error(e);
+    sidebar.innerHTML = `<div style="padding:8px;color:#ef4444;">${escapeHtml(e.message)}</div>`;
+  }
+}
+
+function displaySearchResults(results, query) {
+  const sidebar = document.querySelector('#chat-history-content .chat-list');
+  if (!sidebar) return;
+  const backBtn = '<button class="load-more-btn search-back">전체 목록으로</button>';
+  if (!results.length) {
+    sidebar.innerHTML = `<div style="padding:8px;color:#9ca3af;">'${escapeHtml(query)}'에 대한 검색 결과가 없습니다.</div>` + backBtn;
+  } else {
+    sidebar.innerHTML = results.map((r, index) => {
+      const snippets = (r.snippets || []).map(sn => `
+        <div class="search-snippet">
+          <span class="time-label">${escapeHtml(sn.role || '')}</span> ${escapeHtml(sn.snippet || '')}
+        </div>`).join('');
+      return `<div class="chat-item" data-uuid="${escapeHtml(r.uuid)}" data-order="${index + 1}">
+               <div class="session-order">${index + 1}</div>
+               <div class="uuid-text">${escapeHtml(r.uuid)}</div>
+               <div class="session-info">
+                 <div class="session-times">
+                   <span class="time-label">최근 일치:</span> ${escapeHtml(r.last_matched_at || '알 수 없음')}
+                 </div>
+                 ${snippets}
+                 <div class="session-meta">
+                   <div class="meta-left">
+                     <span class="message-count">${r.match_count}개 메시지 일치</span>
+                   </div>
+                 </div>
+               </div>
+             </div>`;
+    }).join('') + backBtn;
   }
+  sidebar.querySelector('.search-back').addEventListener('click', () => {
+    const input = document.querySelector('#chat-history-content .search-input');
+    if (input) input.value = '';
+    displaySortedSessions();
+  });
+  sidebar.querySelectorAll('.chat-item').forEach(el => {
+    el.addEventListener('click', () => {
+      sidebar.querySelectorAll('.chat-item').forEach(i => i.classList.remove('active'));
+      el.classList.add('active');
+      el.classList.add('loading');
+      loadChatLogs(el.getAttribute('data-uuid')).finally(() => {
+        el.classList.remove('loading');
+      });
+    });
+  });
+}
+
+function displaySortedSessions() {
+  const sidebar = document.querySelector('#chat-history-content .chat-list');
+  if (!sidebar) return;
+  
+  // 정렬은 서버에서 수행됨 (chatSessionsSort), 받은 순서대로 표시
+  const sortedSessions = [...chatSessionsData];
   
   // 최근 정렬 상태 저장
   lastSortedSessions = sortedSessions;
@@ -2397,7 +2569,10 @@ function displaySortedSessions(sortType) {
                </div>
              </div>
            </div>`;
-  }).join('');
+  }).join('') + (chatSessionsCursor ? '<button class="load-more-btn load-more-sessions">더 보기</button>' : '');
+  
+  const moreBtn = sidebar.querySelector('.load-more-sessions');
+  if (moreBtn) moreBtn.addEventListener('click', () => loadMoreChatSessions(moreBtn));
   
   // 클릭 이벤트 리스너 다시 설정
   sidebar.querySelectorAll('.chat-item').forEach(el => {
@@ -0,0 +1,91 @@
+import collections
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# cl100k_base pre-tokenisation: a leading space belongs to the next word
+_PAT = r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+_CORPUS = (
+    "관리자 페이지에서 업로드한 문서는 페이지별로 나누어 임베딩합니다. 회의록과 보고서를 검색할 수 있습니다. "
+    "The quick brown fox jumps over the lazy dog. Documents are chunked by paragraph and embedded in batches. "
+) * 4
+
+
+def _train_bpe(text: str, n_merges: int) -> dict:
+    """Tiny byte-level BPE, so tests exercise real merges without downloading tiktoken files."""
+    import regex
+
+    ranks = {bytes([i]): i for i in range(256)}
+    words = collections.Counter(tuple(bytes([b]) for b in w.encode('utf-8')) for w in regex.findall(_PAT, text))
+    for _ in range(n_merges):
+        pairs = collections.Counter()
+        for word, freq in words.items():
+            for a, b in zip(word, word[1:]):
+                pairs[a, b] += freq
+        if not pairs:
+            break
+        (a, b), _ = pairs.most_common(1)[0]
+        ranks[a + b] = len(ranks)
+        merged = collections.Counter()
+        for word, freq in words.items():
+            out, i = [], 0
+            while i < len(word):
+                if i + 1 < len(word) and word[i] == a and word[i + 1] == b:
+                    out.append(a + b)
+                    i += 2
+                else:
+                    out.append(word[i])
+                    i += 1
+            merged[tuple(out)] += freq
+        words = merged
+    return ranks
+
+
+@pytest.fixture(scope='session')
+def bpe_encoder():
+    import tiktoken
+
+    return tiktoken.Encoding('test_bpe', pat_str=_PAT, mergeable_ranks=_train_bpe(_CORPUS, 300), special_tokens={})
+
+
+@pytest.fixture
+def offline_encoder(monkeypatch, bpe_encoder):
+    """Make chunker.get_encoder return the local BPE encoder."""
+    import chunker
+
+    monkeypatch.setattr(chunker, 'get_encoder', lambda model: bpe_encoder)
+    return bpe_encoder
+
+
+@pytest.fixture
+def data_dir(monkeypatch, tmp_path):
+    """Point local_store at a fresh directory for on-disk state."""
+    import local_store
+
+    monkeypatch.setattr(local_store, 'DATA_DIR', tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """Import app.py with a dummy Pinecone key and on-disk state in a temp dir.
+
+    Nothing reaches Google or Pinecone at import; tests replace ``app.sheets``.
+    """
+    for name in ('fastapi', 'gspread', 'jose', 'passlib', 'pinecone', 'openai'):
+        pytest.importorskip(name)
+    import ingest_pipeline
+    import local_store
+
+    mp = pytest.MonkeyPatch()
+    mp.setattr(ingest_pipeline, 'PINECONE_API_KEY', 'test-key')
+    mp.setattr(local_store, 'DATA_DIR', tmp_path_factory.mktemp('app-data'))
+    mp.chdir(ROOT)
+    import app
+
+    yield app
+    mp.undo()
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+ADMIN_ROWS = [['username', 'password_hash', 'is_super_admin', 'created_at', 'updated_at'],
+              ['root', 'x', 'TRUE', '', ''], ['kim', 'y', 'FALSE', '', '']]
+PERM_ROWS = [['username', 'category', 'can_view', 'can_save', 'updated_at'],
+             ['kim', 'prompt-setting', 'TRUE', 'FALSE', ''], ['lee', 'data-setting', 'TRUE', 'TRUE', '']]
+
+
+class FakePermissionsSheet:
+    def __init__(self):
+        self.rows = [list(r) for r in PERM_ROWS]
+
+    def get_all_values(self):
+        return [list(r) for r in self.rows]
+
+    def append_rows(self, values, value_input_option=None):
+        self.rows.extend(values)
+
+
+class FakeDoc:
+    id = 'key'
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    def values_batch_update(self, body):
+        for item in body['data']:
+            row = int(item['range'].split('!A')[1].split(':')[0])
+            self.ws.rows[row - 1] = item['values'][0]
+
+
+class FakeSheets:
+    def __init__(self):
+        self.rev = '1'
+        self.ws = FakePermissionsSheet()
+        self.batch_calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def spreadsheet(self, key):
+        return FakeDoc(self.ws)
+
+    def worksheet(self, key, title, headers=None):
+        return self.ws
+
+    def revision(self, key):
+        return self.rev
+
+    def batch_get(self, key, ranges):
+        self.batch_calls.append(list(ranges))
+        self.gate.wait(5)
+        return [ADMIN_ROWS if 'Admins' in r else self.ws.get_all_values() for r in ranges]
+
+
+@pytest.fixture
+def app(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'sheets', FakeSheets())
+    monkeypatch.setattr(app_module, '_admin_cache', {"data": None, "time": 0.0, "rev": None})
+    monkeypatch.setattr(app_module, '_perms_index', {"data": None, "time": 0.0, "rev": None})
+    monkeypatch.setattr(app_module, '_auth_refreshing', {})
+    yield app_module
+    # Let background refreshes finish before the fake session is swapped out
+    app_module.sheets.gate.set()
+    for done in list(app_module._auth_refreshing.values()):
+        done.wait(5)
+
+
+def test_permissions_are_served_from_one_index_read(app):
+    assert app._get_permissions('kim') == {'prompt-setting': {'can_view': True, 'can_save': False}}
+    assert app._get_permissions('lee')['data-setting']['can_save'] is True
+    assert app._get_permissions('nobody') == {}
+    assert len(app.sheets.batch_calls) == 1 and app._PERMISSIONS_RANGE in app.sheets.batch_calls[0]
+
+
+def test_set_permissions_writes_through_to_the_index(app):
+    before = {user: app._get_permissions(user) for user in ('kim', 'lee')}
+    app._set_permissions('kim', {'prompt-setting': {'can_view': True, 'can_save': True},
+                                 'data-setting': {'can_view': True}})
+    expected = {'prompt-setting': {'can_view': True, 'can_save': True},
+                'data-setting': {'can_view': True, 'can_save': False}}
+    assert app._get_permissions('kim') == expected
+    assert app._get_permissions('lee') == before['lee']
+    # No re-read, and the index now matches what a full read would build
+    assert len(app.sheets.batch_calls) == 1
+    assert app._store_permission_rows(app.sheets.ws.get_all_values())['kim'] == expected
+
+
+def _age(cache, seconds=3600):
+    cache["time"] -= seconds
+
+
+def test_stale_caches_answer_at_once_and_refresh_in_background(app):
+    app._get_permissions('kim')
+    _age(app._admin_cache)
+    _age(app._perms_index)
+    app.sheets.gate.clear()
+    app.sheets.ws.rows[1][3] = 'TRUE'
+    app.sheets.rev = '2'
+
+    # Served from the expired caches while one refresh waits on Sheets
+    assert app._get_permissions('kim')['prompt-setting']['can_save'] is False
+    assert app._get_admin_by_username('root')['is_super_admin'] == 'TRUE'
+    assert app._get_permissions('kim')['prompt-setting']['can_save'] is False
+    assert set(app._auth_refreshing) == {'admins', 'perms'}
+    assert len(set(map(id, app._auth_refreshing.values()))) == 2
+
+    app.sheets.gate.set()
+    for done in list(app._auth_refreshing.values()):
+        done.wait(5)
+    assert app._get_permissions('kim')['prompt-setting']['can_save'] is True
+    assert len(app.sheets.batch_calls) == 3
+
+
+def test_cold_loads_share_one_read(app):
+    app.sheets.gate.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(app._get_admin_by_username('kim'))) for _ in range(3)]
+    threads += [threading.Thread(target=lambda: results.append(app._get_permissions('kim'))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    app.sheets.gate.set()
+    for t in threads:
+        t.join()
+    assert len(results) == 6 and all(results)
+    assert app.sheets.batch_calls == [[app._ADMIN_RANGE, app._PERMISSIONS_RANGE]]
+
+
+def test_cold_caches_load_off_the_event_loop(app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    load, blocked_loop = app._load_auth_caches, []
+
+    def load_auth_caches():
+        try:
+            asyncio.get_running_loop()
+            blocked_loop.append(True)
+        except RuntimeError:
+            pass
+        load()
+
+    monkeypatch.setattr(app, '_load_auth_caches', load_auth_caches)
+    client = TestClient(app.app)
+    client.cookies.set(app.COOKIE_NAME, app.create_access_token({'sub': 'kim'}))
+    resp = client.get('/api/admin/me')
+    assert resp.status_code == 200
+    assert resp.json()['data']['permissions'] == {'prompt-setting': {'can_view': True, 'can_save': False}}
+    assert app.sheets.batch_calls and blocked_loop == []
+
+
+def test_refresh_skips_the_download_when_the_revision_is_unchanged(app):
+    app._get_permissions('kim')
+    _age(app._admin_cache)
+    _age(app._perms_index)
+    app._refresh_auth_caches(admins=True, perms=True)
+    assert len(app.sheets.batch_calls) == 1
+    assert app._admins_fresh() and app._perms_index_fresh()
+
+    app.sheets.rev = '2'
+    app._refresh_auth_caches(admins=True, perms=True)
+    assert app.sheets.batch_calls[1] == [app._ADMIN_RANGE, app._PERMISSIONS_RANGE]
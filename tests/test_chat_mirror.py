@@ -0,0 +1,204 @@
+import pytest
+
+import chat_mirror
+from chat_mirror import ChatLogMirror, ChatSessionMirror, decode_cursor, encode_cursor, range_bounds, sortable_ts
+
+
+class FakeWorksheet:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get(self, cells):
+        # 'A:E' is the whole sheet, 'A7:E' starts at sheet row 7
+        start = cells.split(':')[0][1:]
+        return [list(r) for r in self.rows[int(start) - 1 if start else 0:]]
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.ws = FakeWorksheet(rows)
+        self.rev = 1
+
+    def revision(self, key):
+        return self.rev
+
+    def worksheet(self, key, title):
+        return self.ws
+
+    def append(self, *rows):
+        self.ws.rows.extend(rows)
+        self.rev += 1
+
+
+LOG_HEADERS = ['uuid', 'role', 'message', 'timestamp']
+SESSION_HEADERS = ['uuid', 'started_at', 'ended_at', 'message_count']
+
+
+def _log_mirror(data_dir, rows):
+    session = FakeSession([LOG_HEADERS] + rows)
+    return ChatLogMirror(session, 'key', 'ChatLogs', data_dir / 'chat.sqlite3'), session
+
+
+def test_sortable_ts_converts_offsets_to_chat_zone():
+    # 00:30 UTC is 09:30 in Seoul, so it sorts after 09:00+09:00
+    assert sortable_ts('2024-03-01T00:30:00Z') == '2024-03-01T09:30:00'
+    assert sortable_ts('2024-03-01T09:00:00+09:00') == '2024-03-01T09:00:00'
+    assert sortable_ts('2024-03-01T00:30:00Z') > sortable_ts('2024-03-01T09:00:00+09:00')
+    # No offset: already local
+    assert sortable_ts('2024. 3. 1 오후 3:00:00') == '2024-03-01T15:00:00'
+
+
+def test_range_bounds_rejects_unparseable_dates():
+    assert range_bounds('2024-03-01', '2024-03-02') == ('2024-03-01T00:00:00', '2024-03-02T23:59:59')
+    with pytest.raises(ValueError):
+        range_bounds('yesterday', None)
+    with pytest.raises(ValueError):
+        range_bounds(None, "2024-03-01' OR 1=1")
+
+
+@pytest.mark.parametrize('payload', [
+    {'k': [{'x': 1}, 2]},
+    {'k': ['2024-03-01T00:00:00', '2']},
+    {'k': ['2024-03-01T00:00:00', True]},
+    {'k': ['2024-03-01T00:00:00']},
+    ['2024-03-01T00:00:00', 2],
+])
+def test_wrongly_typed_cursor_is_rejected(data_dir, payload):
+    mirror, _ = _log_mirror(data_dir, [['s1', 'user', 'hi', '2024-03-01T10:00:00']])
+    mirror.sync()
+    with pytest.raises(ValueError):
+        mirror.page('s1', 10, encode_cursor(payload))
+
+
+def test_session_cursor_key_type_follows_sort(data_dir):
+    session = FakeSession([SESSION_HEADERS, ['s1', '2024-03-01T10:00:00', '2024-03-01T10:05:00', '4']])
+    mirror = ChatSessionMirror(session, 'key', 'Sessions', data_dir / 'chat.sqlite3')
+    mirror.sync()
+    with pytest.raises(ValueError):
+        mirror.page(10, encode_cursor({'s': 'message_count', 'o': 'desc', 'k': ['4', 2]}), 'message_count')
+    assert decode_cursor(encode_cursor({'s': 'message_count', 'o': 'desc', 'k': [4, 2]}), int)['k'] == [4, 2]
+
+
+def test_changing_zone_forces_full_resync(data_dir, monkeypatch):
+    mirror, session = _log_mirror(data_dir, [['s1', 'user', 'hi', '2024-03-01T00:30:00Z']])
+    mirror.sync()
+    assert mirror.page('s1', 10)[0][0]['timestamp'] == '2024-03-01T00:30:00Z'
+
+    monkeypatch.setattr(chat_mirror, 'CHAT_TIMEZONE', 'UTC')
+    monkeypatch.setattr(chat_mirror, 'CHAT_ZONE', chat_mirror._load_zone('UTC'))
+    # Same revision, but the stored keys were normalised to another zone
+    assert mirror.sync() == 1
+    assert mirror.page('s1', 10, since='2024-03-01T00:00:00', until='2024-03-01T01:00:00')[0]
+
+
+def _search_rows():
+    rows = []
+    for i in range(12):
+        uuid = f's{i % 4}'
+        rows.append([uuid, 'user', f'주간회의록 {i} 공유 부탁드립니다', f'2024-03-01T10:{i:02d}:00'])
+        rows.append([uuid, 'assistant', f'회 의 일정 {i}', f'2024-03-01T11:{i:02d}:00'])
+    return rows
+
+
+def test_search_returns_newest_sessions_with_real_word_matches(data_dir):
+    mirror, _ = _log_mirror(data_dir, _search_rows())
+    mirror.sync()
+    hits = mirror.search('회의록', 10)
+    # Newest matching message is i=11 in s3, then s2, s1, s0
+    assert [h['uuid'] for h in hits] == ['s3', 's2', 's1', 's0']
+    assert all(h['match_count'] == 3 for h in hits)
+    assert hits[0]['last_matched_at'] == '2024-03-01T10:11:00'
+    # "회 의 일정" has both syllables of "회의" but not the word
+    assert mirror.search('회의 일정', 10) == []
+
+
+def test_search_stops_at_limit_and_caps_candidates(data_dir, monkeypatch):
+    mirror, _ = _log_mirror(data_dir, _search_rows())
+    mirror.sync()
+    assert [h['uuid'] for h in mirror.search('회의록', 2)] == ['s3', 's2']
+
+    monkeypatch.setattr(chat_mirror, 'CHAT_SEARCH_MAX_CANDIDATES', 2)
+    hits = mirror.search('회의록', 10)
+    assert [(h['uuid'], h['match_count']) for h in hits] == [('s3', 1), ('s2', 1)]
+
+
+def test_stats_bucket_mixed_offsets_in_chat_zone(data_dir):
+    mirror, _ = _log_mirror(data_dir, [
+        ['s1', 'user', 'a', '2024-03-01T16:30:00Z'],        # 2024-03-02 01:30 in Seoul
+        ['s1', 'assistant', 'b', '2024-03-02T01:40:00+09:00'],
+        ['s2', 'user', 'c', '2024-03-02T10:00:00'],         # no offset: local already
+    ])
+    mirror.sync()
+    stats = mirror.stats()
+    assert stats['timezone'] == 'Asia/Seoul'
+    assert stats['sessions_per_day'] == [{'date': '2024-03-02', 'sessions': 2, 'messages': 3}]
+    hours = {h['hour']: h['messages'] for h in stats['hours'] if h['messages']}
+    assert hours == {1: 2, 10: 1}
+
+
+def test_log_cursor_pages_through_every_message_once(data_dir):
+    rows = [['s1', 'user', f'm{i}', f'2024-03-01T10:0{i // 2}:00'] for i in range(7)]  # pairs share a timestamp
+    rows.append(['s2', 'user', 'other', '2024-03-01T10:00:00'])
+    mirror, _ = _log_mirror(data_dir, rows)
+    mirror.sync()
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = mirror.page('s1', 3, cursor)
+        seen += [m['message'] for m in page]
+        if cursor is None:
+            break
+    assert seen == [f'm{i}' for i in range(7)]
+
+
+def test_session_cursor_pages_in_sort_order(data_dir):
+    counts = [5, 2, 5, 9, 1]
+    session = FakeSession([SESSION_HEADERS] + [
+        [f's{i}', f'2024-03-0{i + 1}T09:00:00', f'2024-03-0{i + 1}T10:00:00', str(n)] for i, n in enumerate(counts)
+    ])
+    mirror = ChatSessionMirror(session, 'key', 'Sessions', data_dir / 'chat.sqlite3')
+    mirror.sync()
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = mirror.page(2, cursor, 'message_count', 'desc')
+        seen += [s['uuid'] for s in page]
+        if cursor is None:
+            break
+    # Ties on message_count fall back to sheet row, in the same direction
+    assert seen == ['s3', 's2', 's0', 's1', 's4']
+
+    _, cursor = mirror.page(2, None, 'started_at', 'asc', since='2024-03-02', until='2024-03-04')
+    assert mirror.page(2, cursor, 'started_at', 'asc', '2024-03-02', '2024-03-04')[0] == [
+        {'uuid': 's3', 'started_at': '2024-03-04T09:00:00', 'ended_at': '2024-03-04T10:00:00', 'message_count': '9'}
+    ]
+    with pytest.raises(ValueError):
+        mirror.page(2, cursor, 'ended_at', 'asc')
+
+
+def test_incremental_stats_match_full_recompute(data_dir):
+    batches = [
+        [['s1', 'user', 'a', '2024-03-01T23:50:00'], ['s1', 'assistant', 'b', '2024-03-02T00:10:00']],
+        [['s2', 'user', 'c', '2024-03-02T08:00:00+00:00']],
+        # An older message of s2 arrives late and moves its first day back
+        [['s2', 'assistant', 'd', '2024-03-01T12:00:00'], ['s3', 'user', 'e', 'not a time'],
+         ['', 'user', 'no uuid', '2024-03-02T09:00:00']],
+        [['s1', 'user', 'f', '2024-03-03T10:00:00'], ['s4', 'tool', 'g', '2024-03-03T11:00:00']],
+    ]
+    mirror, session = _log_mirror(data_dir, [])
+    mirror.sync()
+    for i, batch in enumerate(batches):
+        session.append(*batch)
+        mirror.sync()
+        if i == 2:
+            # Another process mirrored these rows and the state lagged behind: they are re-applied
+            mirror._db.execute("UPDATE sync_state SET last_row = 2")
+            session.rev += 1
+            mirror.sync()
+
+    fresh = ChatLogMirror(FakeSession([list(r) for r in session.ws.rows]), 'key', 'ChatLogs',
+                          data_dir / 'fresh.sqlite3')
+    fresh.sync()
+    assert mirror.stats() == fresh.stats()
+    assert mirror.stats('2024-03-02', '2024-03-03') == fresh.stats('2024-03-02', '2024-03-03')
+    assert mirror.stats()['totals'] == {'sessions': 4, 'messages': 7}
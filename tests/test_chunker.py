@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from chunker import OVERLAP_TOKENS, TARGET_MAX_TOKENS, TARGET_TOKENS, TokenChunker, _legacy_chunk
+
+_WORDS = ("관리자", "페이지", "업로드", "문서의", "예시", "문단입니다.", "회의록", "보고서를", "검색",
+          "The", "quick", "brown", "fox", "jumps", "over", "lazy", "dog.", "chunk", "embedding", "2024")
+
+
+def _random_page(rng: random.Random) -> str:
+    paragraphs = []
+    for _ in range(rng.randint(1, 25)):
+        n_words = rng.choice([rng.randint(3, 80), rng.randint(300, 900)])
+        paragraphs.append(" ".join(rng.choice(_WORDS) for _ in range(n_words)))
+    if rng.random() < 0.2:
+        # One very long unbroken paragraph, cut on token boundaries
+        paragraphs.append("".join(rng.choice(_WORDS) for _ in range(rng.randint(1500, 3000))))
+    return "\n\n".join(paragraphs)
+
+
+def test_matches_legacy_chunker(offline_encoder):
+    rng = random.Random(8)
+    token_chunker = TokenChunker('test')
+    for _ in range(60):
+        page = _random_page(rng)
+        assert [c.text for c in token_chunker.chunk(page)] == _legacy_chunk(page, 'test')
+
+
+def test_chunk_boundaries_and_overlap(offline_encoder):
+    para = "관리자 페이지 업로드 문서의 예시 문단입니다. The quick brown fox jumps over the lazy dog."
+    page = "\n\n".join([para] * 300)
+    chunks = TokenChunker('test').chunk(page)
+    assert len(chunks) > 2
+
+    bodies = []
+    for i, c in enumerate(chunks):
+        # Counts are summed per part; BPE merges at the joins make them a slight overestimate
+        exact = len(offline_encoder.encode(c.text))
+        assert exact <= c.n_tokens <= exact + c.text.count(para) + 2
+        body = c.text
+        if i:
+            # Each later chunk starts with the re-encoded tail of the previous body
+            tail = offline_encoder.decode(offline_encoder.encode(bodies[-1])[-OVERLAP_TOKENS:]).lstrip()
+            assert body.startswith(tail + " ")
+            body = body[len(tail) + 1:]
+        # Bodies are whole paragraphs, never cut mid-paragraph
+        assert set(body.split(para)) <= {"", " "}
+        n_paragraphs = body.count(para)
+        # The target counts paragraph tokens, not the separators between them
+        assert n_paragraphs * len(offline_encoder.encode(para)) <= TARGET_TOKENS
+        assert (n_paragraphs + 1) * len(offline_encoder.encode(para)) > TARGET_TOKENS or i == len(chunks) - 1
+        bodies.append(body)
+    assert " ".join(bodies) == " ".join([para] * 300)
+
+
+def test_long_paragraph_cut_on_token_boundaries(offline_encoder):
+    long_para = "회의록보고서" * 2000
+    assert len(offline_encoder.encode(long_para)) > TARGET_MAX_TOKENS
+    chunks = TokenChunker('test').chunk("짧은 문단\n\n" + long_para)
+    assert chunks[0].text == "짧은 문단"
+    assert len(chunks) >= 3
+    assert all(c.n_tokens <= TARGET_TOKENS + OVERLAP_TOKENS + 1 for c in chunks)
+
+
+def test_empty_page(offline_encoder):
+    assert TokenChunker('test').chunk("  \n\n \n") == []
+
+
+def test_encoder_loaded_lazily(monkeypatch):
+    pytest.importorskip('openai')
+    import ingest_pipeline
+
+    calls = []
+    monkeypatch.setattr(ingest_pipeline, '_chunker', None)
+    monkeypatch.setattr(ingest_pipeline, 'TokenChunker', lambda model: calls.append(model) or object())
+    assert calls == []
+    first = ingest_pipeline.get_chunker()
+    assert ingest_pipeline.get_chunker() is first
+    assert calls == [ingest_pipeline.EMBEDDING_MODEL]
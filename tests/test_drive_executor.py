@@ -0,0 +1,148 @@
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip('googleapiclient')
+pytest.importorskip('google_auth_oauthlib')
+
+import gdrive_uploader  # noqa: E402
+from gdrive_uploader import DriveUploadExecutor, drive_spool_path  # noqa: E402
+
+
+@pytest.fixture
+def uploads(data_dir, monkeypatch):
+    """Record upload calls; files whose display name contains 'fail' fail."""
+    calls = []
+
+    def upload(file_path, display_name, job_id, sha256=None):
+        calls.append(job_id)
+        return None if 'fail' in display_name else {'id': f'drive-{job_id}'}
+
+    monkeypatch.setattr(gdrive_uploader, 'upload_file_to_drive', upload)
+    monkeypatch.setattr(gdrive_uploader, '_set_status', lambda *a, **k: None)
+    return calls
+
+
+@pytest.fixture
+def statuses(monkeypatch):
+    """Record (job_id, status) pairs reported through _set_status."""
+    seen = []
+    monkeypatch.setattr(gdrive_uploader, '_set_status', lambda job_id, status, *a, **k: seen.append((job_id, status)))
+    return seen
+
+
+def _spool(job_id: str, name: str) -> str:
+    path = drive_spool_path(job_id, name)
+    path.write_bytes(b'x' * 10)
+    return str(path)
+
+
+def _wait(predicate, timeout: float = 3.0) -> None:
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def _leave_claim(job_id: str, name: str, owner: str, age: float) -> str:
+    path = _spool(job_id, name)
+    claim = f"{path}.json.running-{owner}"
+    with open(claim, 'w') as f:
+        json.dump({'file_path': path, 'display_name': name, 'job_id': job_id}, f)
+    os.utime(claim, (time.time() - age, time.time() - age))
+    return path
+
+
+def test_upload_removes_spool_entry(uploads):
+    executor = DriveUploadExecutor(concurrency=1)
+    executor.start()
+    try:
+        path = _spool('a', 'a.pdf')
+        executor.submit(path, 'a.pdf', 'a')
+        _wait(lambda: executor.stats()['completed'] == 1)
+    finally:
+        executor.stop()
+    assert uploads == ['a']
+    assert not os.path.exists(path) and not os.path.exists(path + '.json')
+
+
+def test_recover_takes_back_expired_claims_even_with_reused_pid(uploads):
+    # A restarted container gets PID 1 again: a claim tagged "1" must still be recovered
+    dead = _leave_claim('old', 'old.pdf', '1', age=600)
+    live = _leave_claim('live', 'live.pdf', 'other-process', age=1)
+    executor = DriveUploadExecutor(concurrency=1, lease=300)
+    assert executor.recover() == 1
+    executor.start()
+    try:
+        _wait(lambda: executor.stats()['completed'] == 1)
+    finally:
+        executor.stop()
+    assert uploads == ['old']
+    assert not os.path.exists(dead)
+    assert os.path.exists(f"{live}.json.running-other-process")
+
+
+def test_failed_upload_is_kept_and_retried(uploads, statuses, monkeypatch):
+    monkeypatch.setattr(gdrive_uploader, 'DRIVE_UPLOAD_RETRY_SECONDS', 0.05)
+    monkeypatch.setattr(gdrive_uploader, 'DRIVE_UPLOAD_MAX_ATTEMPTS', 3)
+    executor = DriveUploadExecutor(concurrency=1)
+    executor.start()
+    try:
+        path = _spool('f', 'fail.pdf')
+        executor.submit(path, 'fail.pdf', 'f')
+        _wait(lambda: os.path.exists(path + '.json.failed'))
+    finally:
+        executor.stop()
+    assert uploads == ['f', 'f', 'f']
+    assert os.path.exists(path)
+    assert json.loads(open(path + '.json.failed').read())['attempts'] == 3
+    # Polling clients stop at 'error', so it is reported only once the executor gives up
+    reported = [s for _, s in statuses]
+    assert reported.count('retrying') == 2 and reported.count('error') == 1
+    assert reported[-1] == 'error'
+
+
+def test_upload_failure_is_raised_once_without_error_status(data_dir, statuses, monkeypatch):
+    class Session:
+        calls = 0
+
+        def service(self):
+            Session.calls += 1
+            raise OSError('network down')
+
+    monkeypatch.setattr(gdrive_uploader, 'get_session', lambda: Session())
+    path = _spool('n', 'n.pdf')
+    with pytest.raises(RuntimeError, match='network down'):
+        gdrive_uploader.upload_file_to_drive(path, 'n.pdf', 'n')
+    # No retry loop inside: the executor owns retries
+    assert Session.calls == 1
+    assert ('n', 'error') not in statuses
+
+
+def test_lease_is_refreshed_while_uploading(uploads, monkeypatch):
+    started, release = [], []
+
+    def slow_upload(file_path, display_name, job_id, sha256=None):
+        started.append(job_id)
+        _wait(lambda: release, timeout=10)
+        return {'id': 'x'}
+
+    monkeypatch.setattr(gdrive_uploader, 'upload_file_to_drive', slow_upload)
+    executor = DriveUploadExecutor(concurrency=1, lease=3)
+    executor.start()
+    try:
+        path = _spool('s', 's.pdf')
+        executor.submit(path, 's.pdf', 's')
+        _wait(lambda: started)
+        claim = next(p for p in os.listdir(os.path.dirname(path)) if '.running-' in p)
+        claim = os.path.join(os.path.dirname(path), claim)
+        os.utime(claim, (time.time() - 60, time.time() - 60))
+        _wait(lambda: time.time() - os.stat(claim).st_mtime < 5, timeout=3)
+        # Another process must not take it back while the lease is fresh
+        assert DriveUploadExecutor(lease=3).recover() == 0
+        release.append(True)
+        _wait(lambda: executor.stats()['completed'] == 1)
+    finally:
+        executor.stop()
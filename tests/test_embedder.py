@@ -0,0 +1,137 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('openai')
+
+from openai import RateLimitError  # noqa: E402
+
+import embedder  # noqa: E402
+from embedder import AsyncEmbeddingEngine, EmbeddingRateLimited, _AdaptiveLimiter, _parse_reset, pack_batches  # noqa: E402
+
+
+def _items(*tokens):
+    return [(f'c{i}', f'text {i}', n) for i, n in enumerate(tokens)]
+
+
+def _ids(batches):
+    return [[chunk_id for chunk_id, _, _ in batch] for batch in batches]
+
+
+def test_pack_batches_closes_batch_at_token_budget():
+    batches = list(pack_batches(_items(40, 50, 20, 30), max_tokens=100, max_items=10))
+    assert _ids(batches) == [['c0', 'c1'], ['c2', 'c3']]
+    assert all(sum(n for _, _, n in b) <= 100 for b in batches)
+
+
+def test_pack_batches_closes_batch_at_item_limit():
+    assert _ids(pack_batches(_items(1, 1, 1, 1, 1), max_tokens=100, max_items=2)) == [['c0', 'c1'], ['c2', 'c3'], ['c4']]
+
+
+def test_pack_batches_sends_oversized_text_alone():
+    assert _ids(pack_batches(_items(10, 500, 10), max_tokens=100, max_items=10)) == [['c0'], ['c1'], ['c2']]
+    assert list(pack_batches([], max_tokens=100, max_items=10)) == []
+
+
+HEALTHY = {'x-ratelimit-limit-requests': '100', 'x-ratelimit-remaining-requests': '90',
+           'x-ratelimit-limit-tokens': '1000', 'x-ratelimit-remaining-tokens': '900'}
+LOW = dict(HEALTHY, **{'x-ratelimit-remaining-requests': '5'})
+
+
+def _rate_limit_error(headers):
+    # Built without an HTTP response object; the engine only reads .response.headers
+    err = RateLimitError.__new__(RateLimitError)
+    err.response = SimpleNamespace(headers=headers)
+    return err
+
+
+class FakeEmbeddings:
+    """Stands in for ``client.embeddings.with_raw_response``."""
+
+    def __init__(self, headers=HEALTHY, fail_on=None, rate_limit=False):
+        self.headers = headers
+        self.fail_on = fail_on
+        self.rate_limit = rate_limit
+        self.calls = []
+
+    async def create(self, model, input):
+        self.calls.append(list(input))
+        await asyncio.sleep(0)
+        if self.rate_limit:
+            raise _rate_limit_error({'x-ratelimit-reset-tokens': '1ms'})
+        if self.fail_on is not None and self.fail_on in input:
+            raise ValueError('input is too long')
+        data = [SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in reversed(list(enumerate(input)))]
+        return SimpleNamespace(headers=self.headers, parse=lambda: SimpleNamespace(data=data))
+
+
+def _engine(embeddings, **kwargs):
+    client = SimpleNamespace(embeddings=SimpleNamespace(with_raw_response=embeddings))
+    return AsyncEmbeddingEngine(client, model='test-model', **kwargs)
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('20ms', 0.02), ('1s', 1.0), ('6m0s', 360.0), ('1h2m3.5s', 3723.5), ('', None), (None, None), ('soon', None),
+])
+def test_parse_reset_durations(value, seconds):
+    if seconds is None:
+        assert _parse_reset(value) is None
+    else:
+        assert _parse_reset(value) == pytest.approx(seconds)
+
+
+def test_limiter_gates_in_flight_requests():
+    async def run():
+        limiter = _AdaptiveLimiter(4)
+        await limiter.set_limit(2)
+        peak = 0
+
+        async def hold():
+            nonlocal peak
+            await limiter.acquire()
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+            await limiter.release()
+
+        await asyncio.gather(*(hold() for _ in range(6)))
+        await limiter.set_limit(100)
+        return peak, limiter.limit, limiter.in_flight
+
+    assert asyncio.run(run()) == (2, 4, 0)
+
+
+def test_concurrency_follows_rate_limit_headers():
+    embeddings = FakeEmbeddings(headers=LOW)
+    engine = _engine(embeddings, max_concurrency=8, max_items=1)
+    asyncio.run(engine.embed(_items(1)))
+    assert engine.stats()['concurrency_limit'] == 4
+    assert engine.stats()['rate_limit']['remaining_requests'] == 5
+
+    embeddings.headers = HEALTHY
+    asyncio.run(engine.embed(_items(1, 1)))
+    assert engine.stats()['concurrency_limit'] == 6
+
+
+def test_failing_batch_is_bisected_down_to_the_bad_input():
+    items = _items(1, 1, 1, 1, 1, 1, 1, 1)
+    bad = items[5][1]
+    embeddings = FakeEmbeddings(fail_on=bad)
+    out, failed = asyncio.run(_engine(embeddings, max_items=8).embed(items))
+    assert failed == ['c5']
+    assert sorted(out) == ['c0', 'c1', 'c2', 'c3', 'c4', 'c6', 'c7']
+    # Vectors stay matched to their own text despite out-of-order response data
+    assert all(out[chunk_id] == [float(len(text))] for chunk_id, text, _ in items if chunk_id != 'c5')
+    # 8 → 4 → 2 → 1: one failing request per level plus the healthy halves
+    assert len(embeddings.calls) == 7
+
+
+def test_persistent_429s_raise_without_splitting():
+    embeddings = FakeEmbeddings(rate_limit=True)
+    engine = _engine(embeddings, max_concurrency=8, max_items=4)
+    with pytest.raises(EmbeddingRateLimited):
+        asyncio.run(engine.embed(_items(1, 1, 1, 1)))
+    assert len(embeddings.calls) == embedder.EMBED_RATE_LIMIT_RETRIES
+    assert all(len(texts) == 4 for texts in embeddings.calls)
+    assert engine.rate_limited == embedder.EMBED_RATE_LIMIT_RETRIES
+    assert engine.stats()['concurrency_limit'] == 1
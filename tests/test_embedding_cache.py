@@ -0,0 +1,60 @@
+from embedding_cache import EmbeddingCache, cache_key
+
+DIM = 4
+
+
+def _cache(capacity: int = 4) -> EmbeddingCache:
+    return EmbeddingCache(DIM, max_bytes=capacity * DIM * 4, name='test')
+
+
+def _vec(i: int) -> list:
+    return [float(i)] * DIM
+
+
+def test_roundtrip_and_lru_eviction(data_dir):
+    cache = _cache()
+    keys = [cache_key('m', f'text {i}') for i in range(5)]
+    cache.put_many((k, _vec(i)) for i, k in enumerate(keys[:4]))
+    assert cache.get_many(keys[1:4]) == {k: _vec(i) for i, k in enumerate(keys[1:4], start=1)}
+
+    # Full: the least recently used key (0) makes room for key 4
+    cache.put_many([(keys[4], _vec(4))])
+    found = cache.get_many(keys)
+    assert keys[0] not in found and found[keys[4]] == _vec(4)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_reader_never_sees_vector_of_evicting_process(data_dir):
+    # Two instances on one directory behave like two worker processes
+    reader, writer = _cache(), _cache()
+    keys = [cache_key('m', f'text {i}') for i in range(4)]
+    reader.put_many((k, _vec(i)) for i, k in enumerate(keys))
+    intruder = cache_key('m', 'intruder')
+
+    read_slot = reader._read_slot
+
+    def evict_then_read(slot, key):
+        # The reader has looked the slot up; the writer now evicts that key
+        # (oldest, since the writer touches the others) and reuses its slot
+        writer.get_many(keys[1:])
+        writer.put_many([(intruder, _vec(99))])
+        return read_slot(slot, key)
+
+    reader._read_slot = evict_then_read
+    assert reader.get_many([keys[0]]) == {}
+    reader._read_slot = read_slot
+    assert reader.get_many([intruder]) == {intruder: _vec(99)}
+
+
+def test_half_written_slot_reads_as_miss(data_dir):
+    reader, writer = _cache(), _cache()
+    key = cache_key('m', 'text')
+    writer.put_many([(key, _vec(1))])
+    slot = reader._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+    # A writer clears the tag before touching the row
+    writer._tags[slot] = 0
+    writer._matrix[slot] = _vec(2)
+    assert reader.get_many([key]) == {}
+    writer._write_slot(slot, key, _vec(2))
+    assert reader.get_many([key]) == {key: _vec(2)}
@@ -0,0 +1,276 @@
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('googleapiclient')
+pytest.importorskip('google_auth_oauthlib')
+
+import httplib2  # noqa: E402
+from googleapiclient.errors import HttpError  # noqa: E402
+
+import gdrive_uploader  # noqa: E402
+from gdrive_uploader import DriveHashIndex, DriveSession, UploadStatusStore, _find_existing, _resumable_upload  # noqa: E402
+
+
+class _Call:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class FakeFiles:
+    def __init__(self, files=None):
+        self.files = files or {}
+        self.calls = []
+
+    def get(self, fileId, fields=None, supportsAllDrives=None):
+        self.calls.append(('get', fileId))
+        if fileId not in self.files:
+            return _Call(_http_error(404))
+        return _Call(dict(self.files[fileId]))
+
+    def list(self, q, **kwargs):
+        self.calls.append(('list', q))
+        found = [{k: v for k, v in f.items() if k in ('id', 'name', 'parents')} for f in self.files.values()
+                 if f"value='{f.get('sha256')}'" in q and f"'{(f.get('parents') or [''])[0]}' in parents" in q
+                 and not f.get('trashed')]
+        return _Call({'files': found[:1]})
+
+
+class FakeService:
+    def __init__(self, files=None):
+        self._files = FakeFiles(files)
+
+    def files(self):
+        return self._files
+
+
+class FakeCreds:
+    def __init__(self, minutes_left=60):
+        self.valid = True
+        self.expiry = datetime.utcnow() + timedelta(minutes=minutes_left)
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    """A DriveSession whose services share one FakeService; records builds and logins."""
+    state = {'builds': [], 'logins': []}
+    service = FakeService({'parent': {'id': 'parent', 'name': 'Uploads', 'mimeType': 'folder'}})
+
+    def authenticate():
+        state['logins'].append(FakeCreds(state.get('minutes_left', 60)))
+        return state['logins'][-1]
+
+    def build(name, version, credentials=None, cache_discovery=None):
+        state['builds'].append((threading.get_ident(), credentials))
+        return service
+
+    monkeypatch.setattr(gdrive_uploader, 'authenticate', authenticate)
+    monkeypatch.setattr(gdrive_uploader, 'build', build)
+    monkeypatch.setattr(gdrive_uploader, '_persist_token', lambda creds: None)
+    state['service'] = service
+    return state
+
+
+def test_parent_metadata_is_cached_until_invalidated(drive, monkeypatch):
+    session = DriveSession()
+    assert session.parent_metadata('parent')['name'] == 'Uploads'
+    assert session.parent_metadata('parent')['name'] == 'Uploads'
+    assert drive['service'].files().calls == [('get', 'parent')]
+
+    session.invalidate_parent('parent')
+    session.parent_metadata('parent')
+    monkeypatch.setattr(gdrive_uploader, 'DRIVE_PARENT_CACHE_TTL', 0)
+    session.parent_metadata('parent')
+    assert len(drive['service'].files().calls) == 3
+
+
+def test_service_is_built_once_per_thread_and_reused(drive):
+    session = DriveSession()
+    assert session.service() is session.service()
+    other = threading.Thread(target=session.service)
+    other.start()
+    other.join()
+    assert len(drive['builds']) == 2 and drive['builds'][0][0] != drive['builds'][1][0]
+    assert len(drive['logins']) == 1
+
+
+def test_token_is_refreshed_before_it_expires(drive):
+    drive['minutes_left'] = 1
+    session = DriveSession()
+    creds = session.credentials()
+    generation = session._generation
+    # Within the refresh margin: refreshed in place, then good for another hour
+    assert session.credentials() is creds and creds.refreshes == 1
+    assert session.credentials() is creds and creds.refreshes == 1
+    # Same credentials object, so per-thread services are not rebuilt
+    assert session._generation == generation and len(drive['logins']) == 1
+
+
+def _http_error(status):
+    return HttpError(httplib2.Response({'status': status}), b'{}')
+
+
+class ChunkedRequest:
+    """next_chunk() replays ``steps``: an exception is raised, an int is bytes acknowledged."""
+
+    def __init__(self, steps, total):
+        self.steps = list(steps)
+        self.total = total
+        self.calls = 0
+
+    def next_chunk(self):
+        self.calls += 1
+        step = self.steps.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        if step >= self.total:
+            return None, {'id': 'new-file'}
+        return SimpleNamespace(resumable_progress=step), None
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    """Run _resumable_upload against a scripted request; returns (upload, progress reports)."""
+    reports, sleeps = [], []
+    monkeypatch.setattr(gdrive_uploader, 'MediaFileUpload', lambda *a, **k: None)
+    monkeypatch.setattr(gdrive_uploader, '_set_status',
+                        lambda job_id, status, progress=None, **k: reports.append(progress['bytes_sent']))
+    monkeypatch.setattr(gdrive_uploader.time, 'sleep', sleeps.append)
+
+    def upload(request):
+        service = SimpleNamespace(files=lambda: SimpleNamespace(create=lambda **k: request))
+        return _resumable_upload(service, 'f.pdf', {'name': 'f.pdf'}, None, request.total, 'job')
+
+    return upload, reports, sleeps
+
+
+def test_transient_chunk_errors_resume_the_session(chunked, monkeypatch):
+    upload, reports, sleeps = chunked
+    monkeypatch.setattr(gdrive_uploader, 'DRIVE_CHUNK_MAX_RETRIES', 2)
+    # Two failures in a row are tolerated, and the count resets after a good chunk
+    request = ChunkedRequest([100, OSError('reset'), _http_error(503), 200,
+                              _http_error(429), httplib2.HttpLib2Error('eof'), 300], total=300)
+    assert upload(request) == {'id': 'new-file'}
+    assert request.calls == 7
+    assert reports == [0, 100, 200]
+    assert sleeps == [0.5, 1.0, 0.5, 1.0]
+
+
+def test_chunk_retries_give_up(chunked, monkeypatch):
+    upload, _, _ = chunked
+    monkeypatch.setattr(gdrive_uploader, 'DRIVE_CHUNK_MAX_RETRIES', 2)
+    with pytest.raises(OSError):
+        upload(ChunkedRequest([100, OSError('a'), OSError('b'), OSError('c'), 300], total=300))
+    # Client errors are not retried
+    request = ChunkedRequest([_http_error(400), 300], total=300)
+    with pytest.raises(HttpError):
+        upload(request)
+    assert request.calls == 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(gdrive_uploader.time, 'time', lambda: now[0])
+    return now
+
+
+def _job_ids(store):
+    return [r[0] for r in store._db.execute("SELECT job_id FROM upload_status ORDER BY updated_at")]
+
+
+def test_status_expires_after_ttl_and_keeps_progress(data_dir, clock):
+    store = UploadStatusStore(ttl=60)
+    store.set('a', 'running', None, None, {'bytes_sent': 10, 'total_bytes': 20})
+    store.set('a', 'retrying', 'attempt 1/5 failed', None, None)
+    assert store.get('a')['progress'] == {'bytes_sent': 10, 'total_bytes': 20}
+    assert store.get('a')['status'] == 'retrying'
+    clock[0] += 61
+    assert store.get('a') is None
+    assert store.get('missing') is None
+
+
+def test_status_table_is_pruned_to_ttl_and_row_cap(data_dir, clock):
+    store = UploadStatusStore(ttl=3600, max_rows=3)
+    for job_id in 'abcde':
+        clock[0] += 1
+        store.set(job_id, 'success', None, {'id': job_id}, None)
+    # Pruning is rate limited: only the first write pruned
+    assert _job_ids(store) == list('abcde')
+
+    clock[0] += gdrive_uploader._STATUS_PRUNE_INTERVAL
+    store.set('f', 'running', None, None, None)
+    assert _job_ids(store) == list('def')
+
+    clock[0] += 3601
+    store.set('g', 'running', None, None, None)
+    assert _job_ids(store) == ['g']
+
+
+@pytest.fixture
+def hash_index(data_dir, monkeypatch):
+    index = DriveHashIndex()
+    monkeypatch.setattr(gdrive_uploader, '_hash_index', index)
+    return index
+
+
+def _stored(file_id, sha, parent='parent', **extra):
+    return {file_id: dict({'id': file_id, 'name': f'{file_id}.pdf', 'parents': [parent], 'sha256': sha}, **extra)}
+
+
+def test_indexed_duplicate_is_confirmed_with_one_get(hash_index):
+    service = FakeService(_stored('f1', 'abc'))
+    hash_index.put('abc', 'parent', 'f1')
+    assert _find_existing(service, 'abc', 'parent')['id'] == 'f1'
+    assert service.files().calls == [('get', 'f1')]
+
+
+@pytest.mark.parametrize('stale', [
+    _stored('f1', 'abc', trashed=True),      # trashed since it was indexed
+    _stored('f1', 'abc', parent='elsewhere'),  # moved out of the folder
+    {},                                        # deleted (404)
+])
+def test_stale_index_entry_falls_back_to_drive_search(hash_index, stale):
+    service = FakeService(dict(stale, **_stored('f2', 'abc')))
+    hash_index.put('abc', 'parent', 'f1')
+    assert _find_existing(service, 'abc', 'parent')['id'] == 'f2'
+    assert [c[0] for c in service.files().calls] == ['get', 'list']
+    # The search result replaces the stale entry
+    assert hash_index.get('abc', 'parent') == 'f2'
+
+
+def test_unknown_hash_is_indexed_once_drive_has_it(hash_index):
+    service = FakeService(_stored('f1', 'other'))
+    assert _find_existing(service, 'abc', 'parent') is None
+    assert hash_index.get('abc', 'parent') is None
+    service.files().files.update(_stored('f3', 'abc'))
+    assert _find_existing(service, 'abc', 'parent')['id'] == 'f3'
+    assert hash_index.get('abc', 'parent') == 'f3'
+
+
+def test_duplicate_upload_sends_no_bytes(hash_index, tmp_path, monkeypatch):
+    path = tmp_path / 'report.pdf'
+    path.write_bytes(b'%PDF-1.4 same bytes')
+    sha = gdrive_uploader.file_sha256(str(path))
+    service = FakeService(_stored('f1', sha, parent=gdrive_uploader.PARENT_FOLDER_ID))
+    folder = {'id': gdrive_uploader.PARENT_FOLDER_ID, 'mimeType': 'application/vnd.google-apps.folder'}
+    monkeypatch.setattr(gdrive_uploader, 'get_session', lambda: SimpleNamespace(
+        service=lambda: service, parent_metadata=lambda folder_id: folder))
+    monkeypatch.setattr(gdrive_uploader, '_resumable_upload', lambda *a, **k: pytest.fail('uploaded a duplicate'))
+    reported = []
+    monkeypatch.setattr(gdrive_uploader, '_set_status', lambda job_id, status, detail=None, **k: reported.append((status, detail)))
+
+    assert gdrive_uploader.upload_file_to_drive(str(path), 'report.pdf', 'job')['id'] == 'f1'
+    assert reported == [('success', 'duplicate')]
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from ingest_manifest import ManifestStore
+
+
+def test_save_replaces_chunk_set(data_dir):
+    store = ManifestStore(data_dir / 'manifest.sqlite3')
+    assert store.get('doc') is None
+    store.save('doc', 'sha-1', 2, {'doc_page1_chunk1': 'h1', 'doc_page2_chunk1': 'h2'})
+    store.save('doc', 'sha-2', 1, {'doc_page1_chunk1': 'h1b'})
+    assert store.get('doc') == {'file_sha256': 'sha-2', 'total_pages': 1, 'chunks': {'doc_page1_chunk1': 'h1b'}}
+    store.delete('doc')
+    assert store.get('doc') is None
+
+
+class FakeEngine:
+    async def embed(self, items):
+        return {vid: [0.0] for vid, _, _ in items}, []
+
+
+class FakeIndex:
+    def __init__(self):
+        self.upserted = []
+        self.deleted = []
+
+    def upsert(self, vectors):
+        self.upserted.extend(v['id'] for v in vectors)
+
+    def delete(self, ids=None, filter=None):
+        self.deleted.extend(ids or [])
+
+
+def _ingest(monkeypatch, store, index, pages, file_sha):
+    import ingest_pipeline
+
+    async def extract(self, pdf_path, page_q):
+        self.total_pages = len(pages)
+        for i, text in enumerate(pages, start=1):
+            await page_q.put((i, text))
+        await page_q.put(ingest_pipeline._DONE)
+
+    monkeypatch.setattr(ingest_pipeline.IngestPipeline, '_extract', extract)
+    index.upserted, index.deleted = [], []
+    return asyncio.run(ingest_pipeline.ingest_pdf('doc.pdf', 'doc.pdf', file_sha, FakeEngine(), index, store))
+
+
+def test_reupload_upserts_changed_and_deletes_stale_ids(data_dir, monkeypatch, offline_encoder):
+    pytest.importorskip('openai')
+    import ingest_pipeline
+
+    monkeypatch.setattr(ingest_pipeline, '_chunker', None)
+    store = ManifestStore(data_dir / 'manifest.sqlite3')
+    index = FakeIndex()
+    pages = ['첫 페이지 본문입니다.', '두 번째 페이지 본문입니다.', '세 번째 페이지 본문입니다.']
+
+    _ingest(monkeypatch, store, index, pages, 'sha-1')
+    assert sorted(index.upserted) == ['doc_page1_chunk1', 'doc_page2_chunk1', 'doc_page3_chunk1']
+    assert sorted(store.get('doc')['chunks']) == sorted(index.upserted)
+
+    # Same bytes: nothing is re-ingested
+    result = _ingest(monkeypatch, store, index, pages, 'sha-1')
+    assert result['unchanged'] and index.upserted == [] and index.deleted == []
+
+    # Page 2 edited, page 3 removed: page 1 changes hash too since the page count is hashed
+    pages = [pages[0], '두 번째 페이지를 고쳤습니다.']
+    result = _ingest(monkeypatch, store, index, pages, 'sha-2')
+    assert sorted(index.upserted) == ['doc_page1_chunk1', 'doc_page2_chunk1']
+    assert index.deleted == ['doc_page3_chunk1']
+    assert result['status'] == 'success'
+    assert sorted(store.get('doc')['chunks']) == ['doc_page1_chunk1', 'doc_page2_chunk1']
+
+    # Same page count, only page 2 edited: page 1 is skipped
+    pages = [pages[0], '두 번째 페이지를 다시 고쳤습니다.']
+    _ingest(monkeypatch, store, index, pages, 'sha-3')
+    assert index.upserted == ['doc_page2_chunk1'] and index.deleted == []
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('openai')
+
+import ingest_pipeline  # noqa: E402
+from ingest_pipeline import IngestPipeline  # noqa: E402
+
+
+class FailingEngine:
+    def __init__(self):
+        self.calls = 0
+
+    async def embed(self, items):
+        self.calls += 1
+        list(items)
+        await asyncio.sleep(0)
+        raise RuntimeError('embedding service down')
+
+
+class FakeIndex:
+    def upsert(self, vectors):
+        pass
+
+    def delete(self, ids=None, filter=None):
+        pass
+
+
+def test_failed_embed_window_stops_the_pipeline_early(monkeypatch, offline_encoder):
+    monkeypatch.setattr(ingest_pipeline, '_chunker', None)
+    monkeypatch.setattr(ingest_pipeline, 'EMBED_BATCH_MAX_ITEMS', 1)
+    monkeypatch.setattr(ingest_pipeline, 'EMBED_MAX_CONCURRENCY', 2)
+    pages_sent = []
+
+    async def extract(self, pdf_path, page_q):
+        self.total_pages = 200
+        for i in range(1, 201):
+            await page_q.put((i, f'{i}번째 페이지 본문입니다.'))
+            pages_sent.append(i)
+        await page_q.put(ingest_pipeline._DONE)
+
+    monkeypatch.setattr(IngestPipeline, '_extract', extract)
+    engine = FailingEngine()
+    pipeline = IngestPipeline(engine, FakeIndex(), 'doc')
+    with pytest.raises(RuntimeError, match='embedding service down'):
+        asyncio.run(pipeline.run('doc.pdf'))
+    # The failure is noticed before the next window is scheduled, not after the whole document
+    assert engine.calls <= 3
+    assert len(pages_sent) < 200
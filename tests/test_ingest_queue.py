@@ -0,0 +1,82 @@
+import time
+
+import ingest_queue
+from ingest_queue import JobQueue
+
+
+def _queue(data_dir, **kwargs) -> JobQueue:
+    return JobQueue(data_dir / 'queue.sqlite3', **kwargs)
+
+
+def test_claims_oldest_job_once(data_dir):
+    queue = _queue(data_dir)
+    queue.enqueue('a', 'a.pdf', '/spool/a')
+    queue.enqueue('b', 'b.pdf', '/spool/b')
+
+    first = queue.claim('w1')
+    second = queue.claim('w2')
+    assert (first['job_id'], second['job_id']) == ('a', 'b')
+    assert first['status'] == 'running' and first['attempts'] == 1
+    assert queue.claim('w3') is None
+
+
+def test_stale_running_job_is_reclaimed(data_dir, monkeypatch):
+    monkeypatch.setattr(ingest_queue, 'INGEST_STALE_SECONDS', 60)
+    queue = _queue(data_dir)
+    queue.enqueue('a', 'a.pdf', '/spool/a')
+    queue.claim('w1')
+    assert queue.claim('w2') is None
+
+    queue._db.execute("UPDATE jobs SET updated_at = ?", (time.time() - 120,))
+    job = queue.claim('w2')
+    assert job['job_id'] == 'a' and job['attempts'] == 2
+    # The first worker lost the job: its heartbeat says so
+    assert queue.heartbeat('a', 'w1') is False
+    assert queue.heartbeat('a', 'w2') is True
+
+
+def test_heartbeat_keeps_job_from_going_stale(data_dir, monkeypatch):
+    monkeypatch.setattr(ingest_queue, 'INGEST_STALE_SECONDS', 60)
+    queue = _queue(data_dir)
+    queue.enqueue('a', 'a.pdf', '/spool/a')
+    queue.claim('w1')
+    queue._db.execute("UPDATE jobs SET updated_at = ?", (time.time() - 120,))
+    assert queue.heartbeat('a', 'w1')
+    assert queue.claim('w2') is None
+
+
+def test_fail_retries_until_max_attempts(data_dir, monkeypatch):
+    monkeypatch.setattr(ingest_queue, 'INGEST_MAX_ATTEMPTS', 2)
+    queue = _queue(data_dir)
+    queue.enqueue('a', 'a.pdf', '/spool/a')
+    queue.claim('w1')
+    assert queue.fail('a', 'boom') is True
+    assert queue.get('a')['status'] == 'queued'
+    queue.claim('w1')
+    assert queue.fail('a', 'boom') is False
+    assert queue.get('a')['status'] == 'error'
+
+
+def test_fail_without_retry(data_dir):
+    queue = _queue(data_dir)
+    queue.enqueue('a', 'a.pdf', '/spool/a')
+    queue.claim('w1')
+    assert queue.fail('a', '처리할 텍스트가 없습니다.', retry=False) is False
+    job = queue.get('a')
+    assert job['status'] == 'error' and job['error'] == '처리할 텍스트가 없습니다.'
+
+
+def test_finished_jobs_are_pruned(data_dir):
+    queue = _queue(data_dir, retention=3600)
+    for job_id in ('old', 'recent', 'waiting'):
+        queue.enqueue(job_id, f'{job_id}.pdf', f'/spool/{job_id}')
+    queue.claim('w1')
+    queue.finish('old', {'status': 'success'})
+    queue._db.execute("UPDATE jobs SET updated_at = ? WHERE id IN ('old', 'waiting')", (time.time() - 7200,))
+    queue._last_prune = 0.0
+    queue.claim('w1')
+    queue.finish('recent', {'status': 'success'})
+    assert queue.get('old') is None
+    assert queue.get('recent')['status'] == 'success'
+    # Unfinished jobs are kept however old they are
+    assert queue.get('waiting')['status'] == 'queued'
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('openai')
+
+import ingest_worker  # noqa: E402
+from ingest_queue import JobQueue  # noqa: E402
+from ingest_worker import IngestWorker  # noqa: E402
+
+
+def _worker(data_dir) -> IngestWorker:
+    queue = JobQueue(data_dir / 'queue.sqlite3')
+    queue.enqueue('a', 'a.pdf', str(data_dir / 'a.pdf'))
+    (data_dir / 'a.pdf').write_bytes(b'%PDF')
+    return IngestWorker(queue, engine=None, index=None, manifests=None)
+
+
+def test_error_result_fails_job(data_dir, monkeypatch):
+    async def ingest_pdf(*args, **kwargs):
+        return {"status": "error", "message": "처리할 텍스트가 없습니다."}
+
+    monkeypatch.setattr(ingest_worker, 'ingest_pdf', ingest_pdf)
+    worker = _worker(data_dir)
+    asyncio.run(worker._run_job(worker.queue.claim(worker.name)))
+    job = worker.queue.get('a')
+    assert job['status'] == 'error'
+    assert job['error'] == "처리할 텍스트가 없습니다."
+    assert not (data_dir / 'a.pdf').exists()
+
+
+def test_heartbeat_runs_during_long_job(data_dir, monkeypatch):
+    monkeypatch.setattr(ingest_worker, 'INGEST_HEARTBEAT_SECONDS', 0.05)
+    beats = []
+
+    async def ingest_pdf(*args, **kwargs):
+        await asyncio.sleep(0.3)
+        return {"status": "success", "message": "ok"}
+
+    monkeypatch.setattr(ingest_worker, 'ingest_pdf', ingest_pdf)
+    worker = _worker(data_dir)
+    heartbeat = worker.queue.heartbeat
+    monkeypatch.setattr(worker.queue, 'heartbeat', lambda *a: beats.append(a) or heartbeat(*a))
+    asyncio.run(worker._run_job(worker.queue.claim(worker.name)))
+    assert len(beats) >= 3
+    assert worker.queue.get('a')['status'] == 'success'
+
+
+def test_progress_is_written_off_the_event_loop(data_dir, monkeypatch):
+    import threading
+
+    writers = []
+
+    async def ingest_pdf(*args, on_progress=None, **kwargs):
+        for page in range(1, 51):
+            on_progress({'pages_done': page})
+            await asyncio.sleep(0)
+        return {"status": "success", "message": "ok"}
+
+    monkeypatch.setattr(ingest_worker, 'ingest_pdf', ingest_pdf)
+    worker = _worker(data_dir)
+    update = worker.queue.update_progress
+    monkeypatch.setattr(worker.queue, 'update_progress',
+                        lambda *a: writers.append(threading.current_thread()) or update(*a))
+    asyncio.run(worker._run_job(worker.queue.claim(worker.name)))
+    # Throttled: the first report, then the final one
+    assert len(writers) == 2
+    assert threading.main_thread() not in writers
+    assert worker.queue.get('a')['progress'] == {'pages_done': 50}
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('pdfplumber')
+pytest.importorskip('PyPDF2')
+
+import pdf_extract  # noqa: E402
+
+
+def _collect(pdf_path, total_pages, *args):
+    async def run():
+        return [item async for item in pdf_extract.iter_pages(pdf_path, total_pages, *args)]
+    return asyncio.run(run())
+
+
+def _write_pdf(path, pages):
+    canvas = pytest.importorskip('reportlab.pdfgen.canvas')
+    c = canvas.Canvas(str(path))
+    for text in pages:
+        c.drawString(72, 720, text)
+        c.showPage()
+    c.save()
+    return str(path)
+
+
+def test_pages_come_back_in_order_with_bounded_lookahead(monkeypatch):
+    monkeypatch.setattr(pdf_extract, 'PDF_EXTRACT_WORKERS', 2)
+    monkeypatch.setattr(pdf_extract, 'PDF_EXTRACT_PAGES_PER_TASK', 3)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def extract_page_range(pdf_path, start, end, *args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        # Earlier ranges finish last
+        time.sleep(0.05 if start == 0 else 0.01)
+        with lock:
+            running[0] -= 1
+        return [f'page {i + 1}' for i in range(start, end)]
+
+    executor = ThreadPoolExecutor(max_workers=8)
+    monkeypatch.setattr(pdf_extract, 'get_executor', lambda: executor)
+    monkeypatch.setattr(pdf_extract, 'extract_page_range', extract_page_range)
+    try:
+        pages = _collect('doc.pdf', 20)
+    finally:
+        executor.shutdown()
+    assert pages == [(i, f'page {i}') for i in range(1, 21)]
+    # Two ranges per worker at most, although the pool has more threads
+    assert peak[0] <= 4
+
+
+def test_process_pool_extracts_a_real_pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extract, 'PDF_EXTRACT_WORKERS', 2)
+    monkeypatch.setattr(pdf_extract, 'PDF_EXTRACT_PAGES_PER_TASK', 2)
+    monkeypatch.setattr(pdf_extract, '_executor', None)
+    path = _write_pdf(tmp_path / 'doc.pdf', [f'Page number {i}' for i in range(1, 6)])
+    try:
+        total = pdf_extract.count_pages(path)
+        pages = _collect(path, total)
+    finally:
+        pdf_extract.shutdown_executor()
+    assert total == 5
+    assert [(n, text.strip()) for n, text in pages] == [(i, f'Page number {i}') for i in range(1, 6)]
+
+
+class FakeDocument:
+    def __init__(self, pypdf, plumber):
+        self.texts = {'pypdf': pypdf, 'plumber': plumber}
+        self.calls = []
+
+    def pypdf_text(self, index):
+        self.calls.append('pypdf')
+        return self.texts['pypdf']
+
+    def plumber_text(self, index):
+        self.calls.append('plumber')
+        return self.texts['plumber']
+
+
+@pytest.mark.parametrize('mode, pypdf, plumber, text, calls', [
+    ('fast', 'text layer', 'layout', 'text layer', ['pypdf']),
+    ('fast', '', 'layout', 'layout', ['pypdf', 'plumber']),
+    ('quality', 'text layer', 'layout', 'layout', ['plumber']),
+    ('quality', 'text layer', '  \n', 'text layer', ['plumber', 'pypdf']),
+])
+def test_engine_order_and_fallback(mode, pypdf, plumber, text, calls):
+    doc = FakeDocument(pypdf, plumber)
+    assert pdf_extract.ENGINES[mode](doc, 0) == text
+    assert doc.calls == calls
+
+
+def test_pages_of_one_file_share_a_parsed_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extract, '_current_doc', None)
+    path = _write_pdf(tmp_path / 'doc.pdf', ['Alpha page', 'Beta page', 'Gamma page'])
+    with pytest.raises(ValueError):
+        pdf_extract.extract_page_range(path, 0, 1, 'ocr')
+
+    fast = pdf_extract.extract_page_range(path, 0, 2, 'fast')
+    doc = pdf_extract._get_document(path)
+    quality = pdf_extract.extract_page_range(path, 2, 3, 'quality')
+    assert [t.strip() for t in fast + quality] == ['Alpha page', 'Beta page', 'Gamma page']
+    assert pdf_extract._get_document(path) is doc
+    # A rewritten file is parsed again
+    time.sleep(0.01)
+    _write_pdf(tmp_path / 'doc.pdf', ['Delta page'])
+    assert pdf_extract.extract_page_range(path, 0, 1, 'fast') == ['Delta page']
+    assert pdf_extract._get_document(path) is not doc
+    pdf_extract._get_document(path).close()
@@ -0,0 +1,117 @@
+import pytest
+
+HEADERS = ['aiGreeting', 'trainingData', 'instructionData', 'gpt-model', 'temperature', 'max-tokens',
+           'references', 'download-button']
+
+
+class FakeSettingsSheet:
+    def __init__(self):
+        self.rows = [HEADERS, ['안녕하세요', 't', 'i', 'gpt-4o', '0.5', '1000', 'TRUE', 'FALSE']]
+        self.reads = 0
+        self.fail_reads = False
+
+    def get_all_values(self):
+        self.reads += 1
+        if self.fail_reads:
+            raise ConnectionError('read timed out')
+        return [list(r) for r in self.rows]
+
+    def row_values(self, n):
+        return list(self.rows[n - 1])
+
+    def update(self, cells, values, value_input_option=None):
+        # USER_ENTERED: the sheet stores what it parsed, e.g. 1.0 → 1
+        self.rows[1] = [str(v) if not isinstance(v, float) or not v.is_integer() else str(int(v)) for v in values[0]]
+
+
+class FakeSheets:
+    def __init__(self):
+        self.sheet = FakeSettingsSheet()
+        self.rev = '1'
+        self.invalidated = []
+
+    def worksheet(self, key, title, headers=None):
+        return self.sheet
+
+    def revision(self, key):
+        return self.rev
+
+    def invalidate(self, key, title=None):
+        self.invalidated.append((key, title))
+
+
+@pytest.fixture
+def app(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'sheets', FakeSheets())
+    monkeypatch.setattr(app_module, '_settings_cache', {"data": None, "etag": None, "time": 0.0, "rev": None})
+    monkeypatch.setattr(app_module, '_admin_cache', {"data": [{'username': 'root', 'is_super_admin': 'TRUE'}],
+                                                     "time": app_module._cache_now(), "rev": None})
+    monkeypatch.setattr(app_module, '_perms_index', {"data": {}, "time": app_module._cache_now(), "rev": None})
+    return app_module
+
+
+def _payload(app, temperature=1.0):
+    return app.SaveSettingsRequest(
+        ai_greeting='반갑습니다', training_data='t', instruction_data='i',
+        gpt_settings={'model': 'gpt-4o', 'temperature': temperature, 'max_tokens': 2000},
+        reference_settings={'references_enabled': False, 'download_button_enabled': True},
+    )
+
+
+@pytest.mark.parametrize('header, matches', [
+    ('"abc"', True), ('W/"abc"', True), ('"old", W/"abc"', True), ('*', True), ('"abcd"', False), ('', False),
+])
+def test_etag_weak_comparison(app, header, matches):
+    assert app._etag_matches(header, '"abc"') is matches
+
+
+def test_load_settings_revalidates_with_304(app):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app.app)
+    client.cookies.set(app.COOKIE_NAME, app.create_access_token({'sub': 'root'}))
+    first = client.get('/api/load-settings')
+    assert first.status_code == 200 and first.json()['data']['gpt-model'] == 'gpt-4o'
+    etag = first.headers['etag']
+
+    assert client.get('/api/load-settings', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get('/api/load-settings', headers={'If-None-Match': '"stale"'}).status_code == 200
+    # Served from the server cache after the first read
+    assert app.sheets.sheet.reads == 1
+
+
+def test_save_writes_through_what_the_sheet_stored(app):
+    app.get_cached_settings()
+    app.save_google_sheets_data(_payload(app))
+    data, etag = app._settings_cache['data'], app._settings_cache['etag']
+    assert data['aiGreeting'] == '반갑습니다' and data['temperature'] == 1
+    # A later full read of the sheet yields the same data and ETag
+    assert app._settings_etag(app.get_google_sheets_data()) == etag
+
+
+def test_failed_reread_after_save_keeps_success(app):
+    app.get_cached_settings()
+    app.sheets.sheet.fail_reads = True
+    result = app.save_google_sheets_data(_payload(app))
+    assert result['updated_range'] == 'A2:H2'
+    assert app.sheets.sheet.rows[1][0] == '반갑습니다'
+    # Cache dropped so the next request reads the saved row
+    assert app._settings_cache['data'] is None
+    app.sheets.sheet.fail_reads = False
+    assert app.get_cached_settings()[0]['aiGreeting'] == '반갑습니다'
+
+
+def test_expired_settings_are_kept_while_the_revision_is_unchanged(app):
+    app.get_cached_settings()
+    app._settings_cache['time'] -= 3600
+    etag = app.get_cached_settings()[1]
+    assert app.sheets.sheet.reads == 1
+    # The TTL was extended, so the next call does not even probe
+    assert app._is_fresh(app._settings_cache['time'], app.SETTINGS_CACHE_TTL)
+
+    app._settings_cache['time'] -= 3600
+    app.sheets.sheet.rows[1][0] = '바뀐 인사말'
+    app.sheets.rev = '2'
+    data, new_etag = app.get_cached_settings()
+    assert app.sheets.sheet.reads == 2
+    assert data['aiGreeting'] == '바뀐 인사말' and new_etag != etag
@@ -0,0 +1,138 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('gspread')
+
+import sheets_session  # noqa: E402
+from sheets_session import SheetsSession  # noqa: E402
+
+
+class FakeCreds:
+    def __init__(self):
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f'token-{self.refreshes}'
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+
+@pytest.fixture
+def fake_auth(monkeypatch):
+    built = []
+
+    def from_service_account_info(info, scopes):
+        built.append(FakeCreds())
+        return built[-1]
+
+    monkeypatch.setattr(sheets_session.Credentials, 'from_service_account_info', from_service_account_info)
+    monkeypatch.setattr(sheets_session.gspread, 'authorize', lambda creds: ('client', creds))
+    return built
+
+
+def test_credentials_are_built_on_first_use(fake_auth):
+    session = SheetsSession({'private_key': 'not a key'})
+    assert fake_auth == []
+
+    client = session.client()
+    assert fake_auth and client == ('client', fake_auth[0])
+    # Token still valid: no second exchange
+    assert session.client() is client
+    assert len(fake_auth) == 1 and fake_auth[0].refreshes == 1
+
+
+class SlowDoc:
+    def __init__(self, error=None):
+        self.release = threading.Event()
+        self.calls = []
+        self.error = error
+
+    def values_batch_get(self, ranges):
+        self.calls.append(ranges)
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return {'valueRanges': [{'values': [[r]]} for r in ranges[:-1]]}
+
+
+def _concurrent_batch_get(session, ranges, n=4):
+    results, errors = [], []
+
+    def read():
+        try:
+            results.append(session.batch_get('key', ranges))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def test_concurrent_batch_reads_share_one_request(fake_auth):
+    session = SheetsSession({})
+    doc = SlowDoc()
+    session.spreadsheet = lambda key: doc
+    threads, results, _ = _concurrent_batch_get(session, ['A!A:E', 'B!A:E'])
+    # Different ranges are not merged
+    other_threads, other, _ = _concurrent_batch_get(session, ['C!A:E'], n=1)
+    time.sleep(0.1)
+    doc.release.set()
+    for t in threads + other_threads:
+        t.join()
+    assert sorted(doc.calls) == [['A!A:E', 'B!A:E'], ['C!A:E']]
+    # Missing trailing ranges come back empty, in request order
+    assert results == [[[['A!A:E']], []]] * 4
+    assert other == [[[]]]
+
+
+def test_batch_read_error_reaches_every_waiter(fake_auth):
+    session = SheetsSession({})
+    doc = SlowDoc(error=ConnectionError('quota'))
+    session.spreadsheet = lambda key: doc
+    threads, results, errors = _concurrent_batch_get(session, ['A!A:E'])
+    time.sleep(0.1)
+    doc.release.set()
+    for t in threads:
+        t.join()
+    assert len(doc.calls) == 1 and results == []
+    assert len(errors) == 4 and all(isinstance(e, ConnectionError) for e in errors)
+    # The failed flight is gone: the next read tries again
+    doc.error = None
+    assert session.batch_get('key', ['A!A:E', 'X']) == [[['A!A:E']], []]
+
+
+class FakeDriveClient:
+    def __init__(self):
+        self.version = 7
+        self.error = None
+        self.probes = []
+
+    def request(self, method, url, params=None):
+        self.probes.append(url.rsplit('/', 1)[1])
+        if self.error:
+            raise self.error
+        return type('Resp', (), {'json': lambda _: {'version': self.version}})()
+
+
+def test_revision_probes_are_shared_within_the_interval(monkeypatch):
+    drive = FakeDriveClient()
+    session = SheetsSession({})
+    session.client = lambda: drive
+    assert session.revision('key') == '7'
+    drive.version = 8
+    assert session.revision('key') == '7'
+    assert session.revision('other') == '8'
+    assert drive.probes == ['key', 'other']
+
+    monkeypatch.setattr(sheets_session, 'SHEETS_REVISION_PROBE_INTERVAL', 0)
+    assert session.revision('key') == '8'
+    # A failed probe reads as "changed"
+    drive.error = ConnectionError('timeout')
+    assert session.revision('key') is None
@@ -0,0 +1,38 @@
+import hashlib
+import io
+
+import pytest
+
+
+@pytest.fixture
+def app(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'MAX_FILE_SIZE', 10_000)
+    monkeypatch.setattr(app_module, 'UPLOAD_READ_CHUNK', 4096)
+    return app_module
+
+
+def test_spool_hashes_while_copying(app, tmp_path):
+    body = bytes(range(256)) * 30
+    dest = tmp_path / 'spooled.pdf'
+    size, sha = app._spool_upload(io.BytesIO(body), dest)
+    assert (size, sha) == (len(body), hashlib.sha256(body).hexdigest())
+    assert dest.read_bytes() == body
+
+
+def test_spool_over_limit_leaves_nothing_behind(app, tmp_path):
+    dest = tmp_path / 'spooled.pdf'
+    with pytest.raises(ValueError):
+        app._spool_upload(io.BytesIO(b'x' * 10_001), dest)
+    assert not dest.exists()
+
+
+def test_oversized_upload_is_rejected_before_the_body_is_read(app, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(app, '_MULTIPART_OVERHEAD', 100)
+    client = TestClient(app.app)
+    big = client.post('/api/upload', files={'file': ('big.pdf', b'x' * 20_000, 'application/pdf')})
+    assert big.status_code == 413 and big.json()['success'] is False
+    # Within the limit the request reaches the endpoint, which asks for a login
+    small = client.post('/api/upload', files={'file': ('small.pdf', b'x' * 100, 'application/pdf')})
+    assert small.status_code == 401